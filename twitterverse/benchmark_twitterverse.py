@@ -0,0 +1,510 @@
+""" Benchmarks of the Twitterverse functions on generated power-law graphs.
+
+In a power-law graph a few hub users have most of the followers, as
+celebrity accounts do in the real data, and those hubs dominate the cost of
+follower queries. Run this module with the number of users as an optional
+argument; every benchmark prints its timings in seconds.
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import twitterverse_functions as tf
+import twitterverse_graph as tg
+import twitterverse_memory as tm
+import twitterverse_partition as tp
+import twitterverse_views as tw
+
+
+def make_power_law_data(users, edges_per_user, seed=0):
+    """ (int, int, int) -> Twitterverse dictionary
+
+    Return a Twitterverse dictionary of the given number of users, each
+    following about edges_per_user others. Users are followed with
+    probability proportional to their followers so far (preferential
+    attachment), which gives the followers counts a power-law distribution.
+    """
+
+    rng = random.Random(seed)
+    names = ['user{0}'.format(number) for number in range(users)]
+    twitter_dict = {}
+    targets = []
+    # Each user appears in targets once, plus once for each follower.
+    for number in range(users):
+        following = set()
+        for edge in range(min(edges_per_user, number)):
+            if rng.random() < 0.8:
+                following.add(rng.choice(targets))
+            else:
+                following.add(names[rng.randrange(number)])
+        targets.extend(following)
+        targets.append(names[number])
+        twitter_dict[names[number]] = {
+            'name': 'User {0}'.format(number), 'location': 'City',
+            'web': 'http://user{0}.example.com'.format(number),
+            'bio': ' '.join(['Bio of user {0}.'.format(number)] * 8),
+            'following': sorted(following)}
+    return twitter_dict
+
+
+def write_data_file(twitter_dict, file):
+    """ (Twitterverse dictionary, file open for writing) -> NoneType
+
+    Write twitter_dict to file in the data file format process_data reads.
+    """
+
+    for user in twitter_dict:
+        file.write(user + '\n' + twitter_dict[user]['name'] + '\n' +
+                   twitter_dict[user]['location'] + '\n' +
+                   twitter_dict[user]['web'] + '\n' +
+                   twitter_dict[user]['bio'] + '\nENDBIO\n')
+        for name in twitter_dict[user]['following']:
+            file.write(name + '\n')
+        file.write('END\n')
+
+
+def load_data_file(filename):
+    """ (str) -> Twitterverse dictionary
+
+    Return the data in filename, read through open_input.
+    """
+
+    data_file = tf.open_input(filename)
+    twitter_dict = tf.process_data(data_file)
+    data_file.close()
+    return twitter_dict
+
+
+def best_time(function, *args, repeat=3):
+    """ (function, object, int) -> float
+
+    Return the fastest of repeat timed calls of function(*args).
+    """
+
+    best = None
+    for attempt in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(name, seconds):
+    """ (str, float) -> NoneType
+
+    Print the timing of one benchmark.
+    """
+
+    print('{0:<45} {1:10.6f}'.format(name, seconds))
+
+
+def get_hubs(twitter_dict, count):
+    """ (Twitterverse dictionary, int) -> list of str
+
+    Return the count usernames with the most followers.
+    """
+
+    followers = tf.follower_index(twitter_dict)
+    return sorted(followers, key=lambda name: -len(followers[name]))[:count]
+
+
+def naive_mutual_follows(twitter_dict, username):
+    """ (Twitterverse dictionary, str) -> list of str
+
+    Return the mutual follows of username using all_followers.
+    """
+
+    following = twitter_dict[username]['following']
+    return sorted(name for name in tf.all_followers(twitter_dict, username)
+                  if name in following)
+
+
+def naive_common_followers(twitter_dict, a, b):
+    """ (Twitterverse dictionary, str, str) -> list of str
+
+    Return the common followers of a and b using all_followers.
+    """
+
+    b_followers = tf.all_followers(twitter_dict, b)
+    return sorted(name for name in tf.all_followers(twitter_dict, a)
+                  if name in b_followers)
+
+
+def naive_who_to_follow(twitter_dict, username, k):
+    """ (Twitterverse dictionary, str, int) -> list of tuple of (str, int)
+
+    Return the who-to-follow recommendations of username using list
+    membership.
+    """
+
+    following = twitter_dict[username]['following']
+    counts = {}
+    for name in following:
+        for other in twitter_dict[name]['following']:
+            if other != username and other not in following:
+                counts[other] = counts.get(other, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+def benchmark_adjacency(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Compare mutual follows, common followers and who-to-follow on the graph
+    index with the same queries built on all_followers.
+    """
+
+    hubs = get_hubs(twitter_dict, 2)
+    typical = sorted(twitter_dict)[len(twitter_dict) // 2]
+    report('build_index', best_time(tg.build_index, twitter_dict, repeat=1))
+    index = tg.get_index(twitter_dict)
+    report('get_index (cached)', best_time(tg.get_index, twitter_dict))
+    for username in [hubs[0], typical]:
+        assert naive_mutual_follows(twitter_dict, username) == \
+            tg.mutual_follows(twitter_dict, username, index)
+        report('mutual follows {0} (all_followers)'.format(username),
+               best_time(naive_mutual_follows, twitter_dict, username))
+        report('mutual follows {0} (index)'.format(username),
+               best_time(tg.mutual_follows, twitter_dict, username, index))
+    for a, b in [(hubs[0], hubs[1]), (hubs[0], typical)]:
+        assert naive_common_followers(twitter_dict, a, b) == \
+            tg.common_followers(twitter_dict, a, b, index)
+        report('common followers {0} {1} (all_followers)'.format(a, b),
+               best_time(naive_common_followers, twitter_dict, a, b))
+        report('common followers {0} {1} (index)'.format(a, b),
+               best_time(tg.common_followers, twitter_dict, a, b, index))
+    assert naive_who_to_follow(twitter_dict, typical, 10) == \
+        tg.who_to_follow(twitter_dict, typical, 10, index)
+    report('who to follow {0} (lists)'.format(typical),
+           best_time(naive_who_to_follow, twitter_dict, typical, 10))
+    report('who to follow {0} (index)'.format(typical),
+           best_time(tg.who_to_follow, twitter_dict, typical, 10,
+                     index))
+
+
+def benchmark_rank(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Time the influence scores from scratch and again after one new
+    following entry, when the power iteration starts from the old scores.
+    """
+
+    index = tg.build_index(twitter_dict)
+    start = time.perf_counter()
+    tg.get_ranks(twitter_dict, index)
+    report('get_ranks from scratch (numpy: {0})'.format(
+        tg.numpy is not None), time.perf_counter() - start)
+    tg.get_ranks(twitter_dict)
+    users = sorted(twitter_dict)
+    twitter_dict[users[0]]['following'].append(users[-1])
+    tg.forget_index(twitter_dict)
+    start = time.perf_counter()
+    tg.get_ranks(twitter_dict)
+    report('get_ranks after one change (with new index)',
+           time.perf_counter() - start)
+    twitter_dict[users[0]]['following'].pop()
+    tg.forget_index(twitter_dict)
+
+
+def benchmark_compressed_input(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Time decompressing and parsing twitter_dict stored with gzip, bzip2
+    and xz, against parsing the plain text file, and print the throughput
+    in megabytes of text per second.
+    """
+
+    directory = tempfile.mkdtemp()
+    plain = os.path.join(directory, 'data.txt')
+    with open(plain, 'w') as data_file:
+        write_data_file(twitter_dict, data_file)
+    size = os.path.getsize(plain)
+    filenames = [plain]
+    for extension, module in [('gz', gzip), ('bz2', bz2), ('xz', lzma)]:
+        filename = plain + '.' + extension
+        with open(plain, 'rb') as source, module.open(filename, 'wb') as copy:
+            copy.write(source.read())
+        filenames.append(filename)
+    for filename in filenames:
+        assert load_data_file(filename) == twitter_dict
+        seconds = best_time(load_data_file, filename)
+        report('parse {0} ({1:.1f} MB/s)'.format(
+            os.path.basename(filename), size / seconds / 1e6), seconds)
+        os.remove(filename)
+    os.rmdir(directory)
+
+
+def measure_load(load, filename):
+    """ (function, str) -> tuple of (Twitterverse dictionary, int)
+
+    Return the data load reads from filename and the bytes of memory it
+    still holds once loaded, as traced by tracemalloc.
+    """
+
+    tracemalloc.start()
+    twitter_dict = load(filename)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return twitter_dict, size
+
+
+def benchmark_lazy_loading(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Compare the memory held by the data loaded with process_data and with
+    process_data_lazy, and the time of a search and filter on each.
+    """
+
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, 'data.txt')
+    with open(filename, 'w') as data_file:
+        write_data_file(twitter_dict, data_file)
+    hub = get_hubs(twitter_dict, 1)[0]
+    query = {'search': {'username': hub, 'operations': ['followers']},
+             'filter': {'location-includes': 'City'},
+             'present': {'sort-by': 'username', 'format': 'long'}}
+    results = []
+    for label, load in [('process_data', load_data_file),
+                        ('process_data_lazy', tf.process_data_lazy)]:
+        data, size = measure_load(load, filename)
+        print('{0:<45} {1:10.1f}'.format(
+            'memory of {0} (MB)'.format(label), size / 1e6))
+        report('search and filter ({0})'.format(label), best_time(
+            lambda: tf.get_filter_results(
+                data, tf.get_search_results(data, query['search']),
+                query['filter'])))
+        results.append(tf.get_present_string(
+            data, tf.get_filter_results(
+                data, tf.get_search_results(data, query['search']),
+                query['filter']), query['present']))
+        del data
+    assert results[0] == results[1]
+    os.remove(filename)
+    os.rmdir(directory)
+
+
+def benchmark_case_folding(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Compare the same loop over every user matching names and locations
+    case-sensitively, as before matching was case-insensitive, and with
+    casefold() on every candidate, then time get_filter_results itself.
+    The filter values match the data as given, so both loops check the
+    location of the same users.
+    """
+
+    usernames = list(twitter_dict)
+    filter_dict = {'name-includes': 'User 1', 'location-includes': 'City'}
+    name_part = filter_dict['name-includes']
+    location_part = filter_dict['location-includes']
+    folded_name = name_part.casefold()
+    folded_location = location_part.casefold()
+
+    def case_sensitive():
+        found = []
+        for user in usernames:
+            record = twitter_dict[user]
+            if name_part in record['name'] and \
+                    location_part in record['location']:
+                found.append(user)
+        return found
+
+    def casefold_each():
+        found = []
+        for user in usernames:
+            record = twitter_dict[user]
+            if folded_name in record['name'].casefold() and \
+                    folded_location in record['location'].casefold():
+                found.append(user)
+        return found
+
+    found = case_sensitive()
+    assert len(found) != 0 and casefold_each() == found
+    assert tf.get_filter_results(twitter_dict, usernames, filter_dict) == \
+        found
+    report('name and location (case-sensitive in)',
+           best_time(case_sensitive))
+    report('name and location (casefold() per user)',
+           best_time(casefold_each))
+    report('name and location (get_filter_results)', best_time(
+        tf.get_filter_results, twitter_dict, usernames, filter_dict))
+
+
+def benchmark_bitset_frontier(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Compare two-hop closures from the followers of the biggest hub,
+    expanded user by user and on bitset frontiers, and print the memory
+    each holds at its peak.
+    """
+
+    followers = tf.follower_index(twitter_dict)
+    start = followers[get_hubs(twitter_dict, 1)[0]]
+    tg.get_edges(tg.get_index(twitter_dict))
+    settings = tg.BITSET_MIN_USERS
+    for direction in ['followers', 'following']:
+        results = []
+        for label, min_users in [('sets', len(twitter_dict) + 1),
+                                 ('bitsets', settings)]:
+            tg.BITSET_MIN_USERS = min_users
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            results.append(sorted(tf.get_closure(
+                twitter_dict, start, direction, 2, followers)))
+            seconds = time.perf_counter() - start_time
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report('{0}*2 from {1} users ({2}, {3:.1f} MB)'.format(
+                direction, len(start), label, peak / 1e6), seconds)
+        assert results[0] == results[1]
+    tg.BITSET_MIN_USERS = settings
+
+
+def benchmark_estimate_count(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Compare counting the results of a three-hop followers search with
+    estimating the count by following the search forward, and with the
+    kept sketch tables, the first time, when the table is built, and again
+    from another user, and print the memory each holds at its peak.
+    """
+
+    hubs = get_hubs(twitter_dict, 2)
+    operations = ['followers', 'followers', 'followers']
+    index = tg.get_index(twitter_dict)
+    tg.get_adjacency(index, 'followers')
+    for label, function in [
+            ('exact count', lambda username: len(set(tf.get_search_results(
+                twitter_dict, {'username': username,
+                               'operations': operations})))),
+            ('estimate_count', lambda username: tg.estimate_count(
+                twitter_dict, {'username': username,
+                               'operations': operations}, index=index)),
+            ('estimate_count (table)', lambda username: tg.estimate_count(
+                twitter_dict, {'username': username,
+                               'operations': operations}, index=index,
+                keep_table=True))]:
+        for username in hubs:
+            tracemalloc.start()
+            start = time.perf_counter()
+            count = function(username)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report('{0} {1} = {2} ({3:.1f} MB)'.format(
+                label, username, count, peak / 1e6), seconds)
+
+
+def benchmark_partitioned(twitter_dict, workers=4):
+    """ (Twitterverse dictionary, int) -> NoneType
+
+    Compare a two-hop search and filter in one process with the same query
+    on a cluster of local worker processes, each owning a partition of the
+    users.
+    """
+
+    hub = get_hubs(twitter_dict, 1)[0]
+    spec_dict = {'username': hub, 'operations': ['followers', 'following']}
+    filter_dict = {'location-includes': 'city'}
+
+    def single():
+        return tf.get_filter_results(
+            twitter_dict, tf.get_search_results(twitter_dict, spec_dict),
+            filter_dict)
+
+    def partitioned():
+        return tp.get_filter_results(
+            cluster, tp.get_search_results(cluster, spec_dict), filter_dict)
+
+    start = time.perf_counter()
+    cluster = tp.start_cluster(twitter_dict, workers)
+    report('start_cluster ({0} workers)'.format(workers),
+           time.perf_counter() - start)
+    # The single process may expand bitset frontiers, which find the same
+    # users in another order.
+    assert sorted(single()) == sorted(partitioned())
+    report('search and filter (one process)', best_time(single))
+    report('search and filter ({0} workers)'.format(workers),
+           best_time(partitioned))
+    tp.stop_cluster(cluster)
+
+
+def benchmark_materialized_views(twitter_dict):
+    """ (Twitterverse dictionary) -> NoneType
+
+    Compare one- and two-hop searches from the biggest hub without and with
+    materialized views, and time how long the background thread takes to
+    bring the views up to date after an update that touches the hub.
+    """
+
+    hub = get_hubs(twitter_dict, 1)[0]
+    follower = tf.follower_index(twitter_dict)[hub][0]
+    specs = [{'username': hub, 'operations': ['followers']},
+             {'username': hub, 'operations': ['followers', 'followers']}]
+    for spec_dict in specs:
+        report('{0} without views'.format(spec_dict['operations']),
+               best_time(tf.get_search_results, twitter_dict, spec_dict))
+    start = time.perf_counter()
+    registry = tw.start_views(twitter_dict)
+    report('start_views ({0} views)'.format(len(registry['table'])),
+           time.perf_counter() - start)
+    for spec_dict in specs:
+        report('{0} with views'.format(spec_dict['operations']),
+               best_time(tf.get_search_results, twitter_dict, spec_dict))
+    start = time.perf_counter()
+    tf.apply_updates(twitter_dict, [('unfollow', follower, hub)])
+    tw.wait_for_views(registry)
+    report('refresh after an update', time.perf_counter() - start)
+    tf.apply_updates(twitter_dict, [('follow', follower, hub)])
+    tw.stop_views(registry)
+
+
+def benchmark_memory(user_counts):
+    """ (list of int) -> NoneType
+
+    Print the memory report of generated data of each number of users in
+    user_counts, loaded from a data file with its graph index built, so
+    that the bytes per user and per following entry can be compared across
+    sizes.
+    """
+
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, 'data.txt')
+    for user_count in user_counts:
+        with open(filename, 'w') as data_file:
+            write_data_file(make_power_law_data(user_count, 10), data_file)
+        data, size = tm.load_traced(filename)
+        tg.get_index(data)
+        print('memory of {0} users'.format(user_count))
+        tm.write_memory_report(tm.get_memory_report(data, size), sys.stdout)
+        tg.drop_index(data)
+        del data
+    os.remove(filename)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        user_count = int(sys.argv[1])
+    else:
+        user_count = 20000
+    data = make_power_law_data(user_count, 10)
+    print('{0} users'.format(user_count))
+    benchmark_adjacency(data)
+    benchmark_rank(data)
+    benchmark_compressed_input(data)
+    benchmark_lazy_loading(data)
+    benchmark_case_folding(data)
+    benchmark_bitset_frontier(data)
+    benchmark_estimate_count(data)
+    benchmark_partitioned(data)
+    benchmark_materialized_views(data)
+    benchmark_memory([user_count // 4, user_count // 2, user_count])
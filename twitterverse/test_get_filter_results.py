@@ -116,6 +116,54 @@ class TestGetFilterResults(unittest.TestCase):
         expected = ['Kinder', 'Ken', 'Tracy']
         self.assertEqual(actual, expected)
 
+    def test_filter_8(self):
+        """Test get_filter_results with usernames = ['Kinder', 'Ken', 'Alan', \
+        'Tracy'] and filter_dict = {'name-includes': 'ALAN', \
+        'location-includes': 'spadina'}
+        """
+        usernames = ['Kinder', 'Ken', 'Alan', 'Tracy']
+        filter_dict = {'name-includes': 'ALAN', 'location-includes': 'spadina'}
+
+        actual = tf.get_filter_results(twitter_dict, usernames, filter_dict)
+        expected = ['Alan']
+        self.assertEqual(actual, expected)
+
+    def test_filter_9(self):
+        """Test that get_filter_results notices a changed name.
+        """
+        data = {'a': {'name': 'Tom', 'bio': '', 'location': '', 'web': '',
+                      'following': []}}
+        filter_dict = {'name-includes': 'tom'}
+
+        self.assertEqual(tf.get_filter_results(data, ['a'], filter_dict),
+                         ['a'])
+        data['a']['name'] = 'Katie'
+        self.assertEqual(tf.get_filter_results(data, ['a'], filter_dict), [])
+
+    def test_filter_10(self):
+        """Test that usernames that are not in the data fail the following
+        filter, and that a follower filter of one of them keeps nobody,
+        without raising KeyError.
+        """
+        usernames = ['Alan', 'Hannibal', 'Ken', 'tomCruise']
+        self.assertEqual(tf.get_filter_results(
+            twitter_dict, usernames, {'following': 'Kinder'}), ['Alan', 'Ken'])
+        self.assertEqual(tf.get_filter_results(
+            twitter_dict, usernames, {'follower': 'Hannibal'}), [])
+
+    def test_filter_11(self):
+        """Test that the follower filter keeps the usernames its user
+        follows that are not in the data, unless another filter needs their
+        fields.
+        """
+        usernames = ['Ken', 'tomCruise']
+        self.assertEqual(tf.get_filter_results(
+            twitter_dict, usernames, {'follower': 'Kinder'}),
+            ['Ken', 'tomCruise'])
+        self.assertEqual(tf.get_filter_results(
+            twitter_dict, usernames, {'follower': 'Kinder',
+                                      'name-includes': ''}), ['Ken'])
+
 
 
 
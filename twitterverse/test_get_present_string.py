@@ -0,0 +1,134 @@
+import json
+import unittest
+import twitterverse_functions as tf
+
+twitter_dict = {'Kinder': {'name': 'SuperBoy',
+        'bio': 'super_friendly', 'location': '666Spadina', 'web': 'kinderchen.com',
+         'following': ['Alan','Ken', 'tomCruise', 'Tracy']},
+         'Ken': {'name': 'Ken', 'bio': 'friend_helper', 'location': 'Spadina',
+     'web': 'ken.com', 'following': ['Kinder', 'Alan', 'Adele', 'Tay']},
+        'Tracy': {'name': 'tracy', 'bio': 'Kinder is my little brother',
+        'location': 'Wilson', 'web': 'www.tracy.com', 'following': ['Kinder']},
+      'Alan': {'name': 'alanZ', 'bio': 'I need a doctor, \
+      but doctor lost his memory in S9E12', 'location': 'Spadina',
+      'web': 'AlanZhang.com', 'following': ['Kinder','Ken', 'tomCruise',
+       'Tracy', 'Hannibal', 'Breaking bad', 'Ianto Jones']}}
+
+class TestGetPresentString(unittest.TestCase):
+    """
+    Example unittest method for get_present_string and get_present_page.
+    """
+    def test_present_1(self):
+        """Test get_present_string with an offset and a limit.
+        """
+        usernames = ['Tracy', 'Alan', 'Kinder', 'Ken']
+        pres_dict = {'sort-by': 'username', 'format': 'short',
+                     'offset': '1', 'limit': '2'}
+
+        actual = tf.get_present_string(twitter_dict, usernames, pres_dict)
+        expected = "['Ken', 'Kinder']"
+        self.assertEqual(actual, expected)
+
+    def test_present_2(self):
+        """Test that paging through an unsorted query with cursors visits
+        every result exactly once.
+        """
+        query = {'search': {'username': 'Alan', 'operations': ['following']},
+                 'filter': {},
+                 'present': {'sort-by': 'none', 'format': 'short',
+                             'limit': '3'}}
+        everything = tf.get_search_results(twitter_dict, query['search'])
+
+        pages = []
+        page, cursor = tf.get_present_page(twitter_dict, query)
+        pages.append(page)
+        while cursor is not None:
+            page, cursor = tf.get_present_page(twitter_dict, query, cursor)
+            pages.append(page)
+        actual = []
+        for page in pages:
+            actual.extend(eval(page))
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(actual, everything)
+
+    def test_present_3(self):
+        """Test get_present_page on a sorted and filtered query.
+        """
+        query = {'search': {'username': 'Kinder', 'operations': ['followers']},
+                 'filter': {'location-includes': 'Spadina'},
+                 'present': {'sort-by': 'username', 'format': 'short',
+                             'offset': '1', 'limit': '1'}}
+
+        page, cursor = tf.get_present_page(twitter_dict, query)
+        self.assertEqual(page, "['Ken']")
+        self.assertEqual(cursor, None)
+
+    def test_present_4(self):
+        """Test that a cursor is rejected by a different query.
+        """
+        query = {'search': {'username': 'Alan', 'operations': ['following']},
+                 'filter': {},
+                 'present': {'sort-by': 'none', 'format': 'short',
+                             'limit': '3'}}
+        other = {'search': {'username': 'Ken', 'operations': ['following']},
+                 'filter': {},
+                 'present': {'sort-by': 'none', 'format': 'short',
+                             'limit': '3'}}
+
+        page, cursor = tf.get_present_page(twitter_dict, query)
+        self.assertRaises(ValueError, tf.get_present_page, twitter_dict,
+                          other, cursor)
+
+    def test_present_5(self):
+        """Test the jsonl format with a sort.
+        """
+        usernames = ['Tracy', 'Ken']
+        pres_dict = {'sort-by': 'username', 'format': 'jsonl'}
+
+        actual = tf.get_present_string(twitter_dict, usernames, pres_dict)
+        lines = actual.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0]),
+                         {'username': 'Ken', 'name': 'Ken',
+                          'location': 'Spadina', 'web': 'ken.com',
+                          'bio': 'friend_helper',
+                          'following': ['Kinder', 'Alan', 'Adele', 'Tay']})
+        self.assertEqual(json.loads(lines[1])['username'], 'Tracy')
+
+    def test_present_6(self):
+        """Test the count format on a generator with a limit.
+        """
+        usernames = iter(['Tracy', 'Ken', 'Alan'])
+        pres_dict = {'sort-by': 'none', 'format': 'count', 'limit': '2'}
+
+        actual = tf.get_present_string(twitter_dict, usernames, pres_dict)
+        self.assertEqual(actual, '2\n')
+
+    def test_present_7(self):
+        """Test the csv format over more than one batch of records.
+        """
+        usernames = ['Tracy'] * (tf.PRESENT_BATCH_SIZE + 1)
+        pres_dict = {'sort-by': 'none', 'format': 'csv'}
+
+        actual = tf.get_present_string(twitter_dict, usernames, pres_dict)
+        lines = actual.splitlines()
+        self.assertEqual(lines[0], 'username,name,location,web,bio,following')
+        self.assertEqual(len(lines), tf.PRESENT_BATCH_SIZE + 2)
+        self.assertEqual(lines[-1],
+                         'Tracy,tracy,Wilson,www.tracy.com,'
+                         'Kinder is my little brother,Kinder')
+
+    def test_present_8(self):
+        """Test sorting by rank, where Kinder is followed by every user.
+        """
+        usernames = ['Tracy', 'Ken', 'Kinder', 'Alan']
+        pres_dict = {'sort-by': 'rank', 'format': 'short'}
+
+        actual = eval(tf.get_present_string(twitter_dict, usernames,
+                                            pres_dict))
+        self.assertEqual(actual[0], 'Kinder')
+        self.assertEqual(sorted(actual), sorted(usernames))
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
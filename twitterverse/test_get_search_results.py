@@ -0,0 +1,317 @@
+import io
+import unittest
+import twitterverse_functions as tf
+import twitterverse_graph as tg
+
+twitter_dict = {'Kinder': {'name': 'SuperBoy',
+        'bio': 'super_friendly', 'location': '666Spadina', 'web': 'kinderchen.com',
+         'following': ['Alan','Ken', 'tomCruise', 'Tracy']},
+         'Ken': {'name': 'Ken', 'bio': 'friend_helper', 'location': 'Spadina',
+     'web': 'ken.com', 'following': ['Kinder', 'Alan', 'Adele', 'Tay']},
+        'Tracy': {'name': 'tracy', 'bio': 'Kinder is my little brother',
+        'location': 'Wilson', 'web': 'www.tracy.com', 'following': ['Kinder']},
+      'Alan': {'name': 'alanZ', 'bio': 'I need a doctor, \
+      but doctor lost his memory in S9E12', 'location': 'Spadina',
+      'web': 'AlanZhang.com', 'following': ['Kinder','Ken', 'tomCruise',
+       'Tracy', 'Hannibal', 'Breaking bad', 'Ianto Jones']}}
+
+class TestGetSearchResults(unittest.TestCase):
+    """
+    Example unittest method for get_search_results.
+    """
+    def test_search_1(self):
+        """Test get_search_results with a single following operation.
+        """
+        spec_dict = {'username': 'Tracy', 'operations': ['following']}
+
+        actual = sorted(tf.get_search_results(twitter_dict, spec_dict))
+        expected = ['Kinder']
+        self.assertEqual(actual, expected)
+
+    def test_search_2(self):
+        """Test that followers*2 matches two separate followers operations
+        joined with the users one hop away.
+        """
+        spec_dict = {'username': 'Tracy', 'operations': ['followers*2']}
+        one_hop = {'username': 'Tracy', 'operations': ['followers']}
+        two_hops = {'username': 'Tracy',
+                    'operations': ['followers', 'followers']}
+
+        actual = sorted(tf.get_search_results(twitter_dict, spec_dict))
+        expected = sorted(
+            set(tf.get_search_results(twitter_dict, one_hop)) |
+            set(tf.get_search_results(twitter_dict, two_hops)))
+        self.assertEqual(actual, expected)
+
+    def test_search_3(self):
+        """Test that following*3 skips usernames that are not in the data
+        instead of raising KeyError.
+        """
+        spec_dict = {'username': 'Alan', 'operations': ['following*3']}
+
+        actual = sorted(tf.get_search_results(twitter_dict, spec_dict))
+        expected = ['Adele', 'Alan', 'Breaking bad', 'Hannibal',
+                    'Ianto Jones', 'Ken', 'Kinder', 'Tay', 'Tracy',
+                    'tomCruise']
+        self.assertEqual(actual, expected)
+
+    def test_search_4(self):
+        """Test that a closure stops once max-results usernames are found.
+        """
+        spec_dict = {'username': 'Alan', 'operations': ['following*3'],
+                     'max-results': 3}
+
+        actual = tf.get_search_results(twitter_dict, spec_dict)
+        self.assertEqual(len(actual), 3)
+
+    def test_search_5(self):
+        """Test that a closure returns nothing once its time-limit is spent.
+        """
+        spec_dict = {'username': 'Alan', 'operations': ['following*3'],
+                     'time-limit': -1.0}
+
+        actual = tf.get_search_results(twitter_dict, spec_dict)
+        self.assertEqual(actual, [])
+
+    def test_search_6(self):
+        """Test that get_search_results leaves the specification unchanged.
+        """
+        spec_dict = {'username': 'Tracy',
+                     'operations': ['following', 'followers']}
+
+        tf.get_search_results(twitter_dict, spec_dict)
+        self.assertEqual(spec_dict['operations'], ['following', 'followers'])
+
+    def test_search_7(self):
+        """Test that searches of several hops find the same on the graph
+        index as on the following lists, through usernames that are not in
+        the data, and that the index is kept only from a search with
+        several followers hops on.
+        """
+        data = {user: dict(twitter_dict[user]) for user in twitter_dict}
+        searches = [['following', 'following'], ['following*3'],
+                    ['following', 'followers'], ['followers', 'following*2']]
+        expected = {}
+        for username in ['Kinder', 'Tracy', 'tomCruise', 'Hannibal']:
+            for operations in searches:
+                spec_dict = {'username': username, 'operations': operations}
+                expected[username, tuple(operations)] = sorted(
+                    tf.get_search_results(data, spec_dict))
+        self.assertIsNone(tg.get_cached_index(data))
+        tf.get_search_results(data, {'username': 'Ken',
+                                     'operations': ['followers*2']})
+        self.assertIsNotNone(tg.get_cached_index(data))
+        for username, operations in expected:
+            spec_dict = {'username': username,
+                         'operations': list(operations)}
+            self.assertEqual(sorted(tf.get_search_results(data, spec_dict)),
+                             expected[username, operations])
+        tg.drop_index(data)
+
+
+class TestCombinedSearch(unittest.TestCase):
+    """
+    Example unittest method for combined searches.
+    """
+    def test_combined_1(self):
+        """Test that AND, OR and NOT match the set operations on the results
+        of the separate searches.
+        """
+        left = {'username': 'Kinder', 'operations': ['followers']}
+        right = {'username': 'Tracy', 'operations': ['following*2']}
+        left_set = set(tf.get_search_results(twitter_dict, left))
+        right_set = set(tf.get_search_results(twitter_dict, right))
+
+        for operator, expected in [('AND', left_set & right_set),
+                                   ('OR', left_set | right_set),
+                                   ('NOT', left_set - right_set)]:
+            spec_dict = {'operator': operator, 'operands': [left, right]}
+            actual = set(tf.get_search_results(twitter_dict, spec_dict))
+            self.assertEqual(actual, expected)
+
+    def test_combined_2(self):
+        """Test that a search shared by two operands is carried out once.
+        """
+        shared = {'username': 'Kinder', 'operations': ['followers']}
+        longer = {'username': 'Kinder',
+                  'operations': ['followers', 'following']}
+        spec_dict = {'operator': 'OR', 'operands': [
+            {'operator': 'AND', 'operands': [shared, longer]},
+            {'operator': 'AND', 'operands': [longer, dict(shared)]}]}
+        memo = {}
+
+        tf.evaluate_search(twitter_dict, spec_dict, memo)
+        frontiers = [key for key in memo if key[0] == 'frontier']
+        self.assertEqual(len(frontiers), 2)
+
+    def test_combined_3(self):
+        """Test that single hops build neither the follower index nor the
+        graph index, that a search of several hops runs on the graph index,
+        and that only a budgeted one builds the follower index.
+        """
+        data = {user: dict(twitter_dict[user]) for user in twitter_dict}
+        spec_dict = {'operator': 'OR', 'operands': [
+            {'username': 'Kinder', 'operations': ['following']},
+            {'username': 'Ken', 'operations': ['followers']}]}
+        memo = {}
+
+        tf.evaluate_search(data, spec_dict, memo)
+        self.assertNotIn('followers', memo)
+        self.assertFalse(any(entry[0] is data for entry in tg._index_cache))
+        spec_dict['operands'].append({'username': 'Ken',
+                                      'operations': ['followers*2']})
+        tf.evaluate_search(data, spec_dict, memo)
+        self.assertNotIn('followers', memo)
+        self.assertTrue(any(entry[0] is data for entry in tg._index_cache))
+        spec_dict['operands'].append({'username': 'Ken',
+                                      'operations': ['followers*2'],
+                                      'max-results': 10})
+        tf.evaluate_search(data, spec_dict, memo)
+        self.assertIn('followers', memo)
+        tg.drop_index(data)
+
+
+class TestProcessQuery(unittest.TestCase):
+    """
+    Example unittest method for the closure syntax of process_query.
+    """
+    def test_query_1(self):
+        """Test process_query with closure operations and search budgets.
+        """
+        query_file = io.StringIO('SEARCH\ntomCruise\nfollowing*3\n'
+                                 'followers\nmax-results 50\n'
+                                 'time-limit 0.5\nFILTER\nPRESENT\n'
+                                 'sort-by username\nformat short\n')
+
+        actual = tf.process_query(query_file)['search']
+        expected = {'username': 'tomCruise',
+                    'operations': ['following*3', 'followers'],
+                    'max-results': 50, 'time-limit': 0.5}
+        self.assertEqual(actual, expected)
+
+    def test_query_2(self):
+        """Test that process_query rejects a malformed closure operation.
+        """
+        query_file = io.StringIO('SEARCH\ntomCruise\nfollowing*0\nFILTER\n'
+                                 'PRESENT\nsort-by username\nformat short\n')
+
+        self.assertRaises(ValueError, tf.process_query, query_file)
+
+    def test_query_3(self):
+        """Test process_query with SEARCH blocks joined by AND and NOT.
+        """
+        query_file = io.StringIO('SEARCH\ntomCruise\nfollowers\nAND\n'
+                                 'SEARCH\nkatieH\nfollowers\nfollowers\n'
+                                 'NOT\nSEARCH\nkatieH\nFILTER\nPRESENT\n'
+                                 'sort-by username\nformat short\n')
+
+        actual = tf.process_query(query_file)['search']
+        expected = {'operator': 'NOT', 'operands': [
+            {'operator': 'AND', 'operands': [
+                {'username': 'tomCruise', 'operations': ['followers']},
+                {'username': 'katieH',
+                 'operations': ['followers', 'followers']}]},
+            {'username': 'katieH', 'operations': []}]}
+        self.assertEqual(actual, expected)
+
+
+class TestBitsetFrontier(unittest.TestCase):
+    """
+    Example unittest method for searches on bitset frontiers.
+    """
+    def setUp(self):
+        """Make data of 5000 users, each following the next 1 to 3 users
+        and user 0, and remember the bitset settings.
+        """
+        self.data = {}
+        for number in range(5000):
+            following = ['u{0}'.format((number + step) % 5000)
+                         for step in range(1, number % 3 + 2)]
+            self.data['u{0}'.format(number)] = {
+                'name': '', 'bio': '', 'location': '', 'web': '',
+                'following': following + ['u0']}
+        self.settings = (tg.BITSET_MIN_USERS, tg.BITSET_SHARE)
+
+    def tearDown(self):
+        """Restore the bitset settings.
+        """
+        tg.BITSET_MIN_USERS, tg.BITSET_SHARE = self.settings
+
+    def search(self, spec_dict, bitsets, filter_dict=None):
+        """Return the sorted results of spec_dict, with or without bitset
+        frontiers.
+        """
+        if bitsets:
+            tg.BITSET_MIN_USERS = 1
+            tg.BITSET_SHARE = 0.01
+        else:
+            tg.BITSET_MIN_USERS = len(self.data) + 1
+        return sorted(tf.iter_search_results(self.data, spec_dict,
+                                             filter_dict))
+
+    def test_bitset_1(self):
+        """Test that bitset frontiers find the same users.
+        """
+        if tg.numpy is None:
+            self.skipTest('bitset frontiers need numpy')
+        for operations in [['followers', 'followers'], ['following*40'],
+                           ['followers', 'following*3', 'followers']]:
+            spec_dict = {'username': 'u0', 'operations': operations}
+            self.assertEqual(self.search(spec_dict, True),
+                             self.search(spec_dict, False))
+
+    def test_bitset_2(self):
+        """Test that the following and follower filters drop users early.
+        """
+        if tg.numpy is None:
+            self.skipTest('bitset frontiers need numpy')
+        spec_dict = {'username': 'u0',
+                     'operations': ['followers', 'followers*2']}
+        filter_dict = {'following': 'u7', 'follower': 'u4'}
+        found = self.search(spec_dict, False)
+        expected = tf.get_filter_results(self.data, found, filter_dict)
+        actual = self.search(spec_dict, True, filter_dict)
+        self.assertLess(len(actual), len(found))
+        self.assertEqual(tf.get_filter_results(self.data, actual,
+                                               filter_dict), expected)
+
+    def test_bitset_3(self):
+        """Test that a combined search finds the same with and without
+        bitset frontiers, building the follower index neither way.
+        """
+        if tg.numpy is None:
+            self.skipTest('bitset frontiers need numpy')
+        spec_dict = {'operator': 'NOT', 'operands': [
+            {'username': 'u0', 'operations': ['followers', 'followers']},
+            {'username': 'u3', 'operations': ['following*2']}]}
+        results = []
+        for bitsets in [True, False]:
+            tg.BITSET_MIN_USERS = 1
+            tg.BITSET_SHARE = 0
+            if not bitsets:
+                tg.BITSET_MIN_USERS = len(self.data) + 1
+            memo = {}
+            results.append(tf.evaluate_search(self.data, spec_dict, memo))
+            self.assertNotIn('followers', memo)
+        self.assertEqual(results[0], results[1])
+
+    def test_bitset_4(self):
+        """Test that bitset frontiers follow a following list edited in
+        place that keeps its length, once forget_index is called.
+        """
+        if tg.numpy is None:
+            self.skipTest('bitset frontiers need numpy')
+        spec_dict = {'username': 'u10', 'operations': ['followers*3']}
+        tg.BITSET_MIN_USERS = 1
+        tg.BITSET_SHARE = 0
+        before = tf.get_search_results(self.data, spec_dict)
+        self.data['u4000']['following'][0] = 'u10'
+        tg.forget_index(self.data)
+        after = tf.get_search_results(self.data, spec_dict)
+        self.assertEqual(sorted(after), self.search(spec_dict, False))
+        self.assertNotIn('u4000', before)
+        self.assertIn('u4000', after)
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,122 @@
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+import twitterverse_functions as tf
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(HERE, 'data.txt')
+QUERY = os.path.join(HERE, 'query3.txt')
+
+
+def load(filename):
+    """Return the data in filename, read through open_input.
+    """
+    data_file = tf.open_input(filename)
+    data = tf.process_data(data_file)
+    data_file.close()
+    return data
+
+
+class TestOpenInput(unittest.TestCase):
+    """
+    Example unittest method for reading compressed data with open_input.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compressed(self):
+        """Test that gzip, bzip2 and xz copies of data.txt give the same
+        Twitterverse dictionary as the plain file.
+        """
+        expected = load(DATA)
+        for module in [gzip, bz2, lzma]:
+            filename = os.path.join(self.directory, 'data.bin')
+            # The name hides the format, which open_input must detect.
+            with open(DATA, 'rb') as source, \
+                    module.open(filename, 'wb') as copy:
+                copy.write(source.read())
+            self.assertEqual(load(filename), expected)
+
+    def test_compressed_query(self):
+        """Test process_query on a gzip copy of query3.txt.
+        """
+        filename = os.path.join(self.directory, 'query3.txt.gz')
+        with open(QUERY, 'rb') as source, \
+                gzip.open(filename, 'wb') as copy:
+            copy.write(source.read())
+        query_file = tf.open_input(filename)
+        actual = tf.process_query(query_file)
+        query_file.close()
+        with open(QUERY) as query_file:
+            expected = tf.process_query(query_file)
+        self.assertEqual(actual, expected)
+
+
+class TestProcessDataLazy(unittest.TestCase):
+    """
+    Example unittest method for process_data_lazy.
+    """
+    def test_lazy_fields(self):
+        """Test that every field of every user matches process_data, for a
+        file with a mix of line endings.
+        """
+        filename = os.path.join(HERE, 'rdata.txt')
+        expected = load(filename)
+        actual = tf.process_data_lazy(filename)
+
+        self.assertEqual(list(actual), list(expected))
+        for user in expected:
+            self.assertFalse(dict.__contains__(actual[user], 'bio'))
+            for key in ['name', 'location', 'web', 'bio', 'following']:
+                self.assertEqual(actual[user][key], expected[user][key])
+
+    def test_lazy_dict(self):
+        """Test that a lazy user looks like the user dict it stands for.
+        """
+        expected = load(DATA)
+        actual = tf.process_data_lazy(DATA)
+
+        self.assertEqual(actual, expected)
+        for user in expected:
+            self.assertEqual(dict(actual[user]), expected[user])
+            self.assertEqual(sorted(actual[user].items()),
+                             sorted(expected[user].items()))
+            self.assertEqual(actual[user].get('bio'), expected[user]['bio'])
+            self.assertIn('web', actual[user])
+            self.assertEqual(len(actual[user]), len(expected[user]))
+        user = actual[sorted(actual)[0]].copy()
+        user['bio'] = 'changed'
+        self.assertNotEqual(user, expected[sorted(actual)[0]])
+
+    def test_lazy_present(self):
+        """Test that the long format is the same for lazy and eager data.
+        """
+        expected = load(DATA)
+        actual = tf.process_data_lazy(DATA)
+        usernames = sorted(expected)
+        pres_dict = {'sort-by': 'username', 'format': 'long'}
+
+        self.assertEqual(
+            tf.get_present_string(actual, list(usernames), pres_dict),
+            tf.get_present_string(expected, list(usernames), pres_dict))
+
+    def test_lazy_compressed(self):
+        """Test that process_data_lazy rejects a compressed file.
+        """
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'data.txt.gz')
+        with open(DATA, 'rb') as source, gzip.open(filename, 'wb') as copy:
+            copy.write(source.read())
+        self.assertRaises(ValueError, tf.process_data_lazy, filename)
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
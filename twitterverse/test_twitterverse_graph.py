@@ -0,0 +1,183 @@
+import unittest
+import twitterverse_functions as tf
+import twitterverse_graph as tg
+
+twitter_dict = {'Kinder': {'name': 'SuperBoy',
+        'bio': 'super_friendly', 'location': '666Spadina', 'web': 'kinderchen.com',
+         'following': ['Alan','Ken', 'tomCruise', 'Tracy']},
+         'Ken': {'name': 'Ken', 'bio': 'friend_helper', 'location': 'Spadina',
+     'web': 'ken.com', 'following': ['Kinder', 'Alan', 'Adele', 'Tay']},
+        'Tracy': {'name': 'tracy', 'bio': 'Kinder is my little brother',
+        'location': 'Wilson', 'web': 'www.tracy.com', 'following': ['Kinder']},
+      'Alan': {'name': 'alanZ', 'bio': 'I need a doctor, \
+      but doctor lost his memory in S9E12', 'location': 'Spadina',
+      'web': 'AlanZhang.com', 'following': ['Kinder','Ken', 'tomCruise',
+       'Tracy', 'Hannibal', 'Breaking bad', 'Ianto Jones']}}
+
+class TestGraphQueries(unittest.TestCase):
+    """
+    Example unittest method for the graph index queries.
+    """
+    def test_mutual_follows(self):
+        """Test mutual_follows against all_followers for every user.
+        """
+        for username in twitter_dict:
+            expected = sorted(
+                name for name in tf.all_followers(twitter_dict, username)
+                if name in twitter_dict[username]['following'])
+            actual = tg.mutual_follows(twitter_dict, username)
+            self.assertEqual(actual, expected)
+
+    def test_common_followers(self):
+        """Test common_followers of a known user and a missing user.
+        """
+        actual = tg.common_followers(twitter_dict, 'Kinder', 'tomCruise')
+        expected = ['Alan']
+        self.assertEqual(actual, expected)
+
+    def test_resolve_references(self):
+        """Test the counts of resolved and dangling following entries.
+        """
+        report = tg.resolve_references(twitter_dict)
+        self.assertEqual(report['resolved'], 9)
+        self.assertEqual(report['dangling'], 7)
+        self.assertEqual(report['missing'],
+                         {'tomCruise': 2, 'Hannibal': 1, 'Breaking bad': 1,
+                          'Ianto Jones': 1, 'Adele': 1, 'Tay': 1})
+
+    def test_who_to_follow(self):
+        """Test that who_to_follow only suggests known users.
+        """
+        actual = tg.who_to_follow(twitter_dict, 'Tracy')
+        expected = [('Alan', 1), ('Ken', 1)]
+        self.assertEqual(actual, expected)
+
+    def test_index_rebuilt(self):
+        """Test that get_index rebuilds the index after forget_index, and
+        by itself once users are added.
+        """
+        data = {'a': {'name': '', 'bio': '', 'location': '', 'web': '',
+                      'following': []},
+                'b': {'name': '', 'bio': '', 'location': '', 'web': '',
+                      'following': []}}
+        self.assertEqual(tg.mutual_follows(data, 'a'), [])
+        data['a']['following'].append('b')
+        data['b']['following'].append('a')
+        tg.forget_index(data)
+        self.assertEqual(tg.mutual_follows(data, 'a'), ['b'])
+        data['c'] = {'name': '', 'bio': '', 'location': '', 'web': '',
+                     'following': ['a']}
+        self.assertEqual(tg.common_followers(data, 'a', 'a'), ['b', 'c'])
+        tg.drop_index(data)
+
+    def test_index_cache_equal_data(self):
+        """Test that the cached indexes of two equal copies of the data are
+        told apart by identity.
+        """
+        copies = [{user: dict(twitter_dict[user]) for user in twitter_dict}
+                  for number in range(2)]
+        indexes = [tg.get_index(data) for data in copies]
+        if tg.numpy is not None:
+            for index in indexes:
+                tg.get_edges(index)
+        for number in range(2):
+            self.assertIs(tg.get_index(copies[number]), indexes[number])
+            tg.drop_index(copies[number])
+
+
+
+class TestEstimateCount(unittest.TestCase):
+    """
+    Example unittest method for estimate_count.
+    """
+    def setUp(self):
+        """Make data of 3000 users, each following the next 1 to 4 users.
+        """
+        self.data = {}
+        for number in range(3000):
+            self.data['u{0}'.format(number)] = {
+                'name': '', 'bio': '', 'location': '', 'web': '',
+                'following': ['u{0}'.format((number + step) % 3000)
+                              for step in range(1, number % 4 + 2)]}
+
+    def check_estimate(self, spec_dict, error):
+        """Check the estimate of spec_dict against the exact count, allowing
+        three times the error.
+        """
+        expected = len(set(tf.get_search_results(self.data, spec_dict)))
+        actual = tg.estimate_count(self.data, spec_dict, error)
+        self.assertLessEqual(abs(actual - expected), 3 * error * expected)
+
+    def test_estimate_1(self):
+        """Test searches of several hops, with and without closures.
+        """
+        for operations in [['following'], ['following'] * 4,
+                           ['following*12'], ['followers*8', 'following']]:
+            self.check_estimate({'username': 'u7', 'operations': operations},
+                                0.05)
+
+    def test_estimate_2(self):
+        """Test that the plain Python sketches match the numpy ones, both
+        followed forward and from kept sketch tables.
+        """
+        spec_dict = {'username': 'u1', 'operations': ['followers*6',
+                                                      'following']}
+        expected = tg.estimate_count(self.data, spec_dict, 0.1)
+        numpy = tg.numpy
+        tg.numpy = None
+        try:
+            for keep_table in [False, True]:
+                actual = tg.estimate_count(dict(self.data), spec_dict, 0.1,
+                                           keep_table=keep_table)
+                self.assertEqual(actual, expected)
+        finally:
+            tg.numpy = numpy
+        self.assertEqual(tg.estimate_count(self.data, spec_dict, 0.1,
+                                           keep_table=True), expected)
+
+    def test_estimate_3(self):
+        """Test OR, and that AND and bad error bounds are refused.
+        """
+        left = {'username': 'u0', 'operations': ['following*10']}
+        right = {'username': 'u2000', 'operations': ['following*10']}
+        self.check_estimate({'operator': 'OR', 'operands': [left, right]},
+                            0.05)
+        self.assertRaises(ValueError, tg.estimate_count, self.data,
+                          {'operator': 'AND', 'operands': [left, right]})
+        self.assertRaises(ValueError, tg.estimate_count, self.data, left, 0)
+
+    def test_estimate_4(self):
+        """Test that an estimate of a filtered query is refused.
+        """
+        query = {'search': {'username': 'u0', 'operations': ['following']},
+                 'filter': {'name-includes': 'a'},
+                 'present': {'sort-by': 'none', 'format': 'count',
+                             'error': '0.1'}}
+        self.assertRaises(ValueError, tf.get_count_estimate, self.data,
+                          query)
+
+    def test_estimate_5(self):
+        """Test that only keep_table keeps sketch tables, and only those
+        within SKETCH_TABLE_BYTES, with the same estimates either way.
+        """
+        spec_dict = {'username': 'u5', 'operations': ['following*3']}
+        index = tg.build_index(self.data)
+        expected = tg.estimate_count(self.data, spec_dict, index=index)
+        self.assertNotIn('sketches', index)
+        table_bytes = tg.SKETCH_TABLE_BYTES
+        tg.SKETCH_TABLE_BYTES = 1000
+        try:
+            actual = tg.estimate_count(self.data, spec_dict, index=index,
+                                       keep_table=True)
+        finally:
+            tg.SKETCH_TABLE_BYTES = table_bytes
+        self.assertEqual(actual, expected)
+        self.assertNotIn('sketches', index)
+        actual = tg.estimate_count(self.data, spec_dict, index=index,
+                                   keep_table=True)
+        self.assertEqual(actual, expected)
+        self.assertEqual(len(index['sketches']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,106 @@
+import os
+import sys
+import unittest
+import twitterverse_functions as tf
+import twitterverse_graph as tg
+import twitterverse_memory as tm
+import twitterverse_standing as ts
+import twitterverse_views as tw
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+twitter_dict = {'Kinder': {'name': 'SuperBoy',
+        'bio': 'super_friendly', 'location': '666Spadina', 'web': 'kinderchen.com',
+         'following': ['Alan','Ken', 'tomCruise', 'Tracy']},
+         'Ken': {'name': 'Ken', 'bio': 'friend_helper', 'location': 'Spadina',
+     'web': 'ken.com', 'following': ['Kinder', 'Alan', 'Adele', 'Tay']},
+        'Tracy': {'name': 'tracy', 'bio': 'Kinder is my little brother',
+        'location': 'Wilson', 'web': 'www.tracy.com', 'following': ['Kinder']},
+      'Alan': {'name': 'alanZ', 'bio': 'I need a doctor, \
+      but doctor lost his memory in S9E12', 'location': 'Spadina',
+      'web': 'AlanZhang.com', 'following': ['Kinder','Ken', 'tomCruise',
+       'Tracy', 'Hannibal', 'Breaking bad', 'Ianto Jones']}}
+
+
+class TestMemoryReport(unittest.TestCase):
+    """
+    Example unittest method for the memory report.
+    """
+    def test_memory_1(self):
+        """Test the counts, and that the parts add up to the total.
+        """
+        report = tm.get_memory_report(twitter_dict)
+        self.assertEqual(report['users'], 4)
+        self.assertEqual(report['edges'], 16)
+        self.assertEqual(report['total'],
+                         report['records'] + report['following'] +
+                         report['strings'] + sum(report['indexes'].values()))
+        self.assertEqual(
+            report['following'],
+            sum(sys.getsizeof(twitter_dict[user]['following'])
+                for user in twitter_dict))
+
+    def test_memory_2(self):
+        """Test that the graph index is reported once it is built.
+        """
+        data = {user: dict(twitter_dict[user]) for user in twitter_dict}
+        self.assertEqual(tm.get_memory_report(data)['indexes']['graph index'],
+                         0)
+        tg.get_index(data)
+        report = tm.get_memory_report(data)
+        self.assertGreater(report['indexes']['graph index'], 0)
+        tf.drop_caches(data)
+
+    def test_memory_3(self):
+        """Test the bytes saved by interning repeated usernames.
+        """
+        data = {'a': {'name': '', 'bio': '', 'location': '', 'web': '',
+                      'following': [''.join(['x'] * 30)]},
+                'b': {'name': '', 'bio': '', 'location': '', 'web': '',
+                      'following': [''.join(['x'] * 30)] * 2}}
+        report = tm.get_memory_report(data)
+        self.assertEqual(report['interning'], sys.getsizeof('x' * 30))
+
+    def test_memory_4(self):
+        """Test that standing queries and the dependencies of views are
+        reported while they are kept.
+        """
+        data = {user: dict(twitter_dict[user]) for user in twitter_dict}
+        query = {'search': {'username': 'Kinder', 'operations': ['following']},
+                 'filter': {},
+                 'present': {'sort-by': 'username', 'format': 'short'}}
+        standing = ts.register_standing_query(data, query,
+                                              lambda added, removed: None)
+        registry = tw.start_views(data, ['Kinder'], [('followers',)])
+        tables = tm.get_memory_report(data)['indexes']['materialized views']
+        self.assertGreater(
+            tm.get_memory_report(data)['indexes']['standing queries'], 0)
+        self.assertGreater(tables, sum(
+            sys.getsizeof(obj) for obj in [registry['table']] +
+            list(registry['table'].values())))
+        tw.stop_views(registry)
+        ts.unregister_standing_query(standing)
+        report = tm.get_memory_report(data)
+        self.assertEqual(report['indexes']['standing queries'], 0)
+        self.assertEqual(report['indexes']['materialized views'], 0)
+        tf.drop_caches(data)
+
+    def test_memory_5(self):
+        """Test that the positions and cache of lazily read fields, and the
+        mapped file, are reported.
+        """
+        data = tf.process_data_lazy(os.path.join(HERE, 'data.txt'))
+        report = tm.get_memory_report(data)
+        self.assertGreater(report['indexes']['lazy fields'], 0)
+        self.assertEqual(report['mapped'], 0)
+        user = data[sorted(data)[0]]
+        self.assertEqual(user['bio'], user['bio'])
+        source = user.source
+        report = tm.get_memory_report(data)
+        self.assertEqual(report['mapped'], os.path.getsize(source.filename))
+        self.assertGreater(report['indexes']['lazy fields'],
+                           sys.getsizeof(source.offsets))
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,153 @@
+import os
+import unittest
+import twitterverse_functions as tf
+import twitterverse_graph as tg
+import twitterverse_partition as tp
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(HERE, 'data.txt')
+
+
+class TestPartitionedExecution(unittest.TestCase):
+    """
+    Example unittest method for the partitioned searches and filters.
+    """
+    @classmethod
+    def setUpClass(cls):
+        data_file = open(DATA)
+        cls.twitter_dict = tf.process_data(data_file)
+        data_file.close()
+        cls.clusters = [tp.start_cluster(cls.twitter_dict, 3),
+                        tp.start_cluster(DATA, 2)]
+
+    @classmethod
+    def tearDownClass(cls):
+        for cluster in cls.clusters:
+            tp.stop_cluster(cluster)
+
+    def test_partition_1(self):
+        """Test that every user is owned by exactly one worker.
+        """
+        partitions = tp.split_data(self.twitter_dict, 3)
+        owned = []
+        for users, followers in partitions:
+            owned.extend(users)
+        self.assertEqual(sorted(owned), sorted(self.twitter_dict))
+
+    def check_searches(self, bitsets):
+        """Check searches against get_search_results, with or without
+        bitset frontiers in get_search_results; without them, the results
+        of a single hop, which get_search_results finds on lists of
+        usernames, must also come in the same order.
+        """
+        settings = (tg.BITSET_MIN_USERS, tg.BITSET_SHARE)
+        if bitsets:
+            tg.BITSET_MIN_USERS, tg.BITSET_SHARE = 1, 0
+        else:
+            tg.BITSET_MIN_USERS = len(self.twitter_dict) + 1
+        try:
+            for username in sorted(self.twitter_dict)[:8]:
+                for operations in [['following'], ['followers', 'following'],
+                                   ['following*3'], ['followers*2']]:
+                    spec_dict = {'username': username,
+                                 'operations': operations}
+                    expected = tf.get_search_results(self.twitter_dict,
+                                                     spec_dict)
+                    for cluster in self.clusters:
+                        actual = tp.get_search_results(cluster, spec_dict)
+                        if bitsets or tf.count_hops(operations) > 1:
+                            self.assertEqual(sorted(actual), sorted(expected))
+                        else:
+                            self.assertEqual(actual, expected)
+        finally:
+            tg.BITSET_MIN_USERS, tg.BITSET_SHARE = settings
+
+    def test_partition_2(self):
+        """Test searches against get_search_results on lists of usernames
+        and on the graph index.
+        """
+        self.check_searches(False)
+
+    def test_partition_8(self):
+        """Test searches against get_search_results on bitset frontiers,
+        which find the same usernames in another order.
+        """
+        if tg.numpy is None:
+            self.skipTest('bitset frontiers need numpy')
+        self.check_searches(True)
+
+    def test_partition_3(self):
+        """Test a combined search.
+        """
+        username = sorted(self.twitter_dict)[0]
+        spec_dict = {'operator': 'NOT', 'operands': [
+            {'username': username, 'operations': ['following*2']},
+            {'username': username, 'operations': ['following']}]}
+        expected = sorted(tf.get_search_results(self.twitter_dict,
+                                                spec_dict))
+        actual = sorted(tp.get_search_results(self.clusters[0], spec_dict))
+        self.assertEqual(actual, expected)
+
+    def test_partition_4(self):
+        """Test filters against get_filter_results, in the same order.
+        """
+        usernames = list(self.twitter_dict)
+        follower = usernames[0]
+        for filter_dict in [{}, {'location-includes': 'a'},
+                            {'follower': follower, 'name-includes': 'E'},
+                            {'following': usernames[1]}]:
+            expected = tf.get_filter_results(self.twitter_dict, usernames,
+                                             filter_dict)
+            for cluster in self.clusters:
+                actual = tp.get_filter_results(cluster, usernames,
+                                               filter_dict)
+                self.assertEqual(actual, expected)
+
+    def test_partition_5(self):
+        """Test that an error in a worker is raised again by the caller.
+        """
+        self.assertRaises(AttributeError, tp.get_filter_results,
+                          self.clusters[0], list(self.twitter_dict),
+                          {'name-includes': 5})
+
+    def test_partition_7(self):
+        """Test that usernames that are not in the data pass only the
+        follower filter of a user who follows them.
+        """
+        twitter_dict = {username: dict(self.twitter_dict[username])
+                        for username in self.twitter_dict}
+        follower = sorted(twitter_dict)[0]
+        twitter_dict[follower]['following'] = \
+            twitter_dict[follower]['following'] + ['no such user']
+        usernames = sorted(twitter_dict)[:3] + ['no such user']
+        cluster = tp.start_cluster(twitter_dict, 2)
+        try:
+            for filter_dict in [{'name-includes': ''},
+                                {'follower': 'no such user'},
+                                {'follower': follower},
+                                {'follower': follower,
+                                 'location-includes': ''}]:
+                expected = tf.get_filter_results(twitter_dict, usernames,
+                                                 filter_dict)
+                actual = tp.get_filter_results(cluster, usernames,
+                                               filter_dict)
+                self.assertEqual(actual, expected)
+            self.assertIn('no such user', tf.get_filter_results(
+                twitter_dict, usernames, {'follower': follower}))
+        finally:
+            tp.stop_cluster(cluster)
+
+    def test_partition_6(self):
+        """Test presenting the fetched records.
+        """
+        usernames = sorted(self.twitter_dict)[:5]
+        pres_dict = {'sort-by': 'name', 'format': 'long'}
+        expected = tf.get_present_string(self.twitter_dict, list(usernames),
+                                         pres_dict)
+        records = tp.get_records(self.clusters[1], usernames)
+        actual = tf.get_present_string(records, list(usernames), pres_dict)
+        self.assertEqual(actual, expected)
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,92 @@
+import random
+import unittest
+import twitterverse_functions as tf
+import twitterverse_standing as ts
+from twitterverse_fixtures import make_data, make_updates
+
+
+class TestStandingQueries(unittest.TestCase):
+    """
+    Example unittest method for the standing queries.
+    """
+    def check_queries(self, operations, filter_dict):
+        """Check that standing queries starting at every fifth user follow
+        the results of running the queries again after random updates.
+        """
+        twitter_dict = make_data(40, len(operations))
+        rng = random.Random(7)
+        queries = []
+        for username in sorted(twitter_dict)[::5]:
+            query = {'search': {'username': username,
+                                'operations': operations},
+                     'filter': filter_dict,
+                     'present': {'sort-by': 'username', 'format': 'short'}}
+            changes = []
+            standing = ts.register_standing_query(
+                twitter_dict, query,
+                lambda added, removed, changes=changes:
+                changes.append((added, removed)))
+            queries.append((query, standing, changes))
+        for batch in range(30):
+            before = [ts.get_standing_results(standing)
+                      for query, standing, changes in queries]
+            tf.apply_updates(twitter_dict, make_updates(twitter_dict, 5, rng))
+            for number in range(len(queries)):
+                query, standing, changes = queries[number]
+                expected = sorted(set(tf.get_filter_results(
+                    twitter_dict,
+                    tf.get_search_results(twitter_dict, query['search']),
+                    query['filter'])))
+                actual = ts.get_standing_results(standing)
+                self.assertEqual(actual, expected)
+                if actual != before[number]:
+                    added, removed = changes.pop()
+                    self.assertEqual(
+                        sorted(set(before[number]) - set(removed) |
+                               set(added)), actual)
+                self.assertEqual(changes, [])
+        for query, standing, changes in queries:
+            ts.unregister_standing_query(standing)
+
+    def test_standing_1(self):
+        """Test one following operation without a filter.
+        """
+        self.check_queries(['following'], {})
+
+    def test_standing_2(self):
+        """Test mixed operations without a filter.
+        """
+        self.check_queries(['following', 'followers', 'following'], {})
+
+    def test_standing_3(self):
+        """Test followers operations with name and following filters.
+        """
+        self.check_queries(['followers', 'followers'],
+                           {'name-includes': 'ann', 'following': 'u3'})
+
+    def test_standing_4(self):
+        """Test a follower filter.
+        """
+        self.check_queries(['following', 'followers'],
+                           {'follower': 'u1', 'location-includes': 'TOR'})
+
+    def test_standing_6(self):
+        """Test a follower filter alone, which usernames that are not in
+        the data can pass.
+        """
+        self.check_queries(['following', 'following'], {'follower': 'u2'})
+        self.check_queries(['followers', 'following'], {'follower': 'u4'})
+
+    def test_standing_5(self):
+        """Test that closure operations are refused.
+        """
+        twitter_dict = make_data(5, 0)
+        query = {'search': {'username': 'u0', 'operations': ['following*2']},
+                 'filter': {},
+                 'present': {'sort-by': 'username', 'format': 'short'}}
+        self.assertRaises(ValueError, ts.register_standing_query,
+                          twitter_dict, query, print)
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
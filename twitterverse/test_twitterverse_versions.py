@@ -0,0 +1,182 @@
+import random
+import threading
+import unittest
+import twitterverse_functions as tf
+import twitterverse_graph as tg
+import twitterverse_standing as ts
+import twitterverse_versions as tv
+import twitterverse_views as tw
+from twitterverse_fixtures import make_data, move_follow
+
+
+class TestVersions(unittest.TestCase):
+    """
+    Example unittest method for the versioned snapshots.
+    """
+    def test_versions_1(self):
+        """Test that a held version does not change and shares the users
+        the updates did not change.
+        """
+        twitter_dict = make_data(20, 0)
+        store = tv.make_store(twitter_dict)
+        old = tv.acquire_version(store)
+        expected = {name: list(old[name]['following']) for name in old}
+        name = old['u2']['name']
+        updates = [('unfollow', 'u1', old['u1']['following'][0]),
+                   ('profile', 'u2', 'name', 'Two')]
+        self.assertEqual(tv.commit_updates(store, updates), updates)
+        self.assertEqual({name: old[name]['following'] for name in old},
+                         expected)
+        self.assertEqual(old['u2']['name'], name)
+        with tv.read_version(store) as new:
+            self.assertEqual(len(new['u1']['following']),
+                             len(expected['u1']) - 1)
+            self.assertEqual(new['u2']['name'], 'Two')
+            self.assertIs(new['u3'], old['u3'])
+            self.assertIsNot(new['u1'], old['u1'])
+        tv.release_version(store, old)
+
+    def test_versions_2(self):
+        """Test that a batch with a bad update publishes nothing.
+        """
+        store = tv.make_store(make_data(5, 1))
+        first = store['current']
+        self.assertRaises(KeyError, tv.commit_updates, store,
+                          [('follow', 'u0', 'u4'), ('follow', 'nobody', 'u0')])
+        self.assertIs(store['current'], first)
+        updates = [('profile', 'u0', 'name', 'Zero')]
+        self.assertEqual(tv.commit_updates(store, updates), updates)
+        self.assertEqual(store['number'], 1)
+
+    def test_versions_3(self):
+        """Test that an old version leaves the caches once its last reader
+        releases it.
+        """
+        store = tv.make_store(make_data(10, 2))
+        old = tv.acquire_version(store)
+        tg.get_index(old)
+        tv.commit_updates(store, move_follow(old, random.Random(0)))
+        self.assertTrue(any(entry[0] is old for entry in tg._index_cache))
+        tv.release_version(store, old)
+        self.assertFalse(any(entry[0] is old for entry in tg._index_cache))
+        self.assertEqual(store['readers'], {})
+
+    def test_versions_4(self):
+        """Test that readers running with a writer always see every follow,
+        through the graph index, the filters and bitset hops as well.
+        """
+        store = tv.make_store(make_data(200, 3))
+        stop = threading.Event()
+        problems = []
+        checks = []
+        settings = (tg.BITSET_MIN_USERS, tg.BITSET_SHARE)
+        tg.BITSET_MIN_USERS, tg.BITSET_SHARE = 1, 0
+        self.addCleanup(setattr, tg, 'BITSET_MIN_USERS', settings[0])
+        self.addCleanup(setattr, tg, 'BITSET_SHARE', settings[1])
+
+        def read():
+            try:
+                while not stop.is_set():
+                    with tv.read_version(store) as twitter_dict:
+                        check(twitter_dict)
+                    checks.append(twitter_dict)
+            except Exception as error:
+                problems.append(error)
+
+        def check(twitter_dict):
+            follows = sum(len(user['following'])
+                          for user in twitter_dict.values())
+            known = sum(name in twitter_dict
+                        for user in twitter_dict.values()
+                        for name in user['following'])
+            total = sum(len(tf.all_followers(twitter_dict, name))
+                        for name in twitter_dict)
+            if follows != 603 or total != known:
+                problems.append((follows, total))
+            index = tg.get_index(twitter_dict)
+            if sum(map(len, index['following'])) != follows:
+                problems.append(index['following'])
+            if len(tg._index_cache) > tg.INDEX_CACHE_SIZE:
+                problems.append(len(tg._index_cache))
+            names = sorted(twitter_dict)
+            found = tf.get_filter_results(twitter_dict, names,
+                                          {'name-includes': 'ANN'})
+            if found != [name for name in names
+                         if 'ann' in twitter_dict[name]['name'].lower()]:
+                problems.append(found)
+            found = tf.get_search_results(
+                twitter_dict, {'username': 'u0',
+                               'operations': ['followers', 'followers']})
+            followers = tf.all_followers(twitter_dict, 'u0')
+            expected = set()
+            for name in followers:
+                expected.update(tf.all_followers(twitter_dict, name))
+            if sorted(found) != sorted(expected):
+                problems.append(found)
+
+        readers = [threading.Thread(target=read) for number in range(3)]
+        for reader in readers:
+            reader.start()
+        rng = random.Random(4)
+        try:
+            # Keep writing until the readers have checked many versions.
+            while not problems and (len(checks) < 100 or
+                                    len(set(map(id, checks))) < 20):
+                tv.commit_updates(store, move_follow(store['current'], rng))
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+        self.assertEqual(problems, [])
+        self.assertEqual(store['readers'], {})
+
+    def test_versions_5(self):
+        """Test that a commit copies only the shard it changes, and that
+        the next version shares the graph index after a profile update.
+        """
+        store = tv.make_store(make_data(3 * tv.SHARD_SIZE, 5))
+        old = store['current']
+        index = tg.get_index(old)
+        tv.commit_updates(store, [('profile', 'u1', 'name', 'One')])
+        new = store['current']
+        self.assertIsNot(new.shards[0], old.shards[0])
+        self.assertIs(new.shards[1], old.shards[1])
+        self.assertIs(tg.get_index(new), index)
+        self.assertEqual(dict(new.items()), {name: new[name] for name in old})
+
+    def test_versions_6(self):
+        """Test that standing queries and views on the store follow its
+        commits.
+        """
+        store = tv.make_store(make_data(50, 6))
+        query = {'search': {'username': 'u0',
+                            'operations': ['following', 'followers']},
+                 'filter': {}, 'present': {}}
+        changes = []
+        standing = ts.register_standing_query(
+            store['current'], query,
+            lambda added, removed: changes.append((added, removed)))
+        registry = tw.start_views(store['current'], ['u0'],
+                                  [('following', 'followers')])
+        rng = random.Random(6)
+        try:
+            for batch in range(20):
+                tv.commit_updates(store, move_follow(store['current'], rng))
+                self.assertTrue(tw.wait_for_views(registry, 10))
+                with tv.read_version(store) as twitter_dict:
+                    expected = sorted(set(tf.get_search_results(
+                        dict(twitter_dict.items()), query['search'])))
+                    self.assertEqual(ts.get_standing_results(standing),
+                                     expected)
+                    self.assertEqual(sorted(set(tf.get_search_results(
+                        twitter_dict, query['search']))), expected)
+                    self.assertEqual(tf.get_view(
+                        twitter_dict, query['search'])[0], 2)
+        finally:
+            tw.stop_views(registry)
+            ts.unregister_standing_query(standing)
+        self.assertNotEqual(changes, [])
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -0,0 +1,80 @@
+import copy
+import random
+import unittest
+import twitterverse_functions as tf
+import twitterverse_views as tw
+from twitterverse_fixtures import make_data, make_updates
+
+
+class TestMaterializedViews(unittest.TestCase):
+    """
+    Example unittest method for the materialized views.
+    """
+    def setUp(self):
+        self.twitter_dict = make_data(60, 0, skewed=True)
+        self.registry = tw.start_views(self.twitter_dict)
+
+    def tearDown(self):
+        tw.stop_views(self.registry)
+
+    def check_searches(self, usernames):
+        """Check searches from usernames against the same searches on a copy
+        of the data without views, which may find them in another order.
+        """
+        plain = copy.deepcopy(self.twitter_dict)
+        for username in usernames:
+            for operations in [['followers'], ['followers', 'followers'],
+                               ['followers', 'followers', 'following'],
+                               ['following', 'following'],
+                               ['following', 'followers*2']]:
+                spec_dict = {'username': username, 'operations': operations}
+                self.assertEqual(
+                    sorted(tf.get_search_results(self.twitter_dict,
+                                                 spec_dict)),
+                    sorted(tf.get_search_results(plain, spec_dict)))
+
+    def test_views_1(self):
+        """Test that the most followed users get views that searches use.
+        """
+        hot = tw.get_hot_accounts(self.twitter_dict, tw.VIEW_TOP)
+        self.assertEqual(len(self.registry['table']),
+                         len(hot) * len(tw.VIEW_OPERATIONS))
+        spec_dict = {'username': hot[0],
+                     'operations': ['followers', 'followers', 'following']}
+        self.assertEqual(tf.get_view(self.twitter_dict, spec_dict)[0], 2)
+        spec_dict['max-results'] = 5
+        self.assertEqual(tf.get_view(self.twitter_dict, spec_dict)[0], 0)
+        self.check_searches(hot)
+
+    def test_views_2(self):
+        """Test that searches are right just after updates and once the
+        views are found again.
+        """
+        rng = random.Random(1)
+        usernames = tw.get_hot_accounts(self.twitter_dict, tw.VIEW_TOP)
+        for batch in range(20):
+            tf.apply_updates(self.twitter_dict,
+                             make_updates(self.twitter_dict, 4, rng,
+                                          sorted(self.twitter_dict)[:5]))
+            self.check_searches(usernames[:3])
+            self.assertTrue(tw.wait_for_views(self.registry, 10))
+            self.check_searches(usernames)
+        self.assertEqual(len(self.registry['table']),
+                         len(usernames) * len(tw.VIEW_OPERATIONS))
+
+    def test_views_3(self):
+        """Test a combined search that starts from views.
+        """
+        usernames = tw.get_hot_accounts(self.twitter_dict, 2)
+        spec_dict = {'operator': 'OR', 'operands': [
+            {'username': usernames[0], 'operations': ['followers']},
+            {'username': usernames[1],
+             'operations': ['following', 'following', 'followers']}]}
+        expected = sorted(tf.get_search_results(
+            copy.deepcopy(self.twitter_dict), spec_dict))
+        self.assertEqual(sorted(tf.get_search_results(self.twitter_dict,
+                                                      spec_dict)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
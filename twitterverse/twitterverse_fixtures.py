@@ -0,0 +1,90 @@
+"""
+Random Twitterverse dictionaries and batches of updates for the tests of
+standing queries, materialized views and versioned snapshots
+(for descriptions of the dictionaries, see twitterverse_functions)
+
+The users are named u0, u1, ...; the usernames in GHOSTS are followed by
+some of them but are not in the data, as "Hannibal" and "Ianto Jones" are
+in the data files.
+"""
+
+import random
+
+
+# The usernames that are followed but are not in the data.
+GHOSTS = ['ghost0', 'ghost1', 'ghost2']
+
+# The names and locations users are given, in mixed case for the
+# case-insensitive filters.
+NAMES = ['Ann', 'Bob', 'ann B']
+LOCATIONS = ['Toronto', 'Paris']
+
+
+def make_data(users, seed, skewed=False):
+    """(int, int, bool) -> Twitterverse dictionary
+
+    Return random data of the given number of users, each following three
+    others, and each username of GHOSTS followed by one random user. If
+    skewed, lower numbered users have more followers.
+    """
+
+    rng = random.Random(seed)
+    names = ['u{0}'.format(number) for number in range(users)]
+    twitter_dict = {}
+    for name in names:
+        if skewed:
+            following = set()
+            while len(following) < 3:
+                following.add(names[int(rng.random() ** 3 * users)])
+            following = sorted(following)
+        else:
+            following = rng.sample(names, 3)
+        twitter_dict[name] = {'name': rng.choice(NAMES), 'bio': '', 'web': '',
+                              'location': rng.choice(LOCATIONS),
+                              'following': following}
+    for ghost in GHOSTS:
+        twitter_dict[rng.choice(names)]['following'].append(ghost)
+    return twitter_dict
+
+
+def make_updates(twitter_dict, count, rng, targets=None):
+    """(Twitterverse dictionary, int, random.Random, list of str)
+    -> list of update tuple
+
+    Return count random follow, unfollow and profile updates of
+    twitter_dict. Follows go to the usernames in targets, by default every
+    user and every username of GHOSTS. Some unfollows name a user that is
+    not followed, and change nothing.
+    """
+
+    names = sorted(twitter_dict)
+    if targets is None:
+        targets = names + GHOSTS
+    updates = []
+    for number in range(count):
+        user = rng.choice(names)
+        kind = rng.random()
+        if kind < 0.45:
+            updates.append(('follow', user, rng.choice(targets)))
+        elif kind < 0.9:
+            following = twitter_dict[user]['following'] + [user]
+            updates.append(('unfollow', user, rng.choice(following)))
+        else:
+            updates.append(('profile', user, 'name', rng.choice(NAMES)))
+    return updates
+
+
+def move_follow(twitter_dict, rng):
+    """(Twitterverse dictionary, random.Random) -> list of update tuple
+
+    Return a batch of updates that makes a random user stop following one
+    user and start following another, keeping the number of follows.
+    """
+
+    names = sorted(twitter_dict)
+    while True:
+        user = rng.choice(names)
+        other = rng.choice(names)
+        if other not in twitter_dict[user]['following']:
+            return [('unfollow', user, twitter_dict[user]['following'][0]),
+                    ('follow', user, other)]
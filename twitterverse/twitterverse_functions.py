@@ -11,16 +11,41 @@ Twitterverse dictionary:  dict of {str: dict of {str: object}}
         - key "bio", value represents a user's bio (a str)
         - key "following", value represents all the usernames of users this
           user is following (a list of str)
+    (process_data_lazy returns LazyUser values, which only read "web" and
+    "bio" from the data file when they are looked up)
+
+Update tuple: tuple of (str, str, ...) describing one change to the data
+   - ("follow", username, other_username): username starts following
+   other_username
+   - ("unfollow", username, other_username): username stops following
+   other_username
+   - ("profile", username, key, value): the "name", "location", "web" or
+   "bio" of username becomes value (a str)
 
 Query dictionary: dict of {str: dict of {str: object}}
-   - key "search", value represents a search specification dictionary
+   - key "search", value represents a search specification dictionary or a
+   combined search specification dictionary
    - key "filter", value represents a filter specification dictionary
    - key "present", value represents a presentation specification dictionary
 
 Search specification dictionary: dict of {str: object}
    - key "username", value represents the username to begin search at (a str)
    - key "operations", value represents the operations to perform
-   (a list of str)
+   (a list of str); each operation is "following", "followers", or a
+   bounded closure such as "following*3" or "followers*2" that collects
+   every user within that many hops
+   - key "max-results" might exist, value represents the number of usernames
+   a closure operation may collect before it stops early (an int)
+   - key "time-limit" might exist, value represents the number of seconds
+   the closure operations may run before they stop early (a float)
+
+Combined search specification dictionary: dict of {str: object}
+   - key "operator", value represents how to combine the results of the
+   operands (a str): "AND" keeps the usernames found by every operand, "OR"
+   the usernames found by any operand, and "NOT" the usernames found by the
+   first operand and by none of the others
+   - key "operands", value represents the searches to combine (a list of
+   search specification or combined search specification dictionaries)
 
 Filter specification dictionary: dict of {str: str}
    - key "following" might exist, value represents a username (a str)
@@ -31,11 +56,82 @@ Filter specification dictionary: dict of {str: str}
    (a case-insensitive match)
 
 Presentation specification dictionary: dict of {str: str}
-   - key "sort-by", value represents how to sort results (a str)
-   - key "format", value represents how to format results (a str)
+   - key "sort-by", value represents how to sort results (a str): by
+   "username", "name", "popularity" (most followers first) or "rank" (most
+   influential first, see twitterverse_graph.get_ranks); any other value
+   leaves them unsorted
+   - key "format", value represents how to format results (a str): "short",
+   "long", "jsonl" (one JSON object per line), "csv" (a header line, then
+   one line per user) or "count" (only the number of results)
+   - key "offset" might exist, value represents how many results to skip
+   before the first one presented (a str of digits)
+   - key "limit" might exist, value represents the largest number of results
+   to present (a str of digits)
+   - key "error" might exist, value represents the relative error allowed
+   in a count (a str of a float); the count format then estimates the number
+   of results with twitterverse_graph.estimate_count instead of finding them
+   (see get_count_estimate)
 
 """
 
+import base64
+import bz2
+import csv
+import array
+import collections.abc
+import gzip
+import io
+import itertools
+import json
+import locale
+import lzma
+import mmap
+import threading
+import time
+import zlib
+
+import twitterverse_graph
+
+# How many website and bio values each LazySource keeps cached.
+LAZY_CACHE_SIZE = 1024
+
+# The fields LazyUser records read from the data file.
+LAZY_FIELDS = ('web', 'bio')
+
+# The filters that match case-insensitively, with the field each matches.
+FOLDED_FIELDS = {'name-includes': 'name', 'location-includes': 'location'}
+
+# The functions apply_updates calls, as lists of
+# [Twitterverse dictionary, function].
+_update_listeners = []
+
+# The materialized views searches may start from, as lists of
+# [Twitterverse dictionary, dict of {tuple of (str, tuple of str): list of
+# str}]; the dict maps a username and a tuple of operations to what the
+# search of those operations from that username finds.
+_view_tables = []
+
+# Guards every read and write of _update_listeners and _view_tables, which
+# searches on other threads share with the writer.
+_registry_lock = threading.Lock()
+
+
+def open_input(filename):
+    """(str) -> file open for reading
+
+    Return filename opened for reading as text. A file compressed with \
+    gzip, bzip2 or xz is recognised by its first bytes, whatever its name, \
+    and is decompressed as it is read, so process_data and process_query \
+    can read it directly without a decompressed copy on disk.
+    """
+
+    with open(filename, 'rb') as file:
+        magic = file.read(6)
+    for prefix, module in COMPRESSED_FORMATS:
+        if magic.startswith(prefix):
+            return module.open(filename, 'rt')
+    return open(filename, 'r')
+
 
 def process_data(file):
     """
@@ -49,13 +145,32 @@ def process_data(file):
     """
     twitter_dict = {}
     # Create an empty dictionary which is supposed to contain all data.
+    for username, user in iter_data(file):
+        twitter_dict[username] = user
+    return twitter_dict
+
+
+def iter_data(file):
+    """
+    (file open for reading)
+    -> generator of tuple of (str, dict of {str: object})
+
+    Yield the username and the record of each user in the twitter data \
+    file in turn, reading only as far as that user, so that a caller that \
+    keeps some of the users never holds the rest.
+
+    >>> data_file = io.StringIO('a\\nAnn\\nOz\\n\\nHi\\nENDBIO\\nb\\nEND\\n')
+    >>> list(iter_data(data_file)) == [('a', {'name': 'Ann', \
+    'location': 'Oz', 'web': '', 'bio': 'Hi', 'following': ['b']})]
+    True
+    """
     current = file.readline().strip()
     while current != '':
         # Stop the loop until encountering an empty string.
         username = current
-        twitter_dict[username] = {'name': file.readline().strip()}
-        twitter_dict[username]['location'] = file.readline().strip()
-        twitter_dict[username]['web'] = file.readline().strip()
+        user = {'name': file.readline().strip()}
+        user['location'] = file.readline().strip()
+        user['web'] = file.readline().strip()
         bio = ''
         # Create an empty string for bio.
         current = file.readline()
@@ -63,18 +178,272 @@ def process_data(file):
             # The loop ends at the line containing 'ENDBIO'.
             bio += current
             current = file.readline()
-        twitter_dict[username]['bio'] = bio.strip()
+        user['bio'] = bio.strip()
         follow = []
         # Create an empty list for followers.
         current = file.readline().strip()
         while current != 'END':
             follow.append(current)
             current = file.readline().strip()
-        twitter_dict[username]['following'] = follow
+        user['following'] = follow
+        yield username, user
         current = file.readline().strip()
+
+
+def process_data_lazy(filename):
+    """
+    (str) -> Twitterverse dictionary
+
+    Return the data in the uncompressed data file filename, like \
+    process_data, except that only the byte positions of each user's \
+    website and bio are kept. Each user is a LazyUser, which reads those \
+    fields from the file when they are first looked up, so searches and \
+    filters never hold the bios in memory. The file must stay in place and \
+    unchanged while the data is used. Raise ValueError if filename is \
+    compressed.
+    """
+    source = LazySource(filename)
+    twitter_dict = {}
+    with open(filename, 'rb') as file:
+        if file.read(6).startswith(tuple(
+                prefix for prefix, module in COMPRESSED_FORMATS)):
+            raise ValueError('lazy loading needs an uncompressed file: '
+                             '{0!r}'.format(filename))
+        file.seek(0)
+        encoding = source.encoding
+        position = 0
+        line = file.readline()
+        while line.strip() != b'':
+            username = line.decode(encoding).strip()
+            position += len(line)
+            user = LazyUser(source, len(source.offsets) // 3)
+            line = file.readline()
+            position += len(line)
+            user['name'] = line.decode(encoding).strip()
+            line = file.readline()
+            position += len(line)
+            user['location'] = line.decode(encoding).strip()
+            web_start = position
+            line = file.readline()
+            position += len(line)
+            bio_start = position
+            line = file.readline()
+            while line.rstrip(b'\r\n') != b'ENDBIO':
+                # The loop ends at the line containing 'ENDBIO'.
+                position += len(line)
+                line = file.readline()
+            source.offsets.extend((web_start, bio_start, position))
+            position += len(line)
+            follow = []
+            line = file.readline()
+            position += len(line)
+            while line.strip() != b'END':
+                follow.append(line.decode(encoding).strip())
+                line = file.readline()
+                position += len(line)
+            user['following'] = follow
+            twitter_dict[username] = user
+            line = file.readline()
     return twitter_dict
 
 
+class LazySource:
+    """ The data file that the LazyUser values of process_data_lazy read
+    their website and bio from, mapped into memory on the first read, and
+    the byte positions of those fields. User number k's website runs from
+    offsets[3 * k] to offsets[3 * k + 1], and its bio from there to
+    offsets[3 * k + 2], so the positions of every user take 24 bytes in
+    one array. cache maps the start position of each of the last
+    LAZY_CACHE_SIZE fields read to its text, least recently read first.
+    """
+
+    def __init__(self, filename):
+        """ (LazySource, str) -> NoneType
+
+        Prepare to read fields from filename, decoding them the way open
+        does by default.
+        """
+
+        self.filename = filename
+        self.encoding = locale.getpreferredencoding(False)
+        self.offsets = array.array('q')
+        self.map = None
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def read(self, start, stop):
+        """ (LazySource, int, int) -> str
+
+        Return the text between byte positions start and stop of the file,
+        with its line endings turned into '\\n' as in a file opened as text.
+        """
+
+        if self.map is None:
+            with open(self.filename, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        text = self.map[start:stop].decode(self.encoding)
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class LazyUser(dict):
+    """ A user of a Twitterverse dictionary that holds only its number in a
+    LazySource instead of its "web" and "bio" values. They are read when
+    looked up, and kept in the cache of the LazySource, not in the LazyUser
+    itself. Looking them up with [] or get, testing
+    for them with in, and going over the keys, values or items (as dict()
+    and == do) all see them, like in any other user dict; only the dict
+    methods that change the user (such as pop) leave them out, until they
+    are set.
+    """
+
+    __slots__ = ('source', 'number')
+
+    def __init__(self, source, number):
+        """ (LazyUser, LazySource, int) -> NoneType
+
+        Make an empty user whose website and bio are those of user number
+        number of source.
+        """
+
+        dict.__init__(self)
+        self.source = source
+        self.number = number
+
+    def __missing__(self, key):
+        """ (LazyUser, str) -> str
+
+        Return the value of the lazily loaded field key.
+        """
+
+        offsets = self.source.offsets
+        if key == 'web':
+            return read_lazy_field(self.source, offsets[3 * self.number],
+                                   offsets[3 * self.number + 1]).strip()
+        if key == 'bio':
+            return read_lazy_field(self.source, offsets[3 * self.number + 1],
+                                   offsets[3 * self.number + 2]).strip()
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        """ (LazyUser, str, object) -> object
+
+        Return the value of key, or default if this user has no key.
+        """
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        """ (LazyUser, str) -> bool
+
+        Return True if and only if this user has key.
+        """
+
+        return key in LAZY_FIELDS or dict.__contains__(self, key)
+
+    def __iter__(self):
+        """ (LazyUser) -> iterator of str
+
+        Return an iterator of the keys of this user.
+        """
+
+        return itertools.chain(dict.__iter__(self), (
+            key for key in LAZY_FIELDS if not dict.__contains__(self, key)))
+
+    def __len__(self):
+        """ (LazyUser) -> int
+
+        Return how many keys this user has.
+        """
+
+        return dict.__len__(self) + sum(
+            1 for key in LAZY_FIELDS if not dict.__contains__(self, key))
+
+    def keys(self):
+        """ (LazyUser) -> set-like view of str
+
+        Return a view of the keys of this user.
+        """
+
+        return collections.abc.KeysView(self)
+
+    def values(self):
+        """ (LazyUser) -> view of object
+
+        Return a view of the values of this user.
+        """
+
+        return collections.abc.ValuesView(self)
+
+    def items(self):
+        """ (LazyUser) -> set-like view of tuple of (str, object)
+
+        Return a view of the keys and values of this user.
+        """
+
+        return collections.abc.ItemsView(self)
+
+    def __eq__(self, other):
+        """ (LazyUser, object) -> bool
+
+        Return True if and only if other is a user dict with the same keys
+        and values.
+        """
+
+        if not isinstance(other, dict):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        """ (LazyUser, object) -> bool
+
+        Return True if and only if other is not equal to this user.
+        """
+
+        if not isinstance(other, dict):
+            return NotImplemented
+        return not self == other
+
+    def __repr__(self):
+        """ (LazyUser) -> str
+
+        Return the repr of the user dict this user stands for.
+        """
+
+        return repr(dict(self.items()))
+
+    def copy(self):
+        """ (LazyUser) -> LazyUser
+
+        Return a shallow copy of this user that reads the same file.
+        """
+
+        user = LazyUser(self.source, self.number)
+        user.update(dict.items(self))
+        return user
+
+
+def read_lazy_field(source, start, stop):
+    """(LazySource, int, int) -> str
+
+    Return the text between byte positions start and stop of source, from
+    the cache of source if it is there.
+    """
+
+    with source.lock:
+        text = source.cache.get(start)
+        if text is not None:
+            source.cache.move_to_end(start)
+            return text
+        text = source.read(start, stop)
+        source.cache[start] = text
+        if len(source.cache) > LAZY_CACHE_SIZE:
+            source.cache.popitem(last=False)
+    return text
+
+
 def process_query(file):
     """(file open for reading) -> query dictionary
     precondition: the twitter data file(parameter 'file') is already opening
@@ -86,14 +455,15 @@ def process_query(file):
     twitter_query_dict = {}
     # create the outermost dict
     file.readline()
-    twitter_query_dict['search'] = {'username': file.readline().strip()}
-    operations = []
-    current = file.readline().strip()
+    search, current = process_search(file)
     while current != 'FILTER':
-        # the loop stops when encounter the string 'FILTER'.
-        operations.append(current)
-        twitter_query_dict['search']['operations'] = operations
-        current = file.readline().strip()
+        # Each AND, OR or NOT line joins the searches so far with the next
+        # SEARCH block, from left to right.
+        file.readline()
+        operand, next_line = process_search(file)
+        search = {'operator': current, 'operands': [search, operand]}
+        current = next_line
+    twitter_query_dict['search'] = search
     twitter_query_dict['filter'] = {}
     # create a empty dictionary which is supposed to contain all filter values.
     current = file.readline().strip()
@@ -111,6 +481,247 @@ def process_query(file):
     return twitter_query_dict
 
 
+def process_search(file):
+    """(file open for reading) -> tuple of (search specification dictionary, \
+    str)
+
+    precondition: the next line of file is the username of a SEARCH block.
+
+    Read the rest of one SEARCH block and return its search specification \
+    dictionary along with the line that ended it ('FILTER', 'AND', 'OR' \
+    or 'NOT').
+    """
+    spec_dict = {'username': file.readline().strip()}
+    operations = []
+    spec_dict['operations'] = operations
+    current = file.readline().strip()
+    while current not in ('FILTER', 'AND', 'OR', 'NOT'):
+        # the loop stops when encounter the end of the SEARCH block.
+        if current.startswith('max-results '):
+            spec_dict['max-results'] = int(current.split()[1])
+        elif current.startswith('time-limit '):
+            spec_dict['time-limit'] = float(current.split()[1])
+        else:
+            parse_operation(current)
+            # Reject malformed operations while the query is being read.
+            operations.append(current)
+        current = file.readline().strip()
+    return spec_dict, current
+
+
+def apply_updates(twitter_dict, updates):
+    """(Twitterverse dictionary, list of update tuple) -> list of update tuple
+
+    Apply the updates to twitter_dict in order, and return the ones that \
+    changed it (following a user twice or unfollowing a user that is not \
+    followed changes nothing). Every function added with \
+    add_update_listener for twitter_dict is called with twitter_dict and \
+    each update that changed it, just after that update, and then with \
+    twitter_dict and None once the whole batch is applied.
+
+    >>> twitter_dict = {'a': {'name': 'A', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}, \
+    'b': {'name': 'B', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> apply_updates(twitter_dict, [('follow', 'b', 'a'), \
+    ('follow', 'a', 'b'), ('profile', 'a', 'name', 'Ann')])
+    [('follow', 'b', 'a'), ('profile', 'a', 'name', 'Ann')]
+    >>> twitter_dict['b']['following']
+    ['a']
+    >>> twitter_dict['a']['name']
+    'Ann'
+    """
+
+    applied = []
+    for update in updates:
+        if apply_update(twitter_dict, update):
+            applied.append(update)
+            if update[0] != 'profile':
+                twitterverse_graph.forget_index(twitter_dict)
+            call_update_listeners(twitter_dict, update)
+    if len(applied) != 0:
+        call_update_listeners(twitter_dict, None)
+    return applied
+
+
+def call_update_listeners(twitter_dict, update):
+    """(Twitterverse dictionary, update tuple) -> NoneType
+
+    Call every function added with add_update_listener for twitter_dict \
+    with twitter_dict and update, which has just been applied to it, or \
+    None at the end of a batch of updates.
+    """
+
+    with _registry_lock:
+        listeners = [entry[1] for entry in _update_listeners
+                     if entry[0] is twitter_dict]
+    for listener in listeners:
+        listener(twitter_dict, update)
+
+
+def check_update(twitter_dict, update):
+    """(Twitterverse dictionary, update tuple) -> NoneType
+
+    Raise KeyError if the user update changes is not in twitter_dict, and \
+    ValueError if update is not a valid update tuple, which are the errors \
+    apply_update raises.
+
+    >>> check_update({}, ('follow', 'a'))
+    Traceback (most recent call last):
+    ValueError: invalid update: ('follow', 'a')
+    """
+
+    if not (update[0] in ('follow', 'unfollow') and len(update) == 3) and \
+            not (update[0] == 'profile' and len(update) == 4 and
+                 update[2] in ('name', 'location', 'web', 'bio')):
+        raise ValueError('invalid update: {0!r}'.format(update))
+    if update[1] not in twitter_dict:
+        raise KeyError(update[1])
+
+
+def apply_update(twitter_dict, update):
+    """(Twitterverse dictionary, update tuple) -> bool
+
+    Apply one update to twitter_dict and return True if and only if it \
+    changed it. Raise the errors of check_update, changing nothing.
+    """
+
+    check_update(twitter_dict, update)
+    if update[0] in ('follow', 'unfollow'):
+        following = twitter_dict[update[1]]['following']
+        if update[0] == 'follow':
+            if update[2] in following:
+                return False
+            following.append(update[2])
+            return True
+        if update[2] not in following:
+            return False
+        following.remove(update[2])
+        return True
+    user = twitter_dict[update[1]]
+    if user[update[2]] == update[3]:
+        return False
+    user[update[2]] = update[3]
+    return True
+
+
+def add_update_listener(twitter_dict, listener):
+    """(Twitterverse dictionary, function) -> NoneType
+
+    Have apply_updates call listener for the updates of twitter_dict.
+    """
+
+    with _registry_lock:
+        _update_listeners.append([twitter_dict, listener])
+
+
+def remove_update_listener(twitter_dict, listener):
+    """(Twitterverse dictionary, function) -> NoneType
+
+    Stop apply_updates calling listener for the updates of twitter_dict.
+    """
+
+    with _registry_lock:
+        for position in range(len(_update_listeners)):
+            entry = _update_listeners[position]
+            if entry[0] is twitter_dict and entry[1] is listener:
+                del _update_listeners[position]
+                return
+
+
+def drop_caches(twitter_dict):
+    """(Twitterverse dictionary) -> NoneType
+
+    Remove the graph index kept for twitter_dict, so that no cache holds \
+    twitter_dict once it is no longer used.
+    """
+
+    twitterverse_graph.drop_index(twitter_dict)
+
+
+def move_caches(twitter_dict, other):
+    """(Twitterverse dictionary, Twitterverse dictionary) -> NoneType
+
+    Have other, a copy of twitter_dict about to receive updates, take over \
+    what is kept for twitter_dict: it shares the graph index until either \
+    changes, and the update listeners and the materialized views move to \
+    it, since their owners keep them up to date with the updates of other \
+    from now on.
+    """
+
+    with _registry_lock:
+        for entry in _update_listeners + _view_tables:
+            if entry[0] is twitter_dict:
+                entry[0] = other
+    twitterverse_graph.share_index(twitter_dict, other)
+
+
+def add_view_table(twitter_dict, table):
+    """(Twitterverse dictionary, dict of {tuple of (str, tuple of str): \
+    list of str}) -> NoneType
+
+    Have the searches of twitter_dict start from the materialized views in \
+    table, which maps a username and a tuple of operations to the results \
+    of get_search_results for that search. The owner of table keeps it up \
+    to date, removing a view as soon as it might be out of date.
+    """
+
+    with _registry_lock:
+        _view_tables.append([twitter_dict, table])
+
+
+def remove_view_table(twitter_dict, table):
+    """(Twitterverse dictionary, dict of {tuple of (str, tuple of str): \
+    list of str}) -> NoneType
+
+    Stop the searches of twitter_dict using the views in table.
+    """
+
+    with _registry_lock:
+        for position in range(len(_view_tables)):
+            entry = _view_tables[position]
+            if entry[0] is twitter_dict and entry[1] is table:
+                del _view_tables[position]
+                return
+
+
+def get_view(twitter_dict, spec_dict):
+    """(Twitterverse dictionary, search specification dictionary) \
+    -> tuple of (int, list of str)
+
+    Return how many of the first operations of spec_dict the longest \
+    matching materialized view of twitter_dict carries out, and the \
+    usernames that view finds; without one, return 0 and a list of the \
+    username spec_dict starts at. Searches with a "max-results" or \
+    "time-limit" never use views, as what they find depends on those limits.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}}
+    >>> table = {('a', ('following',)): ['b']}
+    >>> add_view_table(twitter_dict, table)
+    >>> get_view(twitter_dict, {'username': 'a', \
+    'operations': ['following', 'followers']})
+    (1, ['b'])
+    >>> get_view(twitter_dict, {'username': 'a', \
+    'operations': ['followers']})
+    (0, ['a'])
+    >>> remove_view_table(twitter_dict, table)
+    """
+
+    if 'max-results' not in spec_dict and 'time-limit' not in spec_dict:
+        operations = tuple(spec_dict['operations'])
+        with _registry_lock:
+            tables = [entry[1] for entry in _view_tables
+                      if entry[0] is twitter_dict]
+        for table in tables:
+            for count in range(len(operations), 0, -1):
+                results = table.get((spec_dict['username'],
+                                     operations[:count]))
+                if results is not None:
+                    return count, results
+    return 0, [spec_dict['username']]
+
+
 def all_followers(twitter_dict, username):
     """(Twitterverse dictionary, str) -> list of str
 
@@ -177,6 +788,229 @@ def all_followers(twitter_dict, username):
     return following
 
 
+def follower_index(twitter_dict, usernames=None):
+    """(Twitterverse dictionary, iterable of str) -> dict of {str: list of str}
+
+    Return a dictionary that maps every username that is followed by \
+    somebody in twitter_dict to the usernames of all its followers, in the \
+    order of twitter_dict. Building it once costs a single pass over the \
+    data, instead of the whole-dictionary scan that all_followers needs for \
+    every username. If usernames is given, only they are mapped; the pass \
+    then skips, with one set operation each, the users who follow none of \
+    them, which makes it cheaper than a single all_followers scan.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> index = follower_index(twitter_dict)
+    >>> index['c']
+    ['a', 'b']
+    >>> index.get('a', [])
+    []
+    >>> follower_index(twitter_dict, ['b'])
+    {'b': ['a']}
+    """
+
+    followers = {}
+    if usernames is not None:
+        wanted = set(usernames)
+        for key, user in twitter_dict.items():
+            if not wanted.isdisjoint(user['following']):
+                for name in user['following']:
+                    if name in wanted:
+                        if name in followers:
+                            followers[name].append(key)
+                        else:
+                            followers[name] = [key]
+        return followers
+    for key in twitter_dict:
+        for name in twitter_dict[key]['following']:
+            if name in followers:
+                followers[name].append(key)
+            else:
+                followers[name] = [key]
+    return followers
+
+
+def parse_operation(operation):
+    """(str) -> tuple of (str, int)
+
+    Return the direction ('following' or 'followers') and the number of \
+    hops of the search operation. A plain operation is a single hop, and \
+    a closure such as 'followers*2' covers every hop up to its depth.
+    Raise ValueError if operation is not a valid search operation.
+
+    >>> parse_operation('following')
+    ('following', 1)
+    >>> parse_operation('followers*3')
+    ('followers', 3)
+    >>> parse_operation('friends')
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid search operation: 'friends'
+    """
+
+    direction, star, depth = operation.partition('*')
+    if direction in ('following', 'followers'):
+        if star == '':
+            return direction, 1
+        if depth.isdigit() and int(depth) > 0:
+            return direction, int(depth)
+    raise ValueError('invalid search operation: {0!r}'.format(operation))
+
+
+def count_hops(operations, direction=None):
+    """(list of str, str) -> int
+
+    Return how many hops in direction ('following' or 'followers'), or in \
+    either direction if it is None, the search operations take at most.
+
+    >>> count_hops(['followers', 'following', 'followers*3'], 'followers')
+    4
+    >>> count_hops(['followers', 'following', 'followers*3'])
+    5
+    """
+
+    hops = 0
+    for operation in operations:
+        hop_direction, depth = parse_operation(operation)
+        if direction is None or hop_direction == direction:
+            hops += depth
+    return hops
+
+
+def get_closure(twitter_dict, usernames, direction, depth, followers=None,
+                max_results=None, deadline=None, index=None):
+    """(Twitterverse dictionary, list of str, str, int, \
+    dict of {str: list of str}, int, float, graph index) -> list of str
+
+    precondition: direction is 'following' or 'followers' and depth > 0.
+
+    Return every username that is within depth hops of the given usernames \
+    in the given direction. Each user is expanded at most once, so users \
+    reached again on a later hop cost nothing. The search stops early, \
+    returning what it has collected so far, once max_results usernames are \
+    collected or time.perf_counter() passes deadline (None means no limit).
+    followers is a follower_index of twitter_dict; without it, a closure \
+    of several followers hops builds one, and a single hop only finds the \
+    followers of its frontier. index is the graph index of twitter_dict, \
+    if the hops should run on it (see iter_closure).
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a', 'd']}}
+    >>> result = get_closure(twitter_dict, ['a'], 'following', 2)
+    >>> result.sort()
+    >>> result
+    ['b', 'c']
+    >>> result = get_closure(twitter_dict, ['a'], 'following', 5)
+    >>> result.sort()
+    >>> result
+    ['a', 'b', 'c', 'd']
+    >>> len(get_closure(twitter_dict, ['a'], 'following', 5, max_results=2))
+    2
+    """
+
+    return list(iter_closure(twitter_dict, usernames, direction, depth,
+                             followers, max_results, deadline, index=index))
+
+
+def iter_closure(twitter_dict, usernames, direction, depth, followers=None,
+                 max_results=None, deadline=None, filter_dict=None,
+                 index=None):
+    """(Twitterverse dictionary, list of str, str, int, \
+    dict of {str: list of str}, int, float, \
+    filter specification dictionary, graph index) -> generator of str
+
+    Yield the usernames of get_closure one at a time, as soon as each one \
+    is reached, so that a caller that stops early never expands the rest.
+
+    Given index, the graph index of twitter_dict, the hops follow its \
+    lists of user ids, in which every following entry was resolved once \
+    when it was built, so they never look a user up in twitter_dict; the \
+    usernames each user leads to then come in the order of their user ids. \
+    Without it, they follow the following lists of twitter_dict, or the \
+    followers in the order of twitter_dict.
+
+    Once a frontier holds enough of all users (see \
+    twitterverse_graph.use_bitset), and the search has no budget to stop \
+    early for, the rest of it is carried out on bitset frontiers, which \
+    expand, and drop repeated users, with whole-array operations; those \
+    hops yield their usernames in alphabetical order, known ones first. \
+    filter_dict, if given, lets those hops leave out the usernames that \
+    fail its following and follower filters.
+    """
+
+    reached = set()
+    visited = set()
+    frontier = []
+    for name in usernames:
+        # The starting users count as reached only when a hop leads back to
+        # them. Keeping their order makes the order of results repeatable.
+        if name not in visited:
+            visited.add(name)
+            frontier.append(name)
+    hop = 0
+    while len(frontier) != 0 and hop < depth:
+        if max_results is None and deadline is None and \
+                twitterverse_graph.use_bitset(len(twitter_dict),
+                                              len(frontier)):
+            if index is None:
+                index = twitterverse_graph.get_index(twitter_dict)
+            yield from twitterverse_graph.iter_closure_bitset(
+                index, frontier, visited, reached, direction, depth - hop,
+                filter_dict)
+            return
+        hop_followers = followers
+        if index is not None:
+            lists = index[direction]
+            names = index['names']
+            ids = index['ids']
+        elif direction == 'followers' and followers is None:
+            if hop < depth - 1:
+                followers = follower_index(twitter_dict)
+                hop_followers = followers
+            else:
+                hop_followers = follower_index(twitter_dict, frontier)
+        next_frontier = []
+        for name in frontier:
+            if deadline is not None and time.perf_counter() > deadline:
+                return
+            if index is not None:
+                # Only a starting username can be missing from the index.
+                user_id = ids.get(name)
+                if user_id is None:
+                    neighbours = []
+                else:
+                    neighbours = map(names.__getitem__, lists[user_id])
+            elif direction == 'following':
+                record = twitter_dict.get(name)
+                if record is None:
+                    neighbours = []
+                else:
+                    neighbours = record['following']
+            else:
+                neighbours = hop_followers.get(name, [])
+            for neighbour in neighbours:
+                if neighbour not in reached:
+                    reached.add(neighbour)
+                    yield neighbour
+                    if max_results is not None and \
+                            len(reached) >= max_results:
+                        return
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+        hop += 1
+
+
 def get_search_results(twitter_dict, spec_dict):
     """(Twitterverse dictionary, search specification dictionary) \
     -> list of str
@@ -187,7 +1021,9 @@ def get_search_results(twitter_dict, spec_dict):
     format.
 
     Return a list of string that contains all usernames in twitter_dict that \
-    match the criteria given in the spec_dict.
+    match the criteria given in the spec_dict. A search of several hops \
+    may run on the graph index (see get_search_index), so the order of the \
+    usernames depends on how the hops are carried out (see iter_closure).
     >>> twitter_dict = {'a': {'name': 'a', \
     'bio': '', \
     'location': '', \
@@ -235,22 +1071,249 @@ def get_search_results(twitter_dict, spec_dict):
     >>> result.sort()
     >>> result
     ['Alan', 'Ken', 'Tracy']
+    >>> spec_dict = {'username': 'Tracy', 'operations': ['following*2']}
+    >>> result = get_search_results(twitter_dict, spec_dict)
+    >>> result.sort()
+    >>> result
+    ['Alan', 'Ken', 'Kinder', 'Tracy', 'tomCruise']
+    >>> spec_dict = {'operator': 'NOT', 'operands': [\
+    {'username': 'Tracy', 'operations': ['following*2']}, \
+    {'username': 'Kinder', 'operations': ['followers']}]}
+    >>> result = get_search_results(twitter_dict, spec_dict)
+    >>> result.sort()
+    >>> result
+    ['Kinder', 'tomCruise']
     """
-    search_lst = [spec_dict['username']]
-    op_lst = spec_dict['operations']
-    while len(op_lst) != 0:
-        current = []
-        operation = op_lst.pop(0)
-        if operation == 'following':
-            for name in search_lst:
-                current.extend(twitter_dict[name]['following'])
+    if 'operator' in spec_dict:
+        return list(evaluate_search(twitter_dict, spec_dict, {}))
+    return list(iter_search_results(twitter_dict, spec_dict))
+
+
+def iter_search_results(twitter_dict, spec_dict, filter_dict=None):
+    """(Twitterverse dictionary, search specification dictionary, \
+    filter specification dictionary) -> generator of str
+
+    Yield the usernames of get_search_results one at a time. The search \
+    starts after the longest materialized view that matches it (see \
+    get_view); every operation after that but the last one is carried out \
+    in full, and the last one only expands as many users as the caller \
+    asks for. filter_dict, if \
+    given, lets the hops of the last operation that run on bitset \
+    frontiers leave out the users that fail its following and follower \
+    filters with one bitwise and; the results still need \
+    iter_filter_results.
+
+    >>> twitter_dict = {'a': {'name': 'a', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': 'b', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': 'c', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> spec_dict = {'username': 'a', 'operations': ['following']}
+    >>> next(iter_search_results(twitter_dict, spec_dict))
+    'b'
+    """
+    if 'operator' in spec_dict:
+        yield from get_search_results(twitter_dict, spec_dict)
+        return
+    operations = spec_dict['operations']
+    done, search_lst = get_view(twitter_dict, spec_dict)
+    if done == len(operations):
+        yield from search_lst
+        return
+    deadline = None
+    if 'time-limit' in spec_dict:
+        deadline = time.perf_counter() + spec_dict['time-limit']
+    followers = None
+    index = get_search_index(twitter_dict, spec_dict, done)
+    follower_hops = count_hops(operations[done:], 'followers')
+    for position in range(done, len(operations)):
+        operation = operations[position]
+        direction, depth = parse_operation(operation)
+        if direction == 'followers' and followers is None and \
+                index is None and follower_hops > 1 and \
+                not twitterverse_graph.use_bitset(len(twitter_dict),
+                                                  len(search_lst)):
+            followers = follower_index(twitter_dict)
+            # Build the reverse edges once for a search of several
+            # followers hops, unless this operation starts on a bitset
+            # frontier and may not need them; a single hop only looks for
+            # the followers of its frontier.
+        last_filter = None
+        if position == len(operations) - 1:
+            last_filter = filter_dict
+        if '*' in operation:
+            found = iter_closure(twitter_dict, search_lst, direction, depth,
+                                 followers, spec_dict.get('max-results'),
+                                 deadline, last_filter, index)
+        else:
+            found = iter_closure(twitter_dict, search_lst, direction, 1,
+                                 followers, filter_dict=last_filter,
+                                 index=index)
+        if position == len(operations) - 1:
+            yield from found
         else:
-            for name in search_lst:
-                current.extend(all_followers(twitter_dict, name))
-        search_lst = current
+            search_lst = list(found)
 
-    return list(set(search_lst))
-    # Delete all the repeated elements in the list.
+
+def get_search_index(twitter_dict, spec_dict, done):
+    """(Twitterverse dictionary, search specification dictionary, int) \
+    -> graph index
+
+    Return the graph index the search of spec_dict should run on from its \
+    operation number done on, or None if it should run on the following \
+    lists of twitter_dict. A search of more than one hop, with no \
+    max-results or time-limit budget to stop early for, runs on the cached \
+    index if there is one. It builds the index only if it has several \
+    followers hops, which would otherwise need a follower_index of the \
+    whole data; building the index resolves every following entry once, \
+    and serves every later search until the data changes. So the order of \
+    what a search finds can depend on which searches ran before it.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}}
+    >>> get_search_index(twitter_dict, {'username': 'a', \
+    'operations': ['following', 'following']}, 0) is None
+    True
+    >>> get_search_index(twitter_dict, {'username': 'a', \
+    'operations': ['followers*2']}, 0)['names']
+    ['a', 'b']
+    >>> get_search_index(twitter_dict, {'username': 'a', \
+    'operations': ['following']}, 0) is None
+    True
+    """
+
+    operations = spec_dict['operations'][done:]
+    if 'max-results' in spec_dict or 'time-limit' in spec_dict or \
+            count_hops(operations) <= 1:
+        return None
+    if count_hops(operations, 'followers') > 1:
+        return twitterverse_graph.get_index(twitter_dict)
+    return twitterverse_graph.get_cached_index(twitter_dict)
+
+
+def evaluate_search(twitter_dict, spec_dict, memo):
+    """(Twitterverse dictionary, search specification dictionary or \
+    combined search specification dictionary, dict) -> set of str
+
+    Return the set of usernames that spec_dict finds in twitter_dict.
+
+    The searches in spec_dict are treated as a DAG: every search, every \
+    leading run of operations of a search, and every combination is \
+    stored in memo under its search_key, so a sub-search that appears \
+    more than once, or that shares its first operations with another, is \
+    only carried out once. Pass the same memo to share work between calls.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a']}}
+    >>> spec_dict = {'operator': 'AND', 'operands': [\
+    {'username': 'a', 'operations': ['following']}, \
+    {'username': 'a', 'operations': ['following', 'followers']}]}
+    >>> memo = {}
+    >>> sorted(evaluate_search(twitter_dict, spec_dict, memo))
+    ['b']
+    >>> ('frontier', ('search', 'a', ('following',), None, None)) in memo
+    True
+    """
+
+    key = search_key(spec_dict)
+    if key in memo:
+        return memo[key]
+    if 'operator' in spec_dict:
+        operands = spec_dict['operands']
+        result = set(evaluate_search(twitter_dict, operands[0], memo))
+        for operand in operands[1:]:
+            if spec_dict['operator'] == 'AND':
+                result &= evaluate_search(twitter_dict, operand, memo)
+            elif spec_dict['operator'] == 'OR':
+                result |= evaluate_search(twitter_dict, operand, memo)
+            elif spec_dict['operator'] == 'NOT':
+                result -= evaluate_search(twitter_dict, operand, memo)
+            else:
+                raise ValueError('invalid search operator: {0!r}'.format(
+                    spec_dict['operator']))
+        memo[key] = result
+        return result
+
+    operations = spec_dict['operations']
+    done = len(operations)
+    while done > 0 and ('frontier', prefix_key(spec_dict, done)) not in memo:
+        done -= 1
+    # Continue from the longest run of operations that is already known,
+    # or else from the longest materialized view.
+    if done == 0:
+        done, search_lst = get_view(twitter_dict, spec_dict)
+    else:
+        search_lst = memo['frontier', prefix_key(spec_dict, done)]
+    deadline = None
+    if 'time-limit' in spec_dict:
+        deadline = time.perf_counter() + spec_dict['time-limit']
+    index = get_search_index(twitter_dict, spec_dict, done)
+    for position in range(done, len(operations)):
+        operation = operations[position]
+        direction, depth = parse_operation(operation)
+        if direction == 'followers' and 'followers' not in memo and \
+                index is None and \
+                count_hops(operations[position:], 'followers') > 1 and \
+                not twitterverse_graph.use_bitset(len(twitter_dict),
+                                                  len(search_lst)):
+            memo['followers'] = follower_index(twitter_dict)
+            # One reverse index serves every search in the DAG, and is
+            # only built once a search expands several followers hops user
+            # by user.
+        if '*' in operation:
+            search_lst = get_closure(twitter_dict, search_lst, direction,
+                                     depth, memo.get('followers'),
+                                     spec_dict.get('max-results'), deadline,
+                                     index)
+        else:
+            search_lst = get_closure(twitter_dict, search_lst, direction, 1,
+                                     memo.get('followers'), index=index)
+        memo['frontier', prefix_key(spec_dict, position + 1)] = search_lst
+    result = set(search_lst)
+    memo[key] = result
+    return result
+
+
+def search_key(spec_dict):
+    """(search specification dictionary or combined search specification \
+    dictionary) -> tuple
+
+    Return a hashable key that is equal for searches that always find the \
+    same usernames. The operands of AND and OR are put in a fixed order, \
+    since their order does not change the result.
+
+    >>> search_key({'username': 'a', 'operations': ['followers']})
+    ('search', 'a', ('followers',), None, None)
+    >>> left = {'username': 'a', 'operations': []}
+    >>> right = {'username': 'b', 'operations': []}
+    >>> search_key({'operator': 'OR', 'operands': [left, right]}) == \
+    search_key({'operator': 'OR', 'operands': [right, left]})
+    True
+    """
+
+    if 'operator' in spec_dict:
+        keys = [search_key(operand) for operand in spec_dict['operands']]
+        if spec_dict['operator'] in ('AND', 'OR'):
+            keys.sort(key=repr)
+        return (spec_dict['operator'],) + tuple(keys)
+    return prefix_key(spec_dict, len(spec_dict['operations']))
+
+
+def prefix_key(spec_dict, count):
+    """(search specification dictionary, int) -> tuple
+
+    Return the search_key of the search that carries out only the first \
+    count operations of spec_dict.
+    """
+
+    return ('search', spec_dict['username'],
+            tuple(spec_dict['operations'][:count]),
+            spec_dict.get('max-results'), spec_dict.get('time-limit'))
 
 
 def get_filter_results(twitter_dict, usernames, filter_dict):
@@ -317,27 +1380,97 @@ def get_filter_results(twitter_dict, usernames, filter_dict):
     ['Alan', 'Ken', 'Kinder']
     """
     if not len(filter_dict) == 0:
-        name_list = []
-        for user in usernames:
-            s = True
-            # Suppose s is true
-            for key in filter_dict:
-                if s is True:
-                    if key == 'name-includes':
-                        s = filter_dict['name-includes'] in twitter_dict[user]['name']
-                    elif key == 'location-includes':
-                        s = filter_dict['location-includes'] in twitter_dict[user]['location']
-                    elif key == 'follower':
-                        s = user in twitter_dict[filter_dict['follower']]['following']
-                    elif key == 'following':
-                        s = filter_dict['following'] in twitter_dict[user]['following']
-            # To see if s is true
-            if s:
-                name_list.append(user)
-        return name_list
+        return list(iter_filter_results(twitter_dict, usernames, filter_dict))
     return usernames
 
 
+def iter_filter_results(twitter_dict, usernames, filter_dict):
+    """
+    (Twitterverse dictionary, iterable of str, filter specification dictionary)
+    -> generator of str
+
+    Yield the usernames of get_filter_results one at a time, taking the \
+    usernames from any iterable (such as iter_search_results) only as they \
+    are needed.
+
+    Each filter is prepared once: the name and location values are \
+    case-folded once and matched against each user's field case-folded, \
+    and the follower filter looks users up in a set.
+
+    A username that is not in twitter_dict (such as one that only appears \
+    in following lists) has no fields or following list to match, so it \
+    fails the name, location and following filters, but it passes the \
+    follower filter of a user who follows it. The follower filter of a \
+    username that is not in twitter_dict keeps nobody, since it follows \
+    nobody.
+
+    >>> twitter_dict = {'a': {'name': 'Ann', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'z']}, \
+    'b': {'name': 'Bob', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> list(iter_filter_results(twitter_dict, ['a', 'b', 'z'], \
+    {'follower': 'a'}))
+    ['b', 'z']
+    >>> list(iter_filter_results(twitter_dict, ['a', 'b', 'z'], \
+    {'follower': 'a', 'name-includes': ''}))
+    ['b']
+    >>> list(iter_filter_results(twitter_dict, ['a', 'b'], \
+    {'follower': 'z'}))
+    []
+    """
+    if len(filter_dict) == 0:
+        yield from usernames
+        return
+    folded_filter = fold_filter(filter_dict)
+    name_part = folded_filter.get('name-includes')
+    location_part = folded_filter.get('location-includes')
+    followed = None
+    if 'follower' in folded_filter:
+        followed = set()
+        if folded_filter['follower'] in twitter_dict:
+            followed.update(
+                twitter_dict[folded_filter['follower']]['following'])
+    following = folded_filter.get('following')
+    needs_record = name_part is not None or location_part is not None or \
+        following is not None
+    for user in usernames:
+        record = twitter_dict.get(user)
+        if record is None:
+            if not needs_record and followed is not None and \
+                    user in followed:
+                yield user
+            continue
+        if name_part is not None and \
+                name_part not in record['name'].casefold():
+            continue
+        if location_part is not None and \
+                location_part not in record['location'].casefold():
+            continue
+        if followed is not None and user not in followed:
+            continue
+        if following is not None and following not in record['following']:
+            continue
+        yield user
+
+
+def fold_filter(filter_dict):
+    """(filter specification dictionary) -> filter specification dictionary
+
+    Return a copy of filter_dict with its name-includes and \
+    location-includes values case-folded.
+
+    >>> fold_filter({'name-includes': 'Tom', 'following': 'katieH'}) == \
+    {'name-includes': 'tom', 'following': 'katieH'}
+    True
+    """
+    folded_filter = {}
+    for key in filter_dict:
+        if key in FOLDED_FIELDS:
+            folded_filter[key] = filter_dict[key].casefold()
+        else:
+            folded_filter[key] = filter_dict[key]
+    return folded_filter
+
 
 def get_present_string(twitter_dict, usernames, pres_dict):
     """(Twitterverse dictionary, list of str,
@@ -404,34 +1537,330 @@ following: ['Kinder', 'Ken', 'tomCruise', 'Tracy', 'Hannibal', 'Breaking bad', '
     "['a', 'b']"
     """
 
-    if pres_dict['sort-by'] == 'username':
-        tweet_sort(twitter_dict, usernames, username_first)
-    if pres_dict['sort-by'] == 'name':
-        tweet_sort(twitter_dict, usernames, name_first)
-    if pres_dict['sort-by'] == 'popularity':
-        tweet_sort(twitter_dict, usernames, more_popular)
-    if pres_dict['format'] == 'short':
-        result = str(usernames)
-    else:
-        if len(usernames) == 0:
-            result = '----------\n----------'
+    result = io.StringIO()
+    write_present(twitter_dict, usernames, pres_dict, result)
+    return result.getvalue()
+
+
+def write_present(twitter_dict, usernames, pres_dict, out):
+    """(Twitterverse dictionary, iterable of str, \
+    presentation specification dictionary, file open for writing) -> NoneType
+
+    Write the presentation of usernames that get_present_string returns \
+    to out. The jsonl, csv and long formats are built one record at a time \
+    and handed to out in batches of PRESENT_BATCH_SIZE records, so usernames \
+    may be a generator (such as iter_filter_results) that is only run as \
+    the output is written. The count format never builds any rows and \
+    ignores "sort-by", since sorting cannot change the count.
+
+    >>> twitter_dict = {'a': {'name': 'Ann', 'bio': 'Hi, all', \
+    'location': '', 'web': 'a.com', 'following': ['b', 'c']}, \
+    'b': {'name': 'Bob', 'bio': '', 'location': 'Oz', 'web': '', \
+    'following': []}}
+    >>> out = io.StringIO()
+    >>> write_present(twitter_dict, ['b', 'a'], \
+    {'sort-by': 'username', 'format': 'csv'}, out)
+    >>> print(out.getvalue(), end='')
+    username,name,location,web,bio,following
+    a,Ann,,a.com,"Hi, all",b;c
+    b,Bob,Oz,,,
+    >>> out = io.StringIO()
+    >>> write_present(twitter_dict, iter(['a', 'b']), \
+    {'sort-by': 'popularity', 'format': 'count'}, out)
+    >>> out.getvalue()
+    '2\\n'
+    """
+
+    present_format = pres_dict['format']
+    if pres_dict['sort-by'] in SORT_ORDERS and present_format != 'count':
+        if not isinstance(usernames, list):
+            usernames = list(usernames)
+        sort_results(twitter_dict, usernames, pres_dict['sort-by'])
+    if 'offset' in pres_dict or 'limit' in pres_dict:
+        start, stop = get_page_bounds(pres_dict)
+        usernames = itertools.islice(usernames, start, stop)
+    if present_format == 'count':
+        if isinstance(usernames, list):
+            count = len(usernames)
         else:
-            result = ''
+            count = 0
             for user in usernames:
-                result = result + '----------\n' + \
-                         user + '\n' + \
-                         'name: ' + twitter_dict[user]['name'] + '\n' + \
-                         'location: ' + twitter_dict[user]['location'] + '\n' \
-                         + 'website: ' + twitter_dict[user]['web'] + '\n' + \
-                         'bio:\n' + twitter_dict[user]['bio'] + \
-                         '\nfollowing: ' + \
-                         str(twitter_dict[user]['following']) + '\n'
-            result += '----------\n'
-            # collect the data of the all given user name.
-    return result
+                count += 1
+        out.write(str(count) + '\n')
+    elif present_format == 'short':
+        out.write(str(list(usernames)))
+    elif present_format == 'jsonl':
+        write_batches(out, (json.dumps(get_record(twitter_dict, user)) + '\n'
+                            for user in usernames))
+    elif present_format == 'csv':
+        out.write(','.join(RECORD_FIELDS) + '\n')
+        write_batches(out, (get_csv_line(twitter_dict, user)
+                            for user in usernames))
+    else:
+        count = write_batches(out, (get_long_block(twitter_dict, user)
+                                    for user in usernames))
+        if count == 0:
+            out.write('----------\n----------')
+        else:
+            out.write('----------\n')
+
+
+def write_batches(out, lines):
+    """(file open for writing, iterable of str) -> int
+
+    Write every str in lines to out, joining them into one write per \
+    PRESENT_BATCH_SIZE of them, and return how many there were.
+    """
+
+    count = 0
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == PRESENT_BATCH_SIZE:
+            out.write(''.join(batch))
+            count += len(batch)
+            batch = []
+    out.write(''.join(batch))
+    return count + len(batch)
+
+
+def get_record(twitter_dict, user):
+    """(Twitterverse dictionary, str) -> dict of {str: object}
+
+    Return the fields of RECORD_FIELDS for user, as written in the jsonl \
+    format.
+    """
+
+    return {'username': user,
+            'name': twitter_dict[user]['name'],
+            'location': twitter_dict[user]['location'],
+            'web': twitter_dict[user]['web'],
+            'bio': twitter_dict[user]['bio'],
+            'following': twitter_dict[user]['following']}
+
+
+def get_csv_line(twitter_dict, user):
+    """(Twitterverse dictionary, str) -> str
+
+    Return the csv format line of user, with the usernames it follows \
+    joined by ';'.
+    """
+
+    line = io.StringIO()
+    csv.writer(line, lineterminator='\n').writerow(
+        [user, twitter_dict[user]['name'], twitter_dict[user]['location'],
+         twitter_dict[user]['web'], twitter_dict[user]['bio'],
+         ';'.join(twitter_dict[user]['following'])])
+    return line.getvalue()
+
+
+def get_long_block(twitter_dict, user):
+    """(Twitterverse dictionary, str) -> str
+
+    Return the long format block of user, without the closing line.
+    """
+
+    return '----------\n' + \
+           user + '\n' + \
+           'name: ' + twitter_dict[user]['name'] + '\n' + \
+           'location: ' + twitter_dict[user]['location'] + '\n' \
+           + 'website: ' + twitter_dict[user]['web'] + '\n' + \
+           'bio:\n' + twitter_dict[user]['bio'] + \
+           '\nfollowing: ' + \
+           str(twitter_dict[user]['following']) + '\n'
+
+
+def get_page_bounds(pres_dict):
+    """(presentation specification dictionary) -> tuple of (int, int)
+
+    Return the start and stop positions of the page of results that \
+    pres_dict asks for; stop is None when there is no limit.
+
+    >>> get_page_bounds({'sort-by': 'username', 'format': 'short', \
+    'offset': '20', 'limit': '10'})
+    (20, 30)
+    >>> get_page_bounds({'sort-by': 'username', 'format': 'short'})
+    (0, None)
+    """
+
+    start = int(pres_dict.get('offset', 0))
+    if 'limit' in pres_dict:
+        return start, start + int(pres_dict['limit'])
+    return start, None
+
+
+def get_count_estimate(twitter_dict, query):
+    """(Twitterverse dictionary, query dictionary) -> int
+
+    Return an estimate of the number the count format would present for \
+    query, within the relative error given by its "error" presentation \
+    key, without finding the results. Raise ValueError if query does not \
+    use the count format or has filters, since an estimate of the search \
+    cannot tell how many of its results a filter would keep.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> query = {'search': {'username': 'a', 'operations': ['following']}, \
+    'filter': {}, 'present': {'sort-by': 'none', 'format': 'count', \
+    'error': '0.05', 'offset': '1'}}
+    >>> get_count_estimate(twitter_dict, query)
+    1
+    """
+
+    pres_dict = query['present']
+    if pres_dict['format'] != 'count':
+        raise ValueError('only counts can be estimated')
+    if len(query['filter']) != 0:
+        raise ValueError('cannot estimate the count of filtered results')
+    count = twitterverse_graph.estimate_count(
+        twitter_dict, query['search'], float(pres_dict['error']))
+    start, stop = get_page_bounds(pres_dict)
+    if stop is not None:
+        count = min(count, stop)
+    return max(count - start, 0)
+
+
+def get_present_page(twitter_dict, query, cursor=None):
+    """(Twitterverse dictionary, query dictionary, str) -> tuple of (str, str)
+
+    Run the whole query and return the presentation string of one page of \
+    its results, together with the cursor of the next page (None when this \
+    is the last page). Without a cursor, the page starts at the "offset" of \
+    the presentation specification; "limit" gives the page size.
+
+    The search and filter stages are generators, so when the results are \
+    not sorted (a "sort-by" that is not in SORT_ORDERS) only the rows up \
+    to the end of the page are computed. Sorted results have to be \
+    computed in full before a page can be cut from them.
+
+    >>> twitter_dict = {'a': {'name': 'a', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c', 'd']}, \
+    'b': {'name': 'b', 'bio': '', 'location': '', 'web': '', \
+    'following': []}, \
+    'c': {'name': 'c', 'bio': '', 'location': '', 'web': '', \
+    'following': []}, \
+    'd': {'name': 'd', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> query = {'search': {'username': 'a', 'operations': ['following']}, \
+    'filter': {}, \
+    'present': {'sort-by': 'none', 'format': 'short', 'limit': '2'}}
+    >>> page, cursor = get_present_page(twitter_dict, query)
+    >>> page
+    "['b', 'c']"
+    >>> page, cursor = get_present_page(twitter_dict, query, cursor)
+    >>> page
+    "['d']"
+    >>> cursor is None
+    True
+    """
+
+    pres_dict = query['present']
+    start, stop = get_page_bounds(pres_dict)
+    if cursor is not None:
+        start = read_cursor(query, cursor)
+        if stop is not None:
+            stop = start + int(pres_dict['limit'])
+    results = iter_filter_results(
+        twitter_dict, iter_search_results(twitter_dict, query['search']),
+        query['filter'])
+    if pres_dict['sort-by'] in SORT_ORDERS:
+        results = list(results)
+        sort_results(twitter_dict, results, pres_dict['sort-by'])
+        results = iter(results)
+    if stop is None:
+        page = list(itertools.islice(results, start, None))
+        next_cursor = None
+    else:
+        page = list(itertools.islice(results, start, stop + 1))
+        # Look one row past the page to learn whether another page follows.
+        next_cursor = None
+        if len(page) > stop - start:
+            page.pop()
+            next_cursor = make_cursor(query, stop)
+    page_dict = {'sort-by': 'none', 'format': pres_dict['format']}
+    return get_present_string(twitter_dict, page, page_dict), next_cursor
+
+
+def make_cursor(query, offset):
+    """(query dictionary, int) -> str
+
+    Return an opaque cursor for the page of query that starts at offset.
+    """
+
+    text = '{0}:{1}'.format(offset, get_query_fingerprint(query))
+    return base64.urlsafe_b64encode(text.encode('ascii')).decode('ascii')
+
+
+def read_cursor(query, cursor):
+    """(query dictionary, str) -> int
+
+    Return the offset stored in cursor. Raise ValueError if cursor was not \
+    made by make_cursor for this query.
+
+    >>> query = {'search': {'username': 'a', 'operations': []}, \
+    'filter': {}, 'present': {'sort-by': 'none', 'format': 'short'}}
+    >>> read_cursor(query, make_cursor(query, 40))
+    40
+    """
+
+    try:
+        text = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+        offset, fingerprint = text.split(':')
+        offset = int(offset)
+    except (ValueError, UnicodeError):
+        raise ValueError('invalid cursor: {0!r}'.format(cursor))
+    if fingerprint != get_query_fingerprint(query):
+        raise ValueError('cursor belongs to a different query')
+    return offset
+
+
+def get_query_fingerprint(query):
+    """(query dictionary) -> str
+
+    Return a short str that identifies the rows and order of query, \
+    leaving out the page position.
+    """
+
+    present = {}
+    for key in query['present']:
+        if key not in ('offset', 'limit'):
+            present[key] = query['present'][key]
+    text = repr((sorted(query['search'].items()),
+                 sorted(query['filter'].items()), sorted(present.items())))
+    return '{0:08x}'.format(zlib.crc32(text.encode('utf-8')))
 
 
 # --- Sorting Helper Functions ---
+def sort_results(twitter_data, results, sort_by):
+    """ (Twitterverse dictionary, list of str, str) -> NoneType
+
+    precondition: sort_by is in SORT_ORDERS.
+
+    Sort the results list as the "sort-by" value sort_by asks for. Sorting \
+    by rank looks the influence scores up once for the whole list, instead \
+    of once per comparison.
+
+    >>> twitter_data = {\
+    'a':{'name':'', 'location':'', 'web':'', 'bio':'', 'following':['b']}, \
+    'b':{'name':'', 'location':'', 'web':'', 'bio':'', 'following':[]}, \
+    'c':{'name':'', 'location':'', 'web':'', 'bio':'', 'following':[]}}
+    >>> result_list = ['a', 'c', 'b']
+    >>> sort_results(twitter_data, result_list, 'rank')
+    >>> result_list
+    ['b', 'a', 'c']
+    """
+
+    if sort_by == 'rank':
+        ranks = twitterverse_graph.get_ranks(twitter_data)
+        results.sort(key=lambda user: (-ranks.get(user, 0.0), user))
+    else:
+        tweet_sort(twitter_data, results, SORT_FUNCTIONS[sort_by])
+
+
 def tweet_sort(twitter_data, results, cmp):
     """ (Twitterverse dictionary, list of str, function) -> NoneType
 
@@ -538,6 +1967,27 @@ def name_first(twitter_data, a, b):
     return username_first(twitter_data, a, b)
 
 
+# The first bytes of each compressed format open_input reads, with the
+# module that decompresses it.
+COMPRESSED_FORMATS = [(b'\x1f\x8b', gzip), (b'BZh', bz2),
+                      (b'\xfd7zXZ\x00', lzma)]
+
+# The fields of a user in the jsonl and csv formats, in csv column order.
+RECORD_FIELDS = ['username', 'name', 'location', 'web', 'bio', 'following']
+
+# The number of records write_present joins into each write.
+PRESENT_BATCH_SIZE = 256
+
+# Maps each "sort-by" value of the presentation specification to the
+# comparison function tweet_sort uses for it.
+SORT_FUNCTIONS = {'username': username_first, 'name': name_first,
+                  'popularity': more_popular}
+
+# Every "sort-by" value sort_results sorts by: those of SORT_FUNCTIONS, and
+# "rank", which it sorts by influence score without a comparison function.
+SORT_ORDERS = set(SORT_FUNCTIONS) | {'rank'}
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
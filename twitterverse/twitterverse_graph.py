@@ -0,0 +1,1194 @@
+"""
+Graph index of a Twitterverse dictionary and the queries built on it
+(for descriptions of the Twitterverse dictionary, see twitterverse_functions)
+
+Graph index: dict of {str: object}
+   - key "names", value represents every username, known ones first
+   (a list of str); the position of a username in it is its user id
+   - key "ids", value maps each username to its user id (a dict of {str: int})
+   - key "known", value represents how many usernames are keys of the
+   Twitterverse dictionary (an int); user ids below it belong to them, and
+   the rest to usernames that only appear in following lists
+   - key "following", value represents the user ids each user follows
+   (a list of list of int, each sorted)
+   - key "followers", value represents the user ids following each user
+   (a list of list of int, each sorted)
+   - key "ranks" might exist, value maps each username to its influence
+   score (a dict of {str: float}); get_ranks adds it the first time it is
+   needed
+   - key "sketches" might exist, value maps a tuple of (tuple of the
+   operations of a search, sketch precision) to the HyperLogLog sketch of
+   what that search finds from each user (a sketch table); estimate_count
+   adds the searches it is asked to keep tables of, up to SKETCH_CACHE_SIZE
+   of them
+   - keys "adjacency following" and "adjacency followers" might exist,
+   values represent the lists of "following" and "followers" as one numpy
+   array of user ids and the offset where each user id's list starts in it
+   (a tuple of (numpy array, numpy array)); get_adjacency adds them the
+   first time estimate_count follows a search forward
+
+   - key "edges" might exist, value represents every following entry as a
+   pair of numpy arrays of the follower's user ids and the followed user ids
+   (a tuple of (numpy array, numpy array)); get_edges adds it the first time
+   a search expands a bitset frontier
+
+Bitset frontier: a set of user ids as a numpy array of bool with an entry per
+user id, True for the user ids in the set
+
+Sketch table: the registers of one HyperLogLog sketch per user id, each
+2 ** precision registers of the largest rank seen (a numpy array of uint8
+with a row per user id, or, when numpy is missing, a list of dict of
+{int: int} that maps each register that is not 0 to its rank)
+
+Resolution report: dict of {str: object}
+   - key "resolved", value represents how many following entries name a
+   user of the Twitterverse dictionary (an int)
+   - key "dangling", value represents how many following entries name a
+   username that is not in it (an int)
+   - key "missing", value maps each username that is not in it to how many
+   users follow it (a dict of {str: int})
+
+Known usernames and the other usernames are each numbered in alphabetical
+order, so a sorted list of known user ids is also in username order.
+"""
+
+import bisect
+import collections
+import heapq
+import itertools
+import math
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+    # get_ranks falls back to plain Python loops, which are much slower.
+
+
+# How much longer one sorted list must be than the other before
+# intersect_sorted looks up the short list's ids by binary search instead of
+# walking both lists.
+GALLOP_RATIO = 16
+
+# The chance that the random surfer of get_ranks follows a link rather than
+# jumping to a random user.
+DAMPING = 0.85
+
+# get_ranks stops once the scores change by less than this in total.
+RANK_TOLERANCE = 1e-6
+
+# get_ranks stops after this many rounds even if it has not converged.
+RANK_MAX_ROUNDS = 200
+
+# The relative error estimate_count aims for when none is given.
+COUNT_ERROR = 0.1
+
+# The fewest and most registers, as powers of 2, a sketch may have.
+SKETCH_MIN_PRECISION = 4
+SKETCH_MAX_PRECISION = 16
+
+# How many searches a graph index keeps the sketch tables of.
+SKETCH_CACHE_SIZE = 4
+
+# The most bytes of registers a sketch table may take; estimate_count
+# follows a search forward instead of building a larger one.
+SKETCH_TABLE_BYTES = 1 << 26
+
+# About how many registers the numpy sketch propagation pushes at once, to
+# bound the memory of each step.
+SKETCH_CHUNK_SIZE = 1 << 16
+
+# The smallest share of all users a frontier must hold before a search
+# expands it as a bitset frontier rather than user by user.
+BITSET_SHARE = 1 / 64
+
+# Searches of data with fewer users than this never use bitset frontiers.
+BITSET_MIN_USERS = 4096
+
+# How many graph indexes get_index keeps at once.
+INDEX_CACHE_SIZE = 4
+
+# The cached graph indexes, most recently used last, as lists of
+# [Twitterverse dictionary, number of users when the index was built, or
+# None once forget_index marks it out of date, graph index].
+_index_cache = []
+
+# Guards every read and write of _index_cache and _forget_count, which
+# searches on other threads share with the writer.
+_index_lock = threading.Lock()
+
+# How many times forget_index has been called; get_index does not cache an
+# index if this changed while it was building it.
+_forget_count = 0
+
+
+def build_index(twitter_dict):
+    """(Twitterverse dictionary) -> graph index
+
+    Return the graph index of twitter_dict. A username that appears more \
+    than once in a following list is only counted once.
+
+    >>> twitter_dict = {'b': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['a', 'z']}, \
+    'a': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['b', 'b']}}
+    >>> index = build_index(twitter_dict)
+    >>> index['names']
+    ['a', 'b', 'z']
+    >>> index['known']
+    2
+    >>> index['following']
+    [[1], [0, 2], []]
+    >>> index['followers']
+    [[1], [0], [1]]
+    """
+
+    known = sorted(twitter_dict)
+    # Set operations resolve the usernames without a loop over the edges.
+    unknown = set()
+    for user in twitter_dict.values():
+        unknown.update(user['following'])
+    unknown.difference_update(known)
+    names = known + sorted(unknown)
+    ids = dict(zip(names, range(len(names))))
+    following = []
+    followers = []
+    for user_id in range(len(names)):
+        following.append([])
+        followers.append([])
+    for user_id in range(len(known)):
+        out = sorted(set(map(ids.__getitem__,
+                             twitter_dict[known[user_id]]['following'])))
+        following[user_id] = out
+        for other_id in out:
+            followers[other_id].append(user_id)
+            # Users are visited in id order, so these lists stay sorted.
+    return {'names': names, 'ids': ids, 'known': len(known),
+            'following': following, 'followers': followers}
+
+
+def get_index(twitter_dict):
+    """(Twitterverse dictionary) -> graph index
+
+    Return the graph index of twitter_dict, building it only if the cached \
+    one is missing, was marked out of date by forget_index, or twitter_dict \
+    has gained or lost users since it was built. Following lists are not \
+    compared, so code that changes them other than through \
+    twitterverse_functions.apply_updates must call forget_index. A rebuilt \
+    index keeps the influence scores of the old one, so that get_ranks can \
+    start from them.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}}
+    >>> get_index(twitter_dict)['names']
+    ['a', 'b']
+    >>> twitter_dict['a']['following'][0] = 'c'
+    >>> get_index(twitter_dict)['names']
+    ['a', 'b']
+    >>> forget_index(twitter_dict)
+    >>> get_index(twitter_dict)['names']
+    ['a', 'c']
+    """
+
+    previous = None
+    with _index_lock:
+        for position in range(len(_index_cache)):
+            entry = _index_cache[position]
+            if entry[0] is twitter_dict:
+                if entry[1] == len(twitter_dict):
+                    del _index_cache[position]
+                    _index_cache.append(entry)
+                    return entry[2]
+                previous = entry[2]
+                break
+        forget_count = _forget_count
+    # The lock is not held while building, so that other searches go on.
+    index = build_index(twitter_dict)
+    if previous is not None and 'ranks' in previous:
+        index['previous-ranks'] = previous['ranks']
+    with _index_lock:
+        if forget_count == _forget_count:
+            remove_entry(twitter_dict)
+            add_entry([twitter_dict, len(twitter_dict), index])
+    return index
+
+
+def get_cached_index(twitter_dict):
+    """(Twitterverse dictionary) -> graph index
+
+    Return the graph index get_index would return for twitter_dict if it \
+    is cached and up to date, and None instead of building one.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': []}}
+    >>> get_cached_index(twitter_dict) is None
+    True
+    >>> index = get_index(twitter_dict)
+    >>> get_cached_index(twitter_dict) is index
+    True
+    """
+
+    with _index_lock:
+        for entry in _index_cache:
+            if entry[0] is twitter_dict and entry[1] == len(twitter_dict):
+                return entry[2]
+    return None
+
+
+def resolve_references(twitter_dict, index=None):
+    """(Twitterverse dictionary, graph index) -> resolution report
+
+    Return the resolution report of the following lists of twitter_dict, \
+    counted from the graph index, which holds each following entry as a \
+    user id; the ids from index['known'] on are the usernames that are not \
+    in twitter_dict. Building the index is the resolution pass: searches \
+    of several hops run on its lists of user ids once it is built (see \
+    twitterverse_functions.get_search_index), where a dangling entry has \
+    no following list and is never looked up in twitter_dict. Like the \
+    index, this counts a username that appears more than once in a \
+    following list only once.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'z', 'z']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a', 'y', 'z']}}
+    >>> report = resolve_references(twitter_dict)
+    >>> report['resolved'], report['dangling']
+    (2, 3)
+    >>> report['missing'] == {'y': 1, 'z': 2}
+    True
+    """
+
+    if index is None:
+        index = get_index(twitter_dict)
+    known = index['known']
+    resolved = 0
+    for user_id in range(known):
+        resolved += bisect.bisect_left(index['following'][user_id], known)
+    missing = {}
+    for user_id in range(known, len(index['names'])):
+        missing[index['names'][user_id]] = len(index['followers'][user_id])
+    return {'resolved': resolved, 'dangling': sum(missing.values()),
+            'missing': missing}
+
+
+def get_ranks(twitter_dict, index=None):
+    """(Twitterverse dictionary, graph index) -> dict of {str: float}
+
+    Return the influence score of every username in twitter_dict: its \
+    PageRank over the following graph, where each user passes its score on \
+    to the users it follows. The scores add up to 1. They are computed \
+    once per graph index and kept in it; after the data changes, the new \
+    index starts from the old scores, so only a few rounds are needed to \
+    take in a small change. index is the graph index of twitter_dict, as \
+    for mutual_follows.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a']}}
+    >>> ranks = get_ranks(twitter_dict)
+    >>> ranks['c'] > ranks['a'] > ranks['b']
+    True
+    >>> round(sum(ranks.values()), 6)
+    1.0
+    """
+
+    if index is None:
+        index = get_index(twitter_dict)
+    if 'ranks' not in index:
+        names = index['names']
+        start = [1.0 / len(names)] * len(names)
+        if 'previous-ranks' in index:
+            previous = index.pop('previous-ranks')
+            for user_id in range(len(names)):
+                start[user_id] = previous.get(names[user_id], start[user_id])
+            total = sum(start)
+            start = [score / total for score in start]
+        if numpy is None:
+            scores = rank_in_python(index['following'], start)
+        else:
+            scores = rank_in_numpy(index['following'], start)
+        ranks = {}
+        for user_id in range(len(names)):
+            ranks[names[user_id]] = scores[user_id]
+        index['ranks'] = ranks
+    return index['ranks']
+
+
+def rank_in_python(following, scores):
+    """(list of list of int, list of float) -> list of float
+
+    Return the PageRank scores of the graph whose user ids follow the ids \
+    in following, starting the power iteration from scores.
+    """
+
+    count = len(following)
+    for rounds in range(RANK_MAX_ROUNDS):
+        new_scores = [0.0] * count
+        sink = 0.0
+        # The score of users who follow nobody is shared by everybody.
+        for user_id in range(count):
+            out = following[user_id]
+            if len(out) == 0:
+                sink += scores[user_id]
+            else:
+                share = DAMPING * scores[user_id] / len(out)
+                for other_id in out:
+                    new_scores[other_id] += share
+        base = (1.0 - DAMPING + DAMPING * sink) / count
+        change = 0.0
+        for user_id in range(count):
+            new_scores[user_id] += base
+            change += abs(new_scores[user_id] - scores[user_id])
+        scores = new_scores
+        if change < RANK_TOLERANCE:
+            break
+    return scores
+
+
+def rank_in_numpy(following, scores):
+    """(list of list of int, list of float) -> list of float
+
+    Return the same scores as rank_in_python, doing each round of the \
+    power iteration as whole-array operations over the list of edges.
+    """
+
+    count = len(following)
+    degrees = numpy.fromiter((len(out) for out in following),
+                             dtype=numpy.int32, count=count)
+    sources = numpy.repeat(numpy.arange(count, dtype=numpy.int32), degrees)
+    targets = numpy.fromiter(itertools.chain.from_iterable(following),
+                             dtype=numpy.int32, count=int(degrees.sum()))
+    sinks = degrees == 0
+    shares = numpy.zeros(count)
+    shares[~sinks] = DAMPING / degrees[~sinks]
+    # The part of its score that each user passes to each user it follows.
+    scores = numpy.array(scores, dtype=numpy.float64)
+    for rounds in range(RANK_MAX_ROUNDS):
+        new_scores = numpy.bincount(targets, weights=(scores * shares)[sources],
+                                    minlength=count)
+        new_scores += (1.0 - DAMPING + DAMPING * scores[sinks].sum()) / count
+        change = numpy.abs(new_scores - scores).sum()
+        scores = new_scores
+        if change < RANK_TOLERANCE:
+            break
+    return scores.tolist()
+
+
+def forget_index(twitter_dict):
+    """(Twitterverse dictionary) -> NoneType
+
+    Mark the cached graph index of twitter_dict as out of date, so that \
+    get_index rebuilds it. Call this after changing a following list of \
+    twitter_dict in place.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}}
+    >>> index = get_index(twitter_dict)
+    >>> twitter_dict['a']['following'] = ['c']
+    >>> forget_index(twitter_dict)
+    >>> get_index(twitter_dict)['names']
+    ['a', 'c']
+    """
+
+    global _forget_count
+    with _index_lock:
+        _forget_count += 1
+        for entry in _index_cache:
+            if entry[0] is twitter_dict:
+                entry[1] = None
+
+
+def share_index(twitter_dict, other):
+    """(Twitterverse dictionary, Twitterverse dictionary) -> NoneType
+
+    Have get_index give other the cached graph index of twitter_dict, if \
+    there is one, until forget_index marks it out of date for other; the \
+    index rebuilt then still starts get_ranks from the shared one's scores. \
+    other must have the same usernames and following lists as twitter_dict.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}}
+    >>> index = get_index(twitter_dict)
+    >>> other = dict(twitter_dict)
+    >>> share_index(twitter_dict, other)
+    >>> get_index(other) is index
+    True
+    """
+
+    with _index_lock:
+        for entry in _index_cache:
+            if entry[0] is twitter_dict:
+                remove_entry(other)
+                add_entry([other, entry[1], entry[2]])
+                return
+
+
+def drop_index(twitter_dict):
+    """(Twitterverse dictionary) -> NoneType
+
+    Remove the cached graph index of twitter_dict, if there is one, so that \
+    the cache no longer holds twitter_dict.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': []}}
+    >>> index = get_index(twitter_dict)
+    >>> drop_index(twitter_dict)
+    >>> any(entry[0] is twitter_dict for entry in _index_cache)
+    False
+    """
+
+    with _index_lock:
+        remove_entry(twitter_dict)
+
+
+def add_entry(entry):
+    """(list of object) -> NoneType
+
+    precondition: the caller holds _index_lock.
+
+    Add entry to the end of _index_cache, removing the least recently used \
+    entries past INDEX_CACHE_SIZE.
+    """
+
+    _index_cache.append(entry)
+    while len(_index_cache) > INDEX_CACHE_SIZE:
+        _index_cache.pop(0)
+
+
+def remove_entry(twitter_dict):
+    """(Twitterverse dictionary) -> NoneType
+
+    precondition: the caller holds _index_lock.
+
+    Remove the entry of twitter_dict from _index_cache, if there is one.
+    """
+
+    for position in range(len(_index_cache)):
+        if _index_cache[position][0] is twitter_dict:
+            del _index_cache[position]
+            return
+
+
+def use_bitset(user_count, frontier_size):
+    """(int, int) -> bool
+
+    Return True if and only if a frontier of frontier_size usernames, in \
+    data of user_count users, is dense enough that expanding it over every \
+    edge at once as a bitset frontier beats expanding it user by user. \
+    Without numpy there are no bitset frontiers.
+
+    >>> use_bitset(100000, 10) or use_bitset(100, 100)
+    False
+    """
+
+    return numpy is not None and user_count >= BITSET_MIN_USERS and \
+        frontier_size >= user_count * BITSET_SHARE
+
+
+def get_edges(index):
+    """(graph index) -> tuple of (numpy array, numpy array)
+
+    Return the user ids of the follower and of the followed user of every \
+    following entry in index, building them the first time.
+    """
+
+    if 'edges' not in index:
+        following = index['following']
+        degrees = numpy.fromiter((len(out) for out in following),
+                                 dtype=numpy.int32, count=len(following))
+        sources = numpy.repeat(numpy.arange(len(following),
+                                            dtype=numpy.int32), degrees)
+        targets = numpy.fromiter(itertools.chain.from_iterable(following),
+                                 dtype=numpy.int32, count=len(sources))
+        index['edges'] = (sources, targets)
+    return index['edges']
+
+
+def make_bitset(index, usernames):
+    """(graph index, iterable of str) -> bitset frontier
+
+    Return the bitset frontier of the usernames that are in index; the \
+    others have no edges, so a search can leave them out.
+    """
+
+    bitset = numpy.zeros(len(index['names']), dtype=bool)
+    ids = index['ids']
+    bitset[[ids[username] for username in usernames
+            if username in ids]] = True
+    return bitset
+
+
+def get_bitset_usernames(index, bitset):
+    """(graph index, bitset frontier) -> list of str
+
+    Return the usernames in bitset, in the order of their user ids.
+    """
+
+    names = index['names']
+    return [names[user_id] for user_id in numpy.flatnonzero(bitset)]
+
+
+def expand_bitset(index, bitset, direction):
+    """(graph index, bitset frontier, str) -> bitset frontier
+
+    Return the user ids one hop in direction ('following' or 'followers') \
+    from the user ids in bitset, going over every edge at once, so that \
+    duplicates disappear as the bits are set.
+    """
+
+    sources, targets = get_edges(index)
+    found = numpy.zeros(len(bitset), dtype=bool)
+    if direction == 'following':
+        found[targets[bitset[sources]]] = True
+    else:
+        found[sources[bitset[targets]]] = True
+    return found
+
+
+def filter_bitset(index, filter_dict):
+    """(graph index, filter specification dictionary) -> bitset frontier
+
+    Return the bitset frontier of the user ids that pass the "following" \
+    and "follower" filters of filter_dict, or None if it has neither. As \
+    in twitterverse_functions.iter_filter_results, a user id past \
+    index['known'] passes the follower filter of a user who follows it, \
+    and the user of a follower filter that is not in the data follows \
+    nobody.
+    """
+
+    ids = index['ids']
+    keep = None
+    if 'following' in filter_dict:
+        keep = numpy.zeros(len(index['names']), dtype=bool)
+        if filter_dict['following'] in ids:
+            keep[index['followers'][ids[filter_dict['following']]]] = True
+    if 'follower' in filter_dict:
+        follower = filter_dict['follower']
+        followed = numpy.zeros(len(index['names']), dtype=bool)
+        if follower in ids:
+            followed[index['following'][ids[follower]]] = True
+        if keep is None:
+            keep = followed
+        else:
+            keep &= followed
+    return keep
+
+
+def iter_closure_bitset(index, frontier, visited, reached, direction, depth,
+                        filter_dict=None):
+    """(graph index, list of str, set of str, set of str, str, int, \
+    filter specification dictionary) -> generator of str
+
+    Carry on a search of twitterverse_functions.iter_closure on bitset \
+    frontiers, from its frontier and its sets of visited and reached \
+    usernames, for depth more hops, yielding the usernames each hop \
+    reaches for the first time in the order of their user ids. \
+    filter_dict, if given, leaves out of the usernames yielded those that \
+    fail its following and follower filters (see filter_bitset), whose \
+    names are then never looked up.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['c', 'b']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c', 'd']}}
+    >>> list(iter_closure_bitset(get_index(twitter_dict), ['a'], {'a'}, \
+    set(), 'following', 2))
+    ['b', 'c', 'd']
+    """
+
+    keep = None
+    if filter_dict is not None:
+        keep = filter_bitset(index, filter_dict)
+    frontier = make_bitset(index, frontier)
+    visited = make_bitset(index, visited)
+    reached = make_bitset(index, reached)
+    for hop in range(depth):
+        if not frontier.any():
+            return
+        found = expand_bitset(index, frontier, direction)
+        new = found & ~reached
+        reached |= new
+        if keep is not None:
+            new &= keep
+        yield from get_bitset_usernames(index, new)
+        frontier = found & ~visited
+        visited |= frontier
+
+
+def intersect_sorted(a, b):
+    """(list of int, list of int) -> list of int
+
+    precondition: a and b are sorted and hold no repeated items.
+
+    Return the sorted list of the items that are in both a and b. When one \
+    list is much shorter, as when a user is compared with a hub that has a \
+    huge number of followers, each of its items is found in the long list \
+    by binary search from the last match, so the cost follows the short list.
+
+    >>> intersect_sorted([1, 3, 5, 7], [2, 3, 4, 7, 9])
+    [3, 7]
+    >>> intersect_sorted([40], list(range(0, 1000, 2)))
+    [40]
+    """
+
+    if len(a) > len(b):
+        a, b = b, a
+    result = []
+    if len(a) * GALLOP_RATIO < len(b):
+        low = 0
+        for item in a:
+            low = bisect.bisect_left(b, item, low)
+            if low == len(b):
+                break
+            if b[low] == item:
+                result.append(item)
+        return result
+    i = 0
+    j = 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            i += 1
+        elif a[i] > b[j]:
+            j += 1
+        else:
+            result.append(a[i])
+            i += 1
+            j += 1
+    return result
+
+
+def mutual_follows(twitter_dict, username, index=None):
+    """(Twitterverse dictionary, str, graph index) -> list of str
+
+    Return, in alphabetical order, the usernames that username follows and \
+    that follow username back. index is the graph index of twitter_dict; \
+    pass it when asking many questions to skip the get_index check.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> mutual_follows(twitter_dict, 'a')
+    ['b']
+    """
+
+    if index is None:
+        index = get_index(twitter_dict)
+    if username not in index['ids']:
+        return []
+    user_id = index['ids'][username]
+    return [index['names'][other_id] for other_id in
+            intersect_sorted(index['following'][user_id],
+                             index['followers'][user_id])]
+
+
+def common_followers(twitter_dict, a, b, index=None):
+    """(Twitterverse dictionary, str, str, graph index) -> list of str
+
+    Return, in alphabetical order, the usernames that follow both a and b. \
+    index is the graph index of twitter_dict, as for mutual_follows.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['c', 'd']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['d']}, \
+    'd': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> common_followers(twitter_dict, 'c', 'd')
+    ['a']
+    """
+
+    if index is None:
+        index = get_index(twitter_dict)
+    if a not in index['ids'] or b not in index['ids']:
+        return []
+    return [index['names'][other_id] for other_id in
+            intersect_sorted(index['followers'][index['ids'][a]],
+                             index['followers'][index['ids'][b]])]
+
+
+def who_to_follow(twitter_dict, username, k=10, index=None):
+    """(Twitterverse dictionary, str, int, graph index) \
+    -> list of tuple of (str, int)
+
+    Return up to k known users that username does not follow yet, each with \
+    the number of users username follows who already follow them, most \
+    shared connections first and ties in alphabetical order. index is the \
+    graph index of twitter_dict, as for mutual_follows.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['d', 'e']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a', 'e']}, \
+    'd': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}, \
+    'e': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> who_to_follow(twitter_dict, 'a')
+    [('e', 2), ('d', 1)]
+    >>> who_to_follow(twitter_dict, 'a', 1)
+    [('e', 2)]
+    """
+
+    if index is None:
+        index = get_index(twitter_dict)
+    if username not in index['ids']:
+        return []
+    user_id = index['ids'][username]
+    followed = index['following'][user_id]
+    counts = collections.Counter(itertools.chain.from_iterable(
+        index['following'][other_id] for other_id in followed))
+    del counts[user_id]
+    for other_id in followed:
+        del counts[other_id]
+    known = index['known']
+    names = index['names']
+    best = heapq.nsmallest(
+        k, (item for item in counts.items() if item[0] < known),
+        key=lambda item: (-item[1], item[0]))
+    # Known user ids are in alphabetical order, so they break ties.
+    return [(names[other_id], count) for other_id, count in best]
+
+
+def estimate_count(twitter_dict, spec_dict, error=COUNT_ERROR, index=None,
+                   keep_table=False):
+    """(Twitterverse dictionary, search specification dictionary or \
+    combined search specification dictionary, float, graph index, bool) \
+    -> int
+
+    Return an estimate of how many usernames \
+    twitterverse_functions.get_search_results finds for spec_dict, \
+    within a relative error of about error (one standard deviation), \
+    without building the set of usernames. Searches may be combined with \
+    OR; "max-results" and "time-limit" are not applied, so the estimate \
+    is of the whole search. index is the graph index of twitter_dict, as \
+    for mutual_follows. Raise ValueError if error is not between 0 and 1, \
+    or if spec_dict combines searches with AND or NOT, whose counts a \
+    sketch cannot estimate within a bounded error.
+
+    A search is followed forward from its user, one hop at a time, as \
+    get_search_results would, except that the users its last operation \
+    reaches are never collected: each is pushed into a HyperLogLog sketch \
+    as it is found, and the last hop does not even drop repeated users, \
+    since the sketch ignores them. Only the sketch and the frontiers of \
+    user ids are held.
+
+    With keep_table, the sketch of every user is found instead, and kept \
+    in the graph index (see get_sketch_table), so estimating the same \
+    operations again from any other user costs almost nothing; a table \
+    that would take more than SKETCH_TABLE_BYTES is not built, and the \
+    search is followed forward. Both ways give the same estimate.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b', 'c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c', 'd']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['a']}}
+    >>> estimate_count(twitter_dict, {'username': 'a', \
+    'operations': ['following', 'following']})
+    3
+    >>> estimate_count(twitter_dict, {'username': 'd', \
+    'operations': ['followers*2']}, keep_table=True)
+    2
+    """
+
+    if not 0 < error < 1:
+        raise ValueError('invalid error bound: {0!r}'.format(error))
+    if index is None:
+        index = get_index(twitter_dict)
+    precision = get_precision(error)
+    return round(estimate_sketch(get_search_sketch(index, spec_dict,
+                                                   precision, keep_table)))
+
+
+def get_precision(error):
+    """(float) -> int
+
+    Return the number of bits of the register numbers of a HyperLogLog \
+    sketch whose relative error is at most error, as far as the limits \
+    on the number of registers allow.
+
+    >>> get_precision(0.05)
+    9
+    >>> get_precision(0.5)
+    4
+    """
+
+    precision = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(precision, SKETCH_MIN_PRECISION), SKETCH_MAX_PRECISION)
+
+
+def get_search_sketch(index, spec_dict, precision, keep_table=False):
+    """(graph index, search specification dictionary or combined search \
+    specification dictionary, int, bool) -> bytes
+
+    Return the registers of the sketch of the usernames spec_dict finds, \
+    from the sketch tables of the graph index if keep_table is True, as \
+    for estimate_count.
+    """
+
+    if 'operator' in spec_dict:
+        if spec_dict['operator'] != 'OR':
+            raise ValueError('cannot estimate the count of {0!r}'.format(
+                spec_dict['operator']))
+        return bytes(map(max, *[get_search_sketch(index, operand, precision,
+                                                  keep_table)
+                                for operand in spec_dict['operands']]))
+    operations = tuple(spec_dict['operations'])
+    registers = bytearray(1 << precision)
+    # A username no one follows and that is not in the data gets the next
+    # free user id, so that it is counted once like any other.
+    user_id = index['ids'].get(spec_dict['username'], len(index['names']))
+    if len(operations) == 0:
+        register, rank = get_register(user_id, precision)
+        registers[register] = rank
+    elif user_id == len(index['names']):
+        pass
+    elif keep_table and len(index['names']) << precision <= \
+            SKETCH_TABLE_BYTES:
+        table = get_sketch_table(index, operations, precision)
+        if numpy is not None:
+            return table[user_id].tobytes()
+        for register, rank in table[user_id].items():
+            registers[register] = rank
+    elif numpy is None:
+        sketch_search_in_python(index, user_id, operations, registers)
+    else:
+        return sketch_search_in_numpy(index, user_id, operations,
+                                      precision).tobytes()
+    return bytes(registers)
+
+
+def sketch_search_in_python(index, user_id, operations, registers):
+    """(graph index, int, tuple of str, bytearray) -> NoneType
+
+    Follow the search of operations forward from user_id, as for \
+    estimate_count, and put each user id its last operation reaches into \
+    the registers.
+    """
+
+    precision = len(registers).bit_length() - 1
+    frontier = [user_id]
+    for position in range(len(operations)):
+        direction, star, depth = operations[position].partition('*')
+        adjacency = index[direction]
+        depth = 1 if star == '' else int(depth)
+        last = position == len(operations) - 1
+        visited = set(frontier)
+        reached = set()
+        found = []
+        for hop in range(depth):
+            next_frontier = []
+            for other_id in frontier:
+                for neighbour in adjacency[other_id]:
+                    if last:
+                        register, rank = get_register(neighbour, precision)
+                        if registers[register] < rank:
+                            registers[register] = rank
+                    elif neighbour not in reached:
+                        reached.add(neighbour)
+                        found.append(neighbour)
+                    if hop != depth - 1 and neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        frontier = found
+
+
+def sketch_search_in_numpy(index, user_id, operations, precision):
+    """(graph index, int, tuple of str, int) -> numpy array
+
+    Return the registers sketch_search_in_python finds, as a numpy array \
+    of uint8, expanding each frontier of user ids with iter_adjacent.
+    """
+
+    registers = numpy.zeros(1 << precision, dtype=numpy.uint8)
+    frontier = numpy.array([user_id], dtype=numpy.int32)
+    for position in range(len(operations)):
+        direction, star, depth = operations[position].partition('*')
+        depth = 1 if star == '' else int(depth)
+        last = position == len(operations) - 1
+        visited = numpy.zeros(len(index['names']), dtype=bool)
+        visited[frontier] = True
+        reached = numpy.zeros(len(index['names']), dtype=bool)
+        found = [frontier[:0]]
+        for hop in range(depth):
+            next_frontier = [frontier[:0]]
+            for step in iter_adjacent(index, frontier, direction):
+                if last:
+                    columns, ranks = get_registers(step, precision)
+                    numpy.maximum.at(registers, columns, ranks)
+                    if hop == depth - 1:
+                        continue
+                step = numpy.unique(step)
+                if not last:
+                    found.append(step[~reached[step]])
+                    reached[found[-1]] = True
+                next_frontier.append(step[~visited[step]])
+                visited[next_frontier[-1]] = True
+            frontier = numpy.concatenate(next_frontier)
+        frontier = numpy.concatenate(found)
+    return registers
+
+
+def iter_adjacent(index, frontier, direction):
+    """(graph index, numpy array, str) -> generator of numpy array
+
+    Yield the user ids one hop in direction ('following' or 'followers') \
+    leads to from the user ids in frontier, repeats included, about \
+    SKETCH_CHUNK_SIZE of them at a time, so that a hop from a large \
+    frontier never holds all of its edges at once.
+    """
+
+    offsets, neighbours = get_adjacency(index, direction)
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    ends = numpy.cumsum(counts)
+    first = 0
+    while first < len(frontier):
+        last = int(numpy.searchsorted(ends, ends[first] - counts[first] +
+                                      SKETCH_CHUNK_SIZE, 'right'))
+        last = max(last, first + 1)
+        part = counts[first:last]
+        yield neighbours[numpy.arange(int(part.sum())) + numpy.repeat(
+            starts[first:last] - (numpy.cumsum(part) - part), part)]
+        first = last
+
+
+def get_adjacency(index, direction):
+    """(graph index, str) -> tuple of (numpy array, numpy array)
+
+    Return the user ids one hop in direction ('following' or 'followers') \
+    leads to from every user id, as the offset where the user ids of each \
+    user id start (with one more offset for the end) in the flat array of \
+    them, user id by user id, and that array, building them the first time.
+    """
+
+    key = 'adjacency ' + direction
+    if key not in index:
+        lists = index[direction]
+        degrees = numpy.fromiter((len(ids) for ids in lists),
+                                 dtype=numpy.int64, count=len(lists))
+        offsets = numpy.zeros(len(lists) + 1, dtype=numpy.int64)
+        numpy.cumsum(degrees, out=offsets[1:])
+        neighbours = numpy.fromiter(itertools.chain.from_iterable(lists),
+                                    dtype=numpy.int32, count=int(offsets[-1]))
+        index[key] = (offsets, neighbours)
+    return index[key]
+
+
+def get_sketch_table(index, operations, precision):
+    """(graph index, tuple of str, int) -> sketch table
+
+    Return the sketch table of what the operations find from each user, \
+    from the graph index if it keeps it, or else built and kept there.
+    """
+
+    if 'sketches' not in index:
+        index['sketches'] = {}
+    sketches = index['sketches']
+    key = (operations, precision)
+    if key in sketches:
+        sketches[key] = sketches.pop(key)
+        # Move it to the end, so it is the last to be dropped.
+        return sketches[key]
+    if numpy is None:
+        table = [dict([get_register(user_id, precision)])
+                 for user_id in range(len(index['names']))]
+    else:
+        table = numpy.zeros((len(index['names']), 1 << precision),
+                            dtype=numpy.uint8)
+        user_ids = numpy.arange(len(index['names']))
+        columns, ranks = get_registers(user_ids, precision)
+        table[user_ids, columns] = ranks
+    for operation in reversed(operations):
+        direction, star, depth = operation.partition('*')
+        if star == '':
+            depth = '1'
+        if direction == 'following':
+            predecessors = index['followers']
+        else:
+            predecessors = index['following']
+        if numpy is None:
+            table = sketch_hop_in_python(predecessors, table, int(depth))
+        else:
+            table = sketch_hop_in_numpy(predecessors, table, int(depth))
+    sketches[key] = table
+    if len(sketches) > SKETCH_CACHE_SIZE:
+        del sketches[next(iter(sketches))]
+    return table
+
+
+def get_register(user_id, precision):
+    """(int, int) -> tuple of (int, int)
+
+    Return the register a sketch with 2 ** precision registers puts \
+    user_id in, and the rank it records there: the position of the first \
+    1 bit in the rest of the SplitMix64 hash of user_id.
+
+    >>> register, rank = get_register(7, 4)
+    >>> 0 <= register < 16 and 1 <= rank <= 61
+    True
+    >>> columns, ranks = get_registers(numpy.array([7]), 4)
+    >>> (int(columns[0]), int(ranks[0])) == (register, rank)
+    True
+    """
+
+    mask = (1 << 64) - 1
+    hashed = (user_id + 0x9E3779B97F4A7C15) & mask
+    hashed = ((hashed ^ (hashed >> 30)) * 0xBF58476D1CE4E5B9) & mask
+    hashed = ((hashed ^ (hashed >> 27)) * 0x94D049BB133111EB) & mask
+    hashed ^= hashed >> 31
+    width = 64 - precision
+    return hashed >> width, \
+        width - (hashed & ((1 << width) - 1)).bit_length() + 1
+
+
+def get_registers(user_ids, precision):
+    """(numpy array, int) -> tuple of (numpy array, numpy array)
+
+    Return the registers and ranks get_register gives for each of the \
+    user ids, worked out for all of them at once.
+    """
+
+    hashed = user_ids.astype(numpy.uint64) + \
+        numpy.uint64(0x9E3779B97F4A7C15)
+    hashed = (hashed ^ (hashed >> numpy.uint64(30))) * \
+        numpy.uint64(0xBF58476D1CE4E5B9)
+    hashed = (hashed ^ (hashed >> numpy.uint64(27))) * \
+        numpy.uint64(0x94D049BB133111EB)
+    hashed ^= hashed >> numpy.uint64(31)
+    width = 64 - precision
+    rest = hashed & numpy.uint64((1 << width) - 1)
+    # The bit length of rest, found by halving the bits left to look at.
+    length = (rest != 0).astype(numpy.uint8)
+    for shift in [32, 16, 8, 4, 2, 1]:
+        high = rest >> numpy.uint64(shift) != 0
+        length += high.astype(numpy.uint8) * numpy.uint8(shift)
+        rest = numpy.where(high, rest >> numpy.uint64(shift), rest)
+    return (hashed >> numpy.uint64(width)).astype(numpy.int64), \
+        (width + 1 - length).astype(numpy.uint8)
+
+
+def sketch_hop_in_python(predecessors, table, depth):
+    """(list of list of int, list of dict of {int: int}, int) \
+    -> list of dict of {int: int}
+
+    Return the sketch table of what a closure of depth hops, followed by \
+    what table describes, finds from each user id: the merged sketches of \
+    every user within depth hops. predecessors holds, for each user id, \
+    the user ids one hop leads to it from. Each sketch keeps only its \
+    registers that are not 0, and is pushed to the users one hop before \
+    it, so the work follows the registers in use rather than all of them.
+    """
+
+    reached = table
+    for hop in range(depth):
+        merged = [{} for user_id in range(len(table))]
+        for other_id in range(len(table)):
+            sketch = reached[other_id]
+            if len(sketch) != 0:
+                for user_id in predecessors[other_id]:
+                    target = merged[user_id]
+                    for register, rank in sketch.items():
+                        if target.get(register, 0) < rank:
+                            target[register] = rank
+        if hop != depth - 1:
+            for user_id in range(len(table)):
+                for register, rank in table[user_id].items():
+                    if merged[user_id].get(register, 0) < rank:
+                        merged[user_id][register] = rank
+        reached = merged
+    return reached
+
+
+def sketch_hop_in_numpy(predecessors, table, depth):
+    """(list of list of int, numpy array, int) -> numpy array
+
+    Return the same sketch table as sketch_hop_in_python, with a row of \
+    registers per user id, pushing the registers that are not 0 to the \
+    users one hop before with numpy.maximum.at. The rows, and the pushes, \
+    are taken about SKETCH_CHUNK_SIZE registers at a time.
+    """
+
+    count = len(predecessors)
+    degrees = numpy.fromiter((len(before) for before in predecessors),
+                             dtype=numpy.int64, count=count)
+    sources = numpy.fromiter(itertools.chain.from_iterable(predecessors),
+                             dtype=numpy.int64, count=int(degrees.sum()))
+    offsets = numpy.cumsum(degrees) - degrees
+    width = table.shape[1]
+    rows = max(SKETCH_CHUNK_SIZE // width, 1)
+    reached = table
+    for hop in range(depth):
+        merged = numpy.zeros_like(table)
+        flat = merged.reshape(-1)
+        for row in range(0, count, rows):
+            users, registers = numpy.nonzero(reached[row:row + rows])
+            users += row
+            ranks = reached[users, registers]
+            pushes = numpy.cumsum(degrees[users])
+            first = 0
+            while first < len(users):
+                # Take entries up to about SKETCH_CHUNK_SIZE pushes, or at
+                # least one entry.
+                last = int(numpy.searchsorted(
+                    pushes, pushes[first] - degrees[users[first]] +
+                    SKETCH_CHUNK_SIZE, 'right'))
+                last = max(last, first + 1)
+                counts = degrees[users[first:last]]
+                entries = numpy.repeat(numpy.arange(first, last), counts)
+                positions = numpy.arange(len(entries)) - numpy.repeat(
+                    numpy.cumsum(counts) - counts, counts) + \
+                    numpy.repeat(offsets[users[first:last]], counts)
+                numpy.maximum.at(flat, sources[positions] * width +
+                                 registers[entries], ranks[entries])
+                first = last
+        if hop != depth - 1:
+            numpy.maximum(merged, table, out=merged)
+        reached = merged
+    return reached
+
+
+def estimate_sketch(registers):
+    """(bytes) -> float
+
+    Return the HyperLogLog estimate of the number of distinct items the \
+    sketch with the given registers has seen, counting by the share of \
+    empty registers when that is more accurate for small counts.
+
+    >>> estimate_sketch(bytes(16))
+    0.0
+    """
+
+    count = len(registers)
+    if count == 16:
+        alpha = 0.673
+    elif count == 32:
+        alpha = 0.697
+    elif count == 64:
+        alpha = 0.709
+    else:
+        alpha = 0.7213 / (1 + 1.079 / count)
+    estimate = alpha * count * count / sum(2.0 ** -rank for rank in registers)
+    empty = registers.count(0)
+    if estimate <= 2.5 * count and empty != 0:
+        estimate = count * math.log(count / empty)
+    return estimate
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,221 @@
+"""
+Memory report of a Twitterverse dictionary and the structures kept for it
+(for descriptions of the other dictionaries, see twitterverse_functions and
+twitterverse_graph)
+
+Memory report dictionary: dict of {str: object}
+   - key "users", value represents the number of users (an int)
+   - key "edges", value represents the number of following entries (an int)
+   - key "records", value represents the bytes of the Twitterverse
+   dictionary (with its shards, for a version of a version store) and of
+   the dict of each user, without their values (an int)
+   - key "following", value represents the bytes of the following lists,
+   without the usernames in them (an int)
+   - key "strings", value represents the bytes of the usernames and field
+   values, each str object counted once (an int)
+   - key "interning", value represents how many of those bytes would be
+   saved by keeping one str object for each distinct value (an int)
+   - key "indexes", value maps the name of each index or cache kept for the
+   data to the bytes it holds that are not counted above (a dict of
+   {str: int}); "lazy fields" holds the positions and cached fields of the
+   files LazyUser records read from
+   - key "total", value represents the bytes of all of the above (an int)
+   - key "mapped", value represents the bytes of the files LazyUser records
+   read from that are mapped into memory; the operating system pages them
+   in as they are read, so they are not part of "total" (an int)
+   - key "traced", value represents the bytes tracemalloc saw the data hold
+   once loaded, or None if the report did not load it (an int)
+
+Sizes come from sys.getsizeof, following every container down to the
+objects in it and counting each object once, so objects shared between
+structures (such as a username that is a key and appears in following
+lists) are counted in the first part that holds them.
+"""
+
+import sys
+import tracemalloc
+
+import twitterverse_functions
+import twitterverse_graph
+import twitterverse_standing
+import twitterverse_versions
+import twitterverse_views
+
+
+def load_traced(filename):
+    """(str) -> tuple of (Twitterverse dictionary, int)
+
+    Return the data in filename, read through
+    twitterverse_functions.open_input, and the bytes of memory it holds
+    once loaded, as traced by tracemalloc.
+    """
+
+    tracemalloc.start()
+    data_file = twitterverse_functions.open_input(filename)
+    twitter_dict = twitterverse_functions.process_data(data_file)
+    data_file.close()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return twitter_dict, size
+
+
+def get_memory_report(twitter_dict, traced=None):
+    """(Twitterverse dictionary, int) -> memory report dictionary
+
+    Return the memory report of twitter_dict and of the graph index,
+    standing queries, materialized views and lazily read fields kept for
+    it. traced is the bytes load_traced measured for twitter_dict, if it
+    was loaded that way.
+
+    >>> twitter_dict = {'a': {'name': 'Ann', 'bio': '', 'location': '', \
+    'web': '', 'following': [''.join(['c'] * 20)]}, \
+    'b': {'name': 'Bob', 'bio': '', 'location': '', 'web': '', \
+    'following': [''.join(['c'] * 20)]}}
+    >>> report = get_memory_report(twitter_dict)
+    >>> report['users'], report['edges']
+    (2, 2)
+    >>> report['interning'] == sys.getsizeof('c' * 20)
+    True
+    """
+
+    seen = set()
+    report = {'users': len(twitter_dict), 'edges': 0,
+              'records': get_deep_size([twitter_dict], seen, False),
+              'following': 0, 'strings': 0, 'interning': 0, 'indexes': {},
+              'total': 0, 'mapped': 0, 'traced': traced}
+    if isinstance(twitter_dict, twitterverse_versions.Version):
+        # The shards and the places of the usernames in them.
+        report['records'] += get_deep_size(
+            [twitter_dict.places, twitter_dict.shards] + twitter_dict.shards,
+            seen, False)
+    strings = []
+    sources = []
+    for username, user in twitter_dict.items():
+        if isinstance(user, twitterverse_functions.LazyUser) and \
+                not any(source is user.source for source in sources):
+            sources.append(user.source)
+        report['records'] += get_deep_size([user], seen, False)
+        report['following'] += get_deep_size([user['following']], seen,
+                                             False)
+        report['edges'] += len(user['following'])
+        strings.append(username)
+        # Only the values a user holds, so that the fields a LazyUser has
+        # not read are neither read nor counted.
+        strings.extend(dict.keys(user))
+        strings.extend(dict.values(user))
+        strings.extend(user['following'])
+    values = set()
+    for value in strings:
+        if type(value) is str and id(value) not in seen:
+            seen.add(id(value))
+            report['strings'] += sys.getsizeof(value)
+            if value in values:
+                report['interning'] += sys.getsizeof(value)
+            else:
+                values.add(value)
+    for name, cache, lock in [
+            ('graph index', twitterverse_graph._index_cache,
+             twitterverse_graph._index_lock),
+            ('standing queries', twitterverse_standing._registries,
+             twitterverse_standing._registries_lock),
+            ('materialized views', twitterverse_functions._view_tables,
+             twitterverse_functions._registry_lock)]:
+        with lock:
+            entries = [entry[1:] for entry in cache
+                       if entry[0] is twitter_dict]
+        report['indexes'][name] = sum(get_deep_size(entry, seen)
+                                      for entry in entries)
+    # The tables of the views are counted above; their registries also keep
+    # the users each view depends on.
+    with twitterverse_views._registries_lock:
+        registries = list(twitterverse_views._registries)
+    for registry in registries:
+        with registry['lock']:
+            if registry['data'] is twitter_dict:
+                report['indexes']['materialized views'] += get_deep_size(
+                    [registry['views'], registry['stale']], seen)
+    report['indexes']['lazy fields'] = 0
+    for source in sources:
+        with source.lock:
+            report['indexes']['lazy fields'] += get_deep_size(
+                [source.offsets, source.cache], seen)
+    report['mapped'] = sum(len(source.map) for source in sources
+                           if source.map is not None)
+    report['total'] = report['records'] + report['following'] + \
+        report['strings'] + sum(report['indexes'].values())
+    return report
+
+
+def get_deep_size(objects, seen, deep=True):
+    """(list of object, set of int, bool) -> int
+
+    Return the bytes sys.getsizeof gives for the objects and, if deep, for
+    everything the containers among them hold, leaving out the objects
+    whose ids are in seen and adding the ids of the ones counted to seen.
+
+    >>> seen = set()
+    >>> shared = ['x']
+    >>> get_deep_size([[shared, shared]], seen) == \
+    sys.getsizeof([shared, shared]) + sys.getsizeof(shared) + \
+    sys.getsizeof('x')
+    True
+    >>> get_deep_size([shared], seen)
+    0
+    """
+
+    size = 0
+    work = list(objects)
+    while len(work) != 0:
+        obj = work.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if not deep:
+            continue
+        if isinstance(obj, dict):
+            work.extend(obj.keys())
+            work.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            work.extend(obj)
+    return size
+
+
+def write_memory_report(report, out):
+    """(memory report dictionary, file open for writing) -> NoneType
+
+    Write report to out, one part per line, followed by the bytes per user
+    and per following entry.
+    """
+
+    lines = [('users', report['users']),
+             ('following entries', report['edges']),
+             ('user records (bytes)', report['records']),
+             ('following lists (bytes)', report['following']),
+             ('strings (bytes)', report['strings']),
+             ('  saved by interning (bytes)', report['interning'])]
+    for name in sorted(report['indexes']):
+        lines.append(('{0} (bytes)'.format(name), report['indexes'][name]))
+    lines.append(('total (bytes)', report['total']))
+    if report['mapped'] != 0:
+        lines.append(('mapped data files (bytes)', report['mapped']))
+    if report['traced'] is not None:
+        lines.append(('traced by tracemalloc (bytes)', report['traced']))
+    for name, value in lines:
+        out.write('{0:<35} {1:>14}\n'.format(name, value))
+    for name, count in [('bytes per user', report['users']),
+                        ('bytes per following entry', report['edges'])]:
+        if count != 0:
+            out.write('{0:<35} {1:>14.1f}\n'.format(
+                name, report['total'] / count))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('usage: python twitterverse_memory.py data_file')
+        sys.exit(2)
+    data, size = load_traced(sys.argv[1])
+    # Searches build the graph index, so it is part of what a loaded
+    # Twitterverse costs.
+    twitterverse_graph.get_index(data)
+    write_memory_report(get_memory_report(data, size), sys.stdout)
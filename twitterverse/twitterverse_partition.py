@@ -0,0 +1,424 @@
+"""
+Partitioned execution of searches and filters over worker processes
+(for descriptions of the other dictionaries, see twitterverse_functions)
+
+The users are split over the workers by a hash of their usernames. Each
+worker owns the records of its users, and the followers of its users, so
+that one hop of a search is answered by the owners of the usernames in the
+frontier. The coordinator sends every worker its batch of the frontier at
+once, collects the neighbours, and builds the next frontier from them; the
+workers talk to the coordinator over pipes, and no process but the one that
+owns it ever holds a user's record.
+
+Cluster dictionary: dict of {str: object}
+   - key "workers", value represents the number of workers (an int)
+   - key "connections", value represents the coordinator's end of the pipe
+   to each worker, in the order of their partition numbers (a list of
+   multiprocessing.connection.Connection)
+   - key "processes", value represents the worker processes, in the same
+   order (a list of multiprocessing.Process)
+
+Partition: tuple of (Twitterverse dictionary, dict of {str: list of str})
+   - the records of the users the worker owns
+   - the followers of each username the worker owns that somebody follows,
+   in the order the followers appear in the data (as follower_index builds
+   them)
+"""
+
+import multiprocessing
+import time
+import zlib
+
+import twitterverse_functions
+
+
+def get_partition(username, workers):
+    """(str, int) -> int
+
+    Return the number of the worker that owns username. The hash does not
+    change between processes or runs, unlike the built-in hash of a str.
+
+    >>> get_partition('Kinder', 4) == get_partition('Kinder', 4)
+    True
+    >>> 0 <= get_partition('Kinder', 4) < 4
+    True
+    """
+
+    return zlib.crc32(username.encode('utf-8')) % workers
+
+
+def split_data(twitter_dict, workers):
+    """(Twitterverse dictionary, int) -> list of Partition
+
+    Return the partition of twitter_dict that each worker owns.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> partitions = split_data(twitter_dict, 1)
+    >>> sorted(partitions[0][0])
+    ['a', 'b']
+    >>> partitions[0][1]
+    {'b': ['a']}
+    """
+
+    partitions = {}
+    for number in range(workers):
+        partitions[number] = ({}, {})
+    for username in twitter_dict:
+        add_user(partitions, username, twitter_dict[username], workers)
+    return [partitions[number] for number in range(workers)]
+
+
+def load_partition(filename, number, workers):
+    """(str, int, int) -> Partition
+
+    Return the partition that worker number owns of the data in filename,
+    reading the file one user at a time so that the other users are never
+    all held at once.
+    """
+
+    partitions = {number: ({}, {})}
+    data_file = twitterverse_functions.open_input(filename)
+    for username, user in twitterverse_functions.iter_data(data_file):
+        add_user(partitions, username, user, workers)
+    data_file.close()
+    return partitions[number]
+
+
+def add_user(partitions, username, user, workers):
+    """(dict of {int: Partition}, str, dict of {str: object}, int) \
+    -> NoneType
+
+    Add the record of username, and its edges to the users it follows, to
+    the partitions that own them. Only the partitions that are values of
+    partitions are filled in. A lazily loaded record is copied into a plain
+    dict, since its fields are read from a file the worker does not share.
+    """
+
+    number = get_partition(username, workers)
+    if number in partitions:
+        partitions[number][0][username] = {
+            'name': user['name'], 'location': user['location'],
+            'web': user['web'], 'bio': user['bio'],
+            'following': list(user['following'])}
+    for name in user['following']:
+        number = get_partition(name, workers)
+        if number in partitions:
+            followers = partitions[number][1]
+            if name in followers:
+                followers[name].append(username)
+            else:
+                followers[name] = [username]
+
+
+def start_cluster(source, workers):
+    """(str or Twitterverse dictionary, int) -> Cluster dictionary
+
+    Start workers worker processes, each owning its partition of source: the
+    name of a data file, which every worker reads for itself, or a
+    Twitterverse dictionary, which is split here and sent out. Call
+    stop_cluster when the cluster is no longer needed.
+    """
+
+    cluster = {'workers': workers, 'connections': [], 'processes': []}
+    if isinstance(source, str):
+        partitions = None
+    else:
+        partitions = split_data(source, workers)
+    for number in range(workers):
+        connection, worker_connection = multiprocessing.Pipe()
+        if partitions is None:
+            worker_source = source
+        else:
+            worker_source = partitions[number]
+        process = multiprocessing.Process(
+            target=run_worker, daemon=True,
+            args=(worker_connection, worker_source, number, workers))
+        process.start()
+        worker_connection.close()
+        cluster['connections'].append(connection)
+        cluster['processes'].append(process)
+    return cluster
+
+
+def stop_cluster(cluster):
+    """(Cluster dictionary) -> NoneType
+
+    Stop the workers of cluster and wait for them to finish.
+    """
+
+    for connection in cluster['connections']:
+        connection.send(('stop', None))
+        connection.close()
+    for process in cluster['processes']:
+        process.join()
+
+
+def run_worker(connection, source, number, workers):
+    """(multiprocessing.connection.Connection, Partition or str, int, \
+    int) -> NoneType
+
+    Serve the requests of the coordinator on connection until it asks
+    worker number of workers to stop. source is either the worker's
+    partition or the name of the data file to read it from.
+
+    Each request is a tuple of (command, payload), and each reply a tuple of
+    ('ok', result) or ('error', exception) when the command raised one, so
+    that the coordinator can raise it again.
+    """
+
+    if isinstance(source, str):
+        users, followers = load_partition(source, number, workers)
+    else:
+        users, followers = source
+    while True:
+        command, payload = connection.recv()
+        if command == 'stop':
+            connection.close()
+            return
+        try:
+            result = WORKER_COMMANDS[command](users, followers, payload)
+            reply = ('ok', result)
+        except Exception as error:
+            reply = ('error', error)
+        connection.send(reply)
+
+
+def expand_batch(users, followers, payload):
+    """(Twitterverse dictionary, dict of {str: list of str}, \
+    tuple of (list of str, str)) -> list of list of str
+
+    Return the neighbours of each username in a batch of a frontier, in the
+    direction given with the batch, in the order of the batch.
+    """
+
+    usernames, direction = payload
+    neighbours = []
+    for username in usernames:
+        if direction == 'followers':
+            neighbours.append(followers.get(username, []))
+        elif username in users:
+            neighbours.append(users[username]['following'])
+        else:
+            neighbours.append([])
+    return neighbours
+
+
+def filter_batch(users, followers, payload):
+    """(Twitterverse dictionary, dict of {str: list of str}, \
+    tuple of (list of str, filter specification dictionary, set of str)) \
+    -> list of str
+
+    Return the usernames of a batch that pass the filter given with it. The
+    follower filter is replaced by the usernames its user follows, since
+    that user's record may belong to another worker; it is None without a
+    follower filter.
+    """
+
+    usernames, filter_dict, followed = payload
+    found = []
+    for username in twitterverse_functions.iter_filter_results(
+            users, usernames, filter_dict):
+        if followed is None or username in followed:
+            found.append(username)
+    return found
+
+
+def fetch_batch(users, followers, payload):
+    """(Twitterverse dictionary, dict of {str: list of str}, \
+    tuple of (list of str,)) -> Twitterverse dictionary
+
+    Return the records of the usernames of a batch that are known.
+    """
+
+    usernames = payload[0]
+    return {username: users[username] for username in usernames
+            if username in users}
+
+
+def call_workers(cluster, command, usernames, extra=()):
+    """(Cluster dictionary, str, list of str, tuple) -> list of tuple of \
+    (list of str, object)
+
+    Split usernames into a batch for each worker that owns some of them,
+    send every worker its batch, followed by extra, with command at once,
+    so that the workers run side by side, and return each batch with the
+    worker's result.
+    Raise the exception a worker raised, once every worker has replied.
+    """
+
+    batches = [[] for number in range(cluster['workers'])]
+    for username in usernames:
+        batches[get_partition(username, cluster['workers'])].append(username)
+    busy = []
+    for number in range(cluster['workers']):
+        if len(batches[number]) != 0:
+            cluster['connections'][number].send(
+                (command, (batches[number],) + extra))
+            busy.append(number)
+    results = []
+    error = None
+    for number in busy:
+        status, result = cluster['connections'][number].recv()
+        if status == 'error':
+            error = result
+        results.append((batches[number], result))
+    if error is not None:
+        raise error
+    return results
+
+
+def iter_closure(cluster, usernames, direction, depth, max_results=None,
+                 deadline=None):
+    """(Cluster dictionary, list of str, str, int, int, float) \
+    -> generator of str
+
+    Yield the usernames of twitterverse_functions.iter_closure, in the order
+    its hops on the following lists of the data give, exchanging one
+    frontier batch with each worker per hop.
+    """
+
+    reached = set()
+    visited = set()
+    frontier = []
+    for name in usernames:
+        if name not in visited:
+            visited.add(name)
+            frontier.append(name)
+    hop = 0
+    while len(frontier) != 0 and hop < depth:
+        if deadline is not None and time.perf_counter() > deadline:
+            return
+        neighbours = {}
+        for batch, found in call_workers(cluster, 'expand', frontier,
+                                         (direction,)):
+            for position in range(len(batch)):
+                neighbours[batch[position]] = found[position]
+        next_frontier = []
+        for name in frontier:
+            for neighbour in neighbours[name]:
+                if neighbour not in reached:
+                    reached.add(neighbour)
+                    yield neighbour
+                    if max_results is not None and \
+                            len(reached) >= max_results:
+                        return
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+        hop += 1
+
+
+def get_search_results(cluster, spec_dict):
+    """(Cluster dictionary, search specification dictionary or combined \
+    search specification dictionary) -> list of str
+
+    Return the usernames twitterverse_functions.get_search_results finds
+    for spec_dict in the data of cluster, in the order its hops on the
+    following lists of the data give them. Where
+    twitterverse_functions.get_search_results runs on the graph index or
+    expands bitset frontiers instead, as for a search of several hops, it
+    finds the same usernames in user id order, so only the sets of results
+    are the same.
+    """
+
+    if 'operator' in spec_dict:
+        return list(evaluate_search(cluster, spec_dict, {}))
+    search_lst = [spec_dict['username']]
+    deadline = None
+    if 'time-limit' in spec_dict:
+        deadline = time.perf_counter() + spec_dict['time-limit']
+    for operation in spec_dict['operations']:
+        direction, depth = twitterverse_functions.parse_operation(operation)
+        if '*' in operation:
+            search_lst = list(iter_closure(
+                cluster, search_lst, direction, depth,
+                spec_dict.get('max-results'), deadline))
+        else:
+            search_lst = list(iter_closure(cluster, search_lst, direction, 1))
+    return search_lst
+
+
+def evaluate_search(cluster, spec_dict, memo):
+    """(Cluster dictionary, search specification dictionary or combined \
+    search specification dictionary, dict) -> set of str
+
+    Return the set of usernames that spec_dict finds in the data of cluster,
+    keeping the set of every search in memo under its search_key, as
+    twitterverse_functions.evaluate_search does.
+    """
+
+    key = twitterverse_functions.search_key(spec_dict)
+    if key in memo:
+        return memo[key]
+    if 'operator' not in spec_dict:
+        memo[key] = set(get_search_results(cluster, spec_dict))
+        return memo[key]
+    operands = spec_dict['operands']
+    result = set(evaluate_search(cluster, operands[0], memo))
+    for operand in operands[1:]:
+        if spec_dict['operator'] == 'AND':
+            result &= evaluate_search(cluster, operand, memo)
+        elif spec_dict['operator'] == 'OR':
+            result |= evaluate_search(cluster, operand, memo)
+        elif spec_dict['operator'] == 'NOT':
+            result -= evaluate_search(cluster, operand, memo)
+        else:
+            raise ValueError('invalid search operator: {0!r}'.format(
+                spec_dict['operator']))
+    memo[key] = result
+    return result
+
+
+def get_filter_results(cluster, usernames, filter_dict):
+    """(Cluster dictionary, list of str, filter specification dictionary) \
+    -> list of str
+
+    Return the usernames twitterverse_functions.get_filter_results keeps,
+    in the same order, having each worker filter the usernames it owns.
+    """
+
+    if len(filter_dict) == 0:
+        return usernames
+    filter_dict = dict(filter_dict)
+    followed = None
+    if 'follower' in filter_dict:
+        follower = filter_dict.pop('follower')
+        followed = set()
+        record = get_records(cluster, [follower]).get(follower)
+        if record is not None:
+            followed.update(record['following'])
+    passed = set()
+    for batch, found in call_workers(cluster, 'filter', usernames,
+                                     (filter_dict, followed)):
+        passed.update(found)
+    return [username for username in usernames if username in passed]
+
+
+def get_records(cluster, usernames):
+    """(Cluster dictionary, list of str) -> Twitterverse dictionary
+
+    Return the records of the known usernames in usernames, such as the
+    results to present with twitterverse_functions.get_present_string.
+    Sorting by popularity or rank needs the whole data, so it cannot be
+    done on these records alone.
+    """
+
+    twitter_dict = {}
+    for batch, found in call_workers(cluster, 'fetch', usernames):
+        twitter_dict.update(found)
+    return twitter_dict
+
+
+# The commands a worker serves, each called with the worker's records, its
+# follower lists and the payload of the request.
+WORKER_COMMANDS = {'expand': expand_batch, 'filter': filter_batch,
+                   'fetch': fetch_batch}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
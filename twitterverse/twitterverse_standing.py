@@ -0,0 +1,365 @@
+"""
+Standing queries: queries whose results are kept up to date while the data
+changes through twitterverse_functions.apply_updates
+(for descriptions of the other dictionaries, see twitterverse_functions)
+
+Standing query dictionary: dict of {str: object}
+   - key "data", value represents the data the query runs on (a Twitterverse
+   dictionary)
+   - key "username", value represents the username the search begins at
+   (a str)
+   - key "operations", value represents the search operations (a list of
+   str, each "following" or "followers")
+   - key "levels", value represents, for the start of the search and then
+   after each operation, how many ways each username there is reached from
+   the usernames one step before (a list of dict of {str: int})
+   - key "filter", value represents the filter specification, with its
+   name-includes and location-includes values case-folded (a filter
+   specification dictionary)
+   - key "followed", value represents the usernames the user of the
+   "follower" filter follows, or None without that filter (a set of str)
+   - key "results", value represents the usernames the query finds
+   (a set of str)
+   - key "callback", value represents the function called with the lists of
+   added and removed usernames after each batch of updates that changes the
+   results
+   - key "added", value represents the usernames added to the results by the
+   batch of updates being applied (a set of str)
+   - key "removed", value represents the usernames removed from the results
+   by the batch of updates being applied (a set of str)
+
+A user is in a level while it is reached at least once, so an update only
+touches the users whose number of ways in changes, and the users reached
+from the ones that join or leave a level. The cost of an update follows the
+size of the change it makes to the results, not the size of the data.
+"""
+
+import threading
+
+import twitterverse_functions
+
+
+# The standing queries of each Twitterverse dictionary, as lists of
+# [Twitterverse dictionary, dict of {str: object}]; the dict maps
+# "followers" to the usernames following each user (a dict of
+# {str: set of str}), "queries" to the standing query dictionaries and
+# "listener" to the function apply_updates calls for their updates.
+_registries = []
+
+# Guards every read and write of _registries.
+_registries_lock = threading.Lock()
+
+
+def register_standing_query(twitter_dict, query, callback):
+    """(Twitterverse dictionary, query dictionary, function)
+    -> standing query dictionary
+
+    Return a standing query for the search and filter of query on
+    twitter_dict. From now on, after every batch of updates that
+    twitterverse_functions.apply_updates applies to twitter_dict and that
+    changes the results, callback is called with the sorted list of
+    usernames added to the results and the sorted list of usernames removed.
+    Raise ValueError if the search uses closure operations or combines
+    several searches, which standing queries do not support.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> query = {'search': {'username': 'a', \
+    'operations': ['following', 'following']}, 'filter': {}, \
+    'present': {'sort-by': 'username', 'format': 'short'}}
+    >>> standing = register_standing_query(twitter_dict, query, print)
+    >>> get_standing_results(standing)
+    ['c']
+    >>> applied = twitterverse_functions.apply_updates(twitter_dict, \
+    [('follow', 'b', 'a'), ('unfollow', 'b', 'c')])
+    ['a'] ['c']
+    >>> unregister_standing_query(standing)
+    """
+
+    spec_dict = query['search']
+    if 'operator' in spec_dict:
+        raise ValueError('standing queries cannot combine searches')
+    for operation in spec_dict['operations']:
+        if operation not in ('following', 'followers'):
+            raise ValueError('standing queries cannot use the operation '
+                             '{0!r}'.format(operation))
+    registry = get_registry(twitter_dict)
+    filter_dict = twitterverse_functions.fold_filter(query['filter'])
+    standing = {'data': twitter_dict, 'username': spec_dict['username'],
+                'operations': list(spec_dict['operations']),
+                'levels': [{spec_dict['username']: 1}],
+                'filter': filter_dict, 'followed': None, 'results': set(),
+                'callback': callback, 'added': set(), 'removed': set()}
+    if 'follower' in filter_dict:
+        standing['followed'] = set(get_following(twitter_dict,
+                                                 filter_dict['follower']))
+    for operation in standing['operations']:
+        level = {}
+        for username in standing['levels'][-1]:
+            for other in get_neighbours(registry, twitter_dict, username,
+                                        operation):
+                level[other] = level.get(other, 0) + 1
+        standing['levels'].append(level)
+    for username in standing['levels'][-1]:
+        if passes(standing, username):
+            standing['results'].add(username)
+    registry['queries'].append(standing)
+    return standing
+
+
+def unregister_standing_query(standing):
+    """(standing query dictionary) -> NoneType
+
+    Stop keeping the results of standing up to date.
+    """
+
+    twitter_dict = standing['data']
+    with _registries_lock:
+        for position in range(len(_registries)):
+            entry = _registries[position]
+            if entry[0] is twitter_dict:
+                queries = entry[1]['queries']
+                for number in range(len(queries)):
+                    if queries[number] is standing:
+                        del queries[number]
+                        break
+                if len(queries) == 0:
+                    twitterverse_functions.remove_update_listener(
+                        twitter_dict, entry[1]['listener'])
+                    del _registries[position]
+                return
+
+
+def get_standing_results(standing):
+    """(standing query dictionary) -> list of str
+
+    Return the current results of standing, in alphabetical order.
+    """
+
+    return sorted(standing['results'])
+
+
+def get_registry(twitter_dict):
+    """(Twitterverse dictionary) -> dict of {str: object}
+
+    Return the registry of the standing queries of twitter_dict, starting
+    one, and listening for the updates of twitter_dict, if there is none.
+    """
+
+    with _registries_lock:
+        for entry in _registries:
+            if entry[0] is twitter_dict:
+                return entry[1]
+        followers = {}
+        for username in twitter_dict:
+            for other in set(twitter_dict[username]['following']):
+                if other not in followers:
+                    followers[other] = set()
+                followers[other].add(username)
+        registry = {'followers': followers, 'queries': [],
+                    'listener': lambda twitter_dict, update:
+                    apply_to_standing_queries(twitter_dict, update, registry)}
+        _registries.append([twitter_dict, registry])
+        twitterverse_functions.add_update_listener(twitter_dict,
+                                                   registry['listener'])
+        return registry
+
+
+def move_registry(registry, twitter_dict):
+    """(dict of {str: object}, Twitterverse dictionary) -> NoneType
+
+    Make twitter_dict the data of registry and of its standing queries, if
+    it is not already; twitterverse_versions moves the update listeners of
+    a version to the next one, which then receives the updates.
+    """
+
+    with _registries_lock:
+        for entry in _registries:
+            if entry[1] is registry and entry[0] is not twitter_dict:
+                entry[0] = twitter_dict
+                for standing in registry['queries']:
+                    standing['data'] = twitter_dict
+
+
+def get_following(twitter_dict, username):
+    """(Twitterverse dictionary, str) -> list of str
+
+    Return the usernames username follows, or [] if username is not in
+    twitter_dict.
+    """
+
+    if username in twitter_dict:
+        return twitter_dict[username]['following']
+    return []
+
+
+def get_neighbours(registry, twitter_dict, username, operation):
+    """(dict of {str: object}, Twitterverse dictionary, str, str)
+    -> set of str
+
+    Return the usernames one operation away from username.
+    """
+
+    if operation == 'following':
+        return set(get_following(twitter_dict, username))
+    return registry['followers'].get(username, set())
+
+
+def passes(standing, username):
+    """(standing query dictionary, str) -> bool
+
+    Return True if and only if username passes the filter of standing.
+    As in twitterverse_functions.iter_filter_results, a username that is
+    not in the data passes only the follower filter of a user who follows
+    it, and no name, location or following filter.
+    """
+
+    filter_dict = standing['filter']
+    if len(filter_dict) == 0:
+        return True
+    twitter_dict = standing['data']
+    if username not in twitter_dict:
+        return standing['followed'] is not None and \
+            username in standing['followed'] and \
+            'name-includes' not in filter_dict and \
+            'location-includes' not in filter_dict and \
+            'following' not in filter_dict
+    user = twitter_dict[username]
+    if 'name-includes' in filter_dict and \
+            filter_dict['name-includes'] not in user['name'].casefold():
+        return False
+    if 'location-includes' in filter_dict and \
+            filter_dict['location-includes'] not in \
+            user['location'].casefold():
+        return False
+    if 'following' in filter_dict and \
+            filter_dict['following'] not in user['following']:
+        return False
+    if standing['followed'] is not None and \
+            username not in standing['followed']:
+        return False
+    return True
+
+
+def apply_to_standing_queries(twitter_dict, update, registry):
+    """(Twitterverse dictionary, update tuple, dict of {str: object})
+    -> NoneType
+
+    Bring every standing query of registry up to date with update, which
+    has just been applied to twitter_dict; when update is None, the batch
+    of updates is over, so tell each standing query's callback what
+    changed.
+    """
+
+    move_registry(registry, twitter_dict)
+    if update is None:
+        for standing in registry['queries']:
+            added = sorted(standing['added'])
+            removed = sorted(standing['removed'])
+            standing['added'] = set()
+            standing['removed'] = set()
+            if len(added) != 0 or len(removed) != 0:
+                standing['callback'](added, removed)
+        return
+    if update[0] == 'profile':
+        if update[2] in ('name', 'location'):
+            for standing in registry['queries']:
+                recheck(standing, update[1])
+        return
+    follower = update[1]
+    followed = update[2]
+    if update[0] == 'follow':
+        delta = 1
+        registry['followers'].setdefault(followed, set()).add(follower)
+    elif followed in twitter_dict[follower]['following']:
+        # A repeated entry is still there, so the edge has not gone.
+        return
+    else:
+        delta = -1
+        registry['followers'][followed].discard(follower)
+    for standing in registry['queries']:
+        changes = []
+        # Which levels the edge counts in is decided before any change is
+        # carried out, since a user that joins a level on the way already
+        # counts its new edge.
+        for hop in range(len(standing['operations'])):
+            if standing['operations'][hop] == 'following':
+                if follower in standing['levels'][hop]:
+                    changes.append((hop + 1, followed, delta))
+            elif followed in standing['levels'][hop]:
+                changes.append((hop + 1, follower, delta))
+        for hop, username, change in changes:
+            change_count(registry, standing, hop, username, change)
+        if standing['filter'].get('following') == followed:
+            recheck(standing, follower)
+        if standing['followed'] is not None and \
+                standing['filter']['follower'] == follower:
+            if delta == 1:
+                standing['followed'].add(followed)
+            else:
+                standing['followed'].discard(followed)
+            recheck(standing, followed)
+
+
+def change_count(registry, standing, hop, username, delta):
+    """(dict of {str: object}, standing query dictionary, int, str, int)
+    -> NoneType
+
+    Change how many ways username is reached at level hop of standing by
+    delta, and carry the change on to the users it reaches if username
+    joins or leaves that level.
+    """
+
+    twitter_dict = standing['data']
+    levels = standing['levels']
+    work = [(hop, username, delta)]
+    while len(work) != 0:
+        hop, username, delta = work.pop()
+        level = levels[hop]
+        old = level.get(username, 0)
+        new = old + delta
+        if new == 0:
+            del level[username]
+        else:
+            level[username] = new
+        if old == 0 or new == 0:
+            if hop == len(levels) - 1:
+                recheck(standing, username)
+            else:
+                step = 1
+                if new == 0:
+                    step = -1
+                for other in get_neighbours(registry, twitter_dict, username,
+                                            standing['operations'][hop]):
+                    work.append((hop + 1, other, step))
+
+
+def recheck(standing, username):
+    """(standing query dictionary, str) -> NoneType
+
+    Add username to or remove it from the results of standing, as it now
+    belongs, and note the change for the end of the batch.
+    """
+
+    inside = username in standing['levels'][-1] and passes(standing, username)
+    if inside and username not in standing['results']:
+        standing['results'].add(username)
+        if username in standing['removed']:
+            standing['removed'].remove(username)
+        else:
+            standing['added'].add(username)
+    elif not inside and username in standing['results']:
+        standing['results'].remove(username)
+        if username in standing['added']:
+            standing['added'].remove(username)
+        else:
+            standing['removed'].add(username)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
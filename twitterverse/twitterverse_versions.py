@@ -0,0 +1,283 @@
+"""
+Versioned snapshots of a Twitterverse dictionary, so that queries running in
+the same process as updates each read one consistent version of the data
+(for descriptions of the other dictionaries, see twitterverse_functions)
+
+Version store dictionary: dict of {str: object}
+   - key "current", value represents the newest published version of the
+   data (a Version)
+   - key "number", value represents how many versions were published after
+   the first one (an int)
+   - key "readers", value maps the id of every version that readers hold to
+   a list of [Version, int] of that version and how many readers hold it
+   (a dict of {int: list})
+   - key "lock", value guards "current", "number" and "readers"
+   (a threading.Lock)
+   - key "writer", value lets one writer at a time prepare the next version
+   (a threading.Lock)
+
+A published version is never changed. A Version keeps its users in shards
+of SHARD_SIZE users, in the order of the first version, and every version
+shares one dict of where each username is, since updates never add or
+remove users. The next version copies the list of shards and the shards a
+batch of updates changes, and within them the users the batch changes,
+with their following lists, before their first change. Everything else is
+shared by every version, so a version costs one reference per shard plus
+the shards and users its batch changed, and readers can iterate a version
+while a writer prepares the next one.
+
+The next version takes over what twitterverse_functions and
+twitterverse_graph keep for the current one (see
+twitterverse_functions.move_caches), and the functions added with
+twitterverse_functions.add_update_listener for it are called with each
+update of the batch as it is applied, so standing queries and materialized
+views follow the store. A version that is no longer current is dropped
+from the caches once its last reader releases it, and is then reclaimed
+like any other object.
+"""
+
+import collections.abc
+import contextlib
+import itertools
+import threading
+
+import twitterverse_functions
+import twitterverse_graph
+
+
+# How many users each shard of a Version holds.
+SHARD_SIZE = 256
+
+
+class Version(collections.abc.Mapping):
+    """ One version of the data in a version store: a Twitterverse
+    dictionary that cannot be changed, other than through the users it
+    holds, whose users are kept in shards that later versions share.
+    """
+
+    __slots__ = ('places', 'shards')
+
+    def __init__(self, places, shards):
+        """ (Version, dict of {str: int}, list of list of dict) -> NoneType
+
+        Make a version whose user with username u is
+        shards[places[u] // SHARD_SIZE][places[u] % SHARD_SIZE].
+        """
+
+        self.places = places
+        self.shards = shards
+
+    def __getitem__(self, username):
+        """ (Version, str) -> dict of {str: object}
+
+        Return the user dict of username.
+        """
+
+        place = self.places[username]
+        return self.shards[place // SHARD_SIZE][place % SHARD_SIZE]
+
+    def get(self, username, default=None):
+        """ (Version, str, object) -> object
+
+        Return the user dict of username, or default if there is none.
+        """
+
+        place = self.places.get(username)
+        if place is None:
+            return default
+        return self.shards[place // SHARD_SIZE][place % SHARD_SIZE]
+
+    def __contains__(self, username):
+        """ (Version, str) -> bool
+
+        Return True if and only if username is a user of this version.
+        """
+
+        return username in self.places
+
+    def __iter__(self):
+        """ (Version) -> iterator of str
+
+        Return an iterator of the usernames, in the order of the first
+        version.
+        """
+
+        return iter(self.places)
+
+    def __len__(self):
+        """ (Version) -> int
+
+        Return how many users this version has.
+        """
+
+        return len(self.places)
+
+    def values(self):
+        """ (Version) -> list of dict of {str: object}
+
+        Return the user dicts, in the order of the usernames.
+        """
+
+        return list(itertools.chain.from_iterable(self.shards))
+
+    def items(self):
+        """ (Version) -> list of tuple of (str, dict of {str: object})
+
+        Return the usernames and their user dicts, in order.
+        """
+
+        return list(zip(self.places,
+                        itertools.chain.from_iterable(self.shards)))
+
+
+def make_version(twitter_dict):
+    """(Twitterverse dictionary) -> Version
+
+    Return a version with the users of twitter_dict, in its order.
+    """
+
+    users = list(twitter_dict.values())
+    return Version({username: place
+                    for place, username in enumerate(twitter_dict)},
+                   [users[first:first + SHARD_SIZE]
+                    for first in range(0, len(users), SHARD_SIZE)])
+
+
+def make_store(twitter_dict):
+    """(Twitterverse dictionary) -> version store dictionary
+
+    Return a version store whose first version holds the users of
+    twitter_dict. From now on they must only be changed through
+    commit_updates.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['b']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> store = make_store(twitter_dict)
+    >>> with read_version(store) as version:
+    ...     commit_updates(store, [('follow', 'b', 'a')])
+    ...     version['b']['following']
+    [('follow', 'b', 'a')]
+    []
+    >>> with read_version(store) as version:
+    ...     version['b']['following'], version['a'] is twitter_dict['a']
+    (['a'], True)
+    """
+
+    return {'current': make_version(twitter_dict), 'number': 0, 'readers': {},
+            'lock': threading.Lock(), 'writer': threading.Lock()}
+
+
+def acquire_version(store):
+    """(version store dictionary) -> Twitterverse dictionary
+
+    Return the current version of store and hold it until it is given to
+    release_version. The version does not change while it is held, even if
+    newer versions are published.
+    """
+
+    with store['lock']:
+        twitter_dict = store['current']
+        entry = store['readers'].setdefault(id(twitter_dict),
+                                            [twitter_dict, 0])
+        entry[1] += 1
+    return twitter_dict
+
+
+def release_version(store, twitter_dict):
+    """(version store dictionary, Twitterverse dictionary) -> NoneType
+
+    Stop holding twitter_dict, a version that acquire_version returned, and
+    drop it from the caches if no reader holds it and it is no longer the
+    current version.
+    """
+
+    with store['lock']:
+        entry = store['readers'][id(twitter_dict)]
+        entry[1] -= 1
+        if entry[1] != 0:
+            return
+        del store['readers'][id(twitter_dict)]
+        unused = twitter_dict is not store['current']
+    if unused:
+        twitterverse_functions.drop_caches(twitter_dict)
+
+
+@contextlib.contextmanager
+def read_version(store):
+    """(version store dictionary) -> Twitterverse dictionary
+
+    Hold the current version of store for the body of a with statement.
+    """
+
+    twitter_dict = acquire_version(store)
+    try:
+        yield twitter_dict
+    finally:
+        release_version(store, twitter_dict)
+
+
+def commit_updates(store, updates):
+    """(version store dictionary, list of update tuple) -> list of update tuple
+
+    Apply the updates to a new version of the data in store, publish it as
+    the current version if any update changed it, and return the updates
+    that changed it, as twitterverse_functions.apply_updates does, calling
+    the same update listeners. The whole batch is published at once, so no
+    reader sees part of it; if an update is not valid, the error of
+    twitterverse_functions.check_update is raised before any is applied.
+    """
+
+    with store['writer']:
+        old = store['current']
+        for update in updates:
+            twitterverse_functions.check_update(old, update)
+        twitter_dict = Version(old.places, list(old.shards))
+        copied = set()
+        applied = []
+        for update in updates:
+            if update[1] not in copied:
+                place = old.places[update[1]]
+                shard = twitter_dict.shards[place // SHARD_SIZE]
+                if shard is old.shards[place // SHARD_SIZE]:
+                    shard = list(shard)
+                    twitter_dict.shards[place // SHARD_SIZE] = shard
+                shard[place % SHARD_SIZE] = copy_user(
+                    shard[place % SHARD_SIZE])
+                copied.add(update[1])
+            if twitterverse_functions.apply_update(twitter_dict, update):
+                if len(applied) == 0:
+                    twitterverse_functions.move_caches(old, twitter_dict)
+                applied.append(update)
+                if update[0] != 'profile':
+                    twitterverse_graph.forget_index(twitter_dict)
+                twitterverse_functions.call_update_listeners(twitter_dict,
+                                                             update)
+        if len(applied) == 0:
+            return applied
+        twitterverse_functions.call_update_listeners(twitter_dict, None)
+        with store['lock']:
+            store['current'] = twitter_dict
+            store['number'] += 1
+            unused = id(old) not in store['readers']
+    if unused:
+        twitterverse_functions.drop_caches(old)
+    return applied
+
+
+def copy_user(user):
+    """(dict of {str: object}) -> dict of {str: object}
+
+    Return a copy of the user dict user that can be changed without
+    changing user, including its following list.
+    """
+
+    copy = user.copy()
+    copy['following'] = list(user['following'])
+    return copy
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,276 @@
+"""
+Materialized views: the results of searches from the most followed users,
+found once after loading and found again by a background thread when the
+edges they depend on change
+(for descriptions of the other dictionaries, see twitterverse_functions)
+
+View dictionary: dict of {str: object}
+   - key "results", value represents what the search finds, in the order
+   get_search_results finds it (a list of str)
+   - key "following", value represents the usernames whose following lists
+   the search reads (a set of str)
+   - key "followers", value represents the usernames whose followers the
+   search reads (a set of str)
+
+View registry dictionary: dict of {str: object}
+   - key "data", value represents the data the views are of (a Twitterverse
+   dictionary); a version store moves the views to each new version (see
+   twitterverse_versions)
+   - key "views", value maps a username and a tuple of operations to the
+   view of that search (a dict of {tuple of (str, tuple of str): view
+   dictionary})
+   - key "table", value maps the same keys to the results of the views that
+   are up to date; it is the table twitterverse_functions.get_view reads
+   (a dict of {tuple of (str, tuple of str): list of str})
+   - key "stale", value represents the keys of the views that are out of
+   date (a set of tuple of (str, tuple of str))
+   - key "generation", value represents how many follow and unfollow
+   updates the data has had (an int)
+   - key "lock", value guards "data", "views", "table", "stale" and
+   "generation"
+   (a threading.Lock)
+   - key "wake", value is set when there are views to find again
+   (a threading.Event)
+   - key "fresh", value is set while every view is up to date
+   (a threading.Event)
+   - key "listener", value represents the function apply_updates calls for
+   the updates of the data
+   - key "stopped", value represents whether stop_views was called (a bool)
+   - key "thread", value represents the thread that finds stale views again
+   (a threading.Thread)
+
+A follow or unfollow update makes a view stale when it changes the following
+list or the followers of a user the view's search reads. A stale view is
+taken out of the table at once, so searches never use it, and put back once
+the background thread has found it again on data that no update changed
+while it worked.
+"""
+
+import collections
+import threading
+
+import twitterverse_functions
+
+
+# How many of the most followed users get views by default.
+VIEW_TOP = 10
+
+# The searches each of those users gets a view of by default.
+VIEW_OPERATIONS = [('followers',), ('followers', 'followers'),
+                   ('following',), ('following', 'following')]
+
+# The view registry dictionaries of the views that are not stopped.
+_registries = []
+
+# Guards every read and write of _registries.
+_registries_lock = threading.Lock()
+
+
+def start_views(twitter_dict, usernames=None, operations=VIEW_OPERATIONS):
+    """(Twitterverse dictionary, list of str, list of tuple of str)
+    -> view registry dictionary
+
+    Find the view of every search of operations from every username in
+    usernames (by default, the VIEW_TOP most followed users), have
+    twitterverse_functions.get_search_results start from them, and start
+    the thread that keeps them up to date while
+    twitterverse_functions.apply_updates changes twitter_dict.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['c']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}, \
+    'c': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': []}}
+    >>> registry = start_views(twitter_dict, ['c'], [('followers',)])
+    >>> sorted(registry['table'])
+    [('c', ('followers',))]
+    >>> applied = twitterverse_functions.apply_updates(twitter_dict, \
+    [('unfollow', 'b', 'c')])
+    >>> wait_for_views(registry, 10)
+    True
+    >>> twitterverse_functions.get_search_results(twitter_dict, \
+    {'username': 'c', 'operations': ['followers']})
+    ['a']
+    >>> stop_views(registry)
+    """
+
+    if usernames is None:
+        usernames = get_hot_accounts(twitter_dict, VIEW_TOP)
+    keys = []
+    for username in usernames:
+        for view_operations in operations:
+            keys.append((username, tuple(view_operations)))
+    registry = {'data': twitter_dict, 'views': {}, 'table': {},
+                'stale': set(keys), 'generation': 0,
+                'lock': threading.Lock(), 'wake': threading.Event(),
+                'fresh': threading.Event(), 'stopped': False,
+                'listener': lambda twitter_dict, update:
+                note_update(registry, twitter_dict, update), 'thread': None}
+    refresh_stale(registry)
+    twitterverse_functions.add_view_table(twitter_dict, registry['table'])
+    twitterverse_functions.add_update_listener(twitter_dict,
+                                               registry['listener'])
+    registry['thread'] = threading.Thread(target=keep_fresh,
+                                          args=(registry,), daemon=True)
+    registry['thread'].start()
+    with _registries_lock:
+        _registries.append(registry)
+    return registry
+
+
+def stop_views(registry):
+    """(view registry dictionary) -> NoneType
+
+    Stop the searches using the views of registry and stop keeping them up
+    to date.
+    """
+
+    with registry['lock']:
+        twitter_dict = registry['data']
+        registry['stopped'] = True
+    with _registries_lock:
+        for position in range(len(_registries)):
+            if _registries[position] is registry:
+                del _registries[position]
+                break
+    twitterverse_functions.remove_update_listener(twitter_dict,
+                                                  registry['listener'])
+    twitterverse_functions.remove_view_table(twitter_dict, registry['table'])
+    registry['wake'].set()
+    registry['thread'].join()
+
+
+def wait_for_views(registry, timeout=None):
+    """(view registry dictionary, float) -> bool
+
+    Wait until every view of registry is up to date, or until timeout
+    seconds have passed (None means no limit), and return True if and only
+    if they are.
+    """
+
+    return registry['fresh'].wait(timeout)
+
+
+def get_hot_accounts(twitter_dict, count):
+    """(Twitterverse dictionary, int) -> list of str
+
+    Return the count usernames with the most followers in twitter_dict,
+    most followed first, and in alphabetical order among equals.
+
+    >>> twitter_dict = {'a': {'name': '', 'bio': '', 'location': '', \
+    'web': '', 'following': ['c', 'b']}, \
+    'b': {'name': '', 'bio': '', 'location': '', 'web': '', \
+    'following': ['c']}}
+    >>> get_hot_accounts(twitter_dict, 2)
+    ['c', 'b']
+    """
+
+    counts = collections.Counter()
+    for username in twitter_dict:
+        counts.update(set(twitter_dict[username]['following']))
+    return sorted(counts, key=lambda username: (-counts[username],
+                                                 username))[:count]
+
+
+def find_view(twitter_dict, username, operations, followers):
+    """(Twitterverse dictionary, str, tuple of str, dict of {str: list of str})
+    -> view dictionary
+
+    Return the view of the search of operations from username. followers is
+    a follower_index of twitter_dict.
+    """
+
+    view = {'results': None, 'following': set(), 'followers': set()}
+    search_lst = [username]
+    for operation in operations:
+        direction, depth = twitterverse_functions.parse_operation(operation)
+        # A closure of depth hops reads the users within depth - 1 hops of
+        # where it starts.
+        view[direction].update(search_lst)
+        if depth > 1:
+            view[direction].update(twitterverse_functions.get_closure(
+                twitter_dict, search_lst, direction, depth - 1, followers))
+        search_lst = twitterverse_functions.get_closure(
+            twitter_dict, search_lst, direction, depth, followers)
+    view['results'] = search_lst
+    return view
+
+
+def refresh_stale(registry):
+    """(view registry dictionary) -> bool
+
+    Find every stale view of registry again and put them back in its table,
+    unless a follow or unfollow update came in meanwhile. Return True if and
+    only if the views were put back.
+    """
+
+    with registry['lock']:
+        keys = list(registry['stale'])
+        generation = registry['generation']
+        twitter_dict = registry['data']
+    followers = twitterverse_functions.follower_index(twitter_dict)
+    views = {}
+    for key in keys:
+        views[key] = find_view(twitter_dict, key[0], key[1], followers)
+    with registry['lock']:
+        if registry['generation'] != generation:
+            return False
+        for key in keys:
+            registry['views'][key] = views[key]
+            registry['table'][key] = views[key]['results']
+            registry['stale'].discard(key)
+        if len(registry['stale']) == 0:
+            registry['fresh'].set()
+    return True
+
+
+def keep_fresh(registry):
+    """(view registry dictionary) -> NoneType
+
+    Find the stale views of registry again each time an update makes some
+    stale, until stop_views is called.
+    """
+
+    while True:
+        registry['wake'].wait()
+        with registry['lock']:
+            if registry['stopped']:
+                return
+            registry['wake'].clear()
+        # If an update comes in while the views are found, the listener
+        # sets "wake" again, so they are found once more.
+        refresh_stale(registry)
+
+
+def note_update(registry, twitter_dict, update):
+    """(view registry dictionary, Twitterverse dictionary, update tuple)
+    -> NoneType
+
+    Take the views that update, just applied to twitter_dict, makes stale
+    out of the table of registry, whose data twitter_dict now is; when
+    update is None, the batch of updates is over, so wake the thread that
+    finds them again.
+    """
+
+    with registry['lock']:
+        registry['data'] = twitter_dict
+    if update is None:
+        if not registry['fresh'].is_set():
+            registry['wake'].set()
+        return
+    if update[0] == 'profile':
+        return
+    with registry['lock']:
+        registry['generation'] += 1
+        for key, view in registry['views'].items():
+            if update[1] in view['following'] or \
+                    update[2] in view['followers']:
+                registry['stale'].add(key)
+                registry['table'].pop(key, None)
+                registry['fresh'].clear()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()